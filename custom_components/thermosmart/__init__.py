@@ -4,101 +4,384 @@ Support for the Thermosmart.
 For more details about this component, please refer to the documentation at
 https://home-assistant.io/components/thermosmart/
 """
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from contextlib import AbstractAsyncContextManager
 from datetime import timedelta
+from functools import partial
+from itertools import count
 import logging
+import random
+from time import monotonic, perf_counter
 from typing import Any
 
-from homeassistant.components.webhook import (
-    async_register as webhook_register,
-    async_unregister as webhook_unregister,
-)
+import voluptuous as vol
+
+from homeassistant import config_entries
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import EVENT_HOMEASSISTANT_STOP, Platform
-from homeassistant.core import HomeAssistant
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.exceptions import (
+    ConfigEntryAuthFailed,
+    ConfigEntryNotReady,
+    HomeAssistantError,
+)
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.helpers.config_entry_oauth2_flow import (
     OAuth2Session,
     async_get_config_entry_implementation,
 )
 from homeassistant.helpers.debounce import Debouncer
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
 from homeassistant.helpers.typing import HomeAssistantType
 
-from thermosmart_hass import thermosmart_api as Api
-from thermosmart_hass import ThermosmartDevice as Thermosmart
-
-from .const import DOMAIN, CONF_WEBHOOK, CONF_WEBHOOK_OLD
+from .api import (
+    ThermosmartApi,
+    ThermosmartApiError,
+    ThermosmartAuthError,
+    ThermosmartDevice,
+)
+from .auth import ConfigEntryAuth
+from .const import (
+    DOMAIN,
+    CONF_OPTIMISTIC,
+    CONF_TRACE,
+    CONF_WEBHOOK,
+    CONF_WEBHOOK_OLD,
+    SIGNAL_OPTIONS_UPDATED,
+)
+from .metrics import ThermosmartMetrics
+from .model import ThermostatSnapshot
+from .registry import ThermosmartRegistry
+from .scheduler import PRIORITY_HIGH, PRIORITY_LOW, STARTUP_SPREAD, StartupScheduler
+from .trace import TRACE_DATA, TRACE_FILE, TRACE_WEBHOOK, TraceRecorder
+from .webhook import (
+    MAX_WEBHOOK_SIZE,
+    WEBHOOK_COOLDOWN,
+    WEBHOOK_EXPIRED,
+    WEBHOOK_SCHEMA,
+    WebhookFilter,
+    WebhookRegistration,
+)
 
-PLATFORMS = [Platform.CLIMATE, Platform.SENSOR]
+PLATFORMS = [Platform.BINARY_SENSOR, Platform.CLIMATE, Platform.SENSOR]
 
 _LOGGER = logging.getLogger(__name__)
 
 SCAN_INTERVAL = timedelta(seconds=300)
+# Poll faster after a command and while the boiler is heating
+FAST_SCAN_INTERVAL = timedelta(seconds=30)
+COMMAND_BOOST_TIME = 120
+# Back off up to this interval while nothing changes
+MAX_SCAN_INTERVAL = timedelta(seconds=1800)
+# Safety poll in case webhook messages are lost, while push delivery works
+WEBHOOK_SCAN_INTERVAL = timedelta(seconds=3600)
+SCAN_JITTER = 0.1
+
+STORAGE_VERSION = 1
+# Delay writing the cached data so frequent updates result in one write
+STORAGE_SAVE_DELAY = 60
 
 async def async_setup_entry(hass: HomeAssistantType, entry: ConfigEntry) -> bool:
     """Set up Thermosmart from a config entry."""
+    registry: ThermosmartRegistry = hass.data.setdefault(DOMAIN, ThermosmartRegistry())
+    # Entries of the same account have the id of its (first) thermostat
+    account = entry.unique_id or entry.entry_id
+
+    entry.async_on_unload(
+        entry.add_update_listener(partial(update_listener, options=dict(entry.options)))
+    )
+
+    start = perf_counter()
+    async with registry.lock(account):
+        if (coordinator := registry.async_get(account)) is not None:
+            _LOGGER.debug("Sharing the coordinator of account %s", account)
+            registry.async_add(account, entry.entry_id, coordinator)
+            return True
+
+        coordinator = await _async_setup_coordinator(hass, entry, registry.scheduler)
+        registry.async_add(account, entry.entry_id, coordinator)
+    coordinator.metrics.setup_time["coordinator"] = perf_counter() - start
+
+    # Also without OpenTherm, the binary sensor platform holds the alerts and
+    # the sensor platform the diagnostic sensors of the entry
+    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    registry.entity_entries.add(entry.entry_id)
+    coordinator.metrics.setup_time["total"] = perf_counter() - start
+    _LOGGER.debug(
+        "Set up Thermosmart entry %s in %.3f s",
+        entry.entry_id,
+        coordinator.metrics.setup_time["total"],
+    )
+
+    return True
 
+async def _async_setup_coordinator(
+    hass: HomeAssistant, entry: ConfigEntry, scheduler: StartupScheduler
+) -> ThermosmartCoordinator:
+    """Create the API client and coordinator of an account.
+
+    The cloud is called in a slot of the scheduler, so entries that start
+    together do not all call it at once.
+    """
     implementation = await async_get_config_entry_implementation(hass, entry)
     session = OAuth2Session(hass, entry, implementation)
 
-    api = Api.ThermosmartApi(token=session.token)
-    device_id =  await hass.async_add_executor_job(api.get_thermostat_id)
-    thermosmart = Thermosmart(api = api, device_id = device_id)
+    metrics = ThermosmartMetrics()
+    api = ThermosmartApi(
+        async_get_clientsession(hass),
+        ConfigEntryAuth(hass, entry, session),
+        metrics=metrics,
+    )
 
-    coordinator = ThermosmartCoordinator(
-        hass,
-        thermosmart,
-        entry.options.get(CONF_WEBHOOK, None),
-        entry.options.get(CONF_WEBHOOK_OLD, None)
+    # Start from the data cached by the previous run, if any
+    store: Store[dict[str, Any]] = Store(
+        hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}"
     )
-    entry.async_on_unload(entry.add_update_listener(update_listener))
-    
-    await coordinator.async_config_entry_first_refresh()
-    
-    hass.data.setdefault(DOMAIN, {})
-    hass.data[DOMAIN][entry.entry_id] = coordinator
-
-    if coordinator.data.get('ot'):
-        await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    cache = await store.async_load()
+    priority = _startup_priority(hass, entry)
+    phase = scheduler.next_phase()
+
+    if cache:
+        device_ids = list(cache["data"])
     else:
-        await hass.config_entries.async_forward_entry_setups(entry, [Platform.CLIMATE])
+        async with scheduler.slot(priority):
+            try:
+                device_ids = await api.get_thermostat_ids()
+            except ThermosmartAuthError as err:
+                raise ConfigEntryAuthFailed(err) from err
+            except ThermosmartApiError as err:
+                raise ConfigEntryNotReady(err) from err
 
-    return True
+    # The coordinator is shared by the entries of the account, so it is not
+    # shut down with the entry that creates it but when the last one unloads
+    token = config_entries.current_entry.set(None)
+    try:
+        coordinator = ThermosmartCoordinator(
+            hass,
+            [
+                ThermosmartDevice(
+                    api, device_id, create_task=hass.async_create_background_task
+                )
+                for device_id in device_ids
+            ],
+            entry.options.get(CONF_WEBHOOK, None),
+            entry.options.get(CONF_WEBHOOK_OLD, None),
+            entry.options.get(CONF_OPTIMISTIC, False),
+            api=api,
+            store=store,
+            metrics=metrics,
+        )
+    finally:
+        config_entries.current_entry.reset(token)
+    coordinator.config_entry = entry
+    if cache:
+        coordinator.async_set_cached_data(cache["data"])
+        # Entries started together poll out of phase, from half to one and a
+        # half poll interval after the start
+        coordinator.update_interval = SCAN_INTERVAL * (0.5 + phase)
+        entry.async_create_background_task(
+            hass,
+            _async_refresh_cached(
+                hass,
+                coordinator,
+                api,
+                scheduler.slot(priority),
+                phase * STARTUP_SPREAD,
+            ),
+            f"{DOMAIN} refresh {entry.entry_id}",
+        )
+    else:
+        try:
+            async with scheduler.slot(priority):
+                await coordinator.async_config_entry_first_refresh()
+        except Exception:
+            await coordinator.async_shutdown()
+            raise
+
+    if coordinator.webhook:
+        coordinator.async_start_push()
+    await _async_update_trace(hass, entry, coordinator)
+
+    return coordinator
+
+async def _async_update_trace(
+    hass: HomeAssistant, entry: ConfigEntry, coordinator: ThermosmartCoordinator
+) -> None:
+    """Start or stop recording a trace, as configured."""
+    if entry.options.get(CONF_TRACE, False) == (coordinator.trace is not None):
+        return
+
+    if coordinator.trace is not None:
+        trace, coordinator.trace = coordinator.trace, None
+        await trace.async_stop()
+        return
+
+    coordinator.trace = TraceRecorder(
+        hass, hass.config.path(TRACE_FILE.format(entry_id=entry.entry_id))
+    )
+    # Start from the current data, webhook messages build on it
+    coordinator.trace.async_record(TRACE_DATA, coordinator.data)
+    coordinator.trace.async_start()
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
-    unload_ok = await hass.config_entries.async_unload_platforms(
-        entry, PLATFORMS
-    )
+    registry: ThermosmartRegistry = hass.data[DOMAIN]
+
+    coordinator = registry.entries[entry.entry_id]
+
+    # Only the entry that created the coordinator has entities
+    if entry.entry_id in registry.entity_entries:
+        if not await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
+            return False
+        registry.entity_entries.discard(entry.entry_id)
+
+    if not (entry_ids := registry.async_remove(entry.entry_id)):
+        await coordinator.async_shutdown()
+    elif coordinator.config_entry is entry:
+        # The other entries keep the coordinator, the next one takes over
+        owner = hass.config_entries.async_get_entry(entry_ids[0])
+        coordinator.async_set_config_entry(owner)
+        await _async_apply_options(hass, owner, coordinator)
+
+    return True
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the cached data and burner counters of a config entry."""
+    await Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}").async_remove()
+    await Store(
+        hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}.derived"
+    ).async_remove()
 
-    if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+def _startup_priority(hass: HomeAssistant, entry: ConfigEntry) -> int:
+    """Return the startup priority of an entry.
 
-    return unload_ok
+    Entries with polling disabled or only disabled entities start last, new
+    entries have no entities yet and start first.
+    """
+    if entry.pref_disable_polling:
+        return PRIORITY_LOW
+    entities = er.async_entries_for_config_entry(er.async_get(hass), entry.entry_id)
+    if entities and all(entity.disabled_by for entity in entities):
+        return PRIORITY_LOW
+    return PRIORITY_HIGH
 
-async def update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
-    """Handle options update."""
-    await hass.config_entries.async_reload(entry.entry_id)
+async def _async_refresh_cached(
+    hass: HomeAssistant,
+    coordinator: ThermosmartCoordinator,
+    api: ThermosmartApi,
+    slot: AbstractAsyncContextManager[None],
+    delay: float,
+) -> None:
+    """Refresh a coordinator started from cache.
 
-class ThermosmartCoordinator(DataUpdateCoordinator[None]):
-    """Representation of a Somneo Coordinator."""
+    If the thermostats changed, its entries are reloaded to set up a new one.
+    """
+    await asyncio.sleep(delay)
+    async with slot:
+        await coordinator.async_refresh()
+        try:
+            device_ids = await api.get_thermostat_ids()
+        except ThermosmartApiError as err:
+            _LOGGER.debug("Could not check the thermostats of the account: %s", err)
+            return
+
+    if set(device_ids) != set(coordinator.devices):
+        _LOGGER.info("Thermostats of the account changed, reloading")
+        await coordinator.async_clear_cache()
+        registry: ThermosmartRegistry = hass.data[DOMAIN]
+        registry.async_discard(coordinator)
+        for entry_id in registry.async_entry_ids(coordinator):
+            hass.async_create_task(hass.config_entries.async_reload(entry_id))
+
+async def update_listener(
+    hass: HomeAssistant, entry: ConfigEntry, options: dict[str, Any]
+) -> None:
+    """Apply changed options to the running entry, without reloading it.
+
+    The options are the ones applied last, renewed tokens are also saved in
+    the entry and change none of them.
+    """
+    if entry.options == options:
+        return
+    options.clear()
+    options.update(entry.options)
+
+    registry: ThermosmartRegistry = hass.data[DOMAIN]
+    # The options flow only changes the options of the owner
+    if registry.async_is_owner(entry.entry_id):
+        await _async_apply_options(hass, entry, registry.entries[entry.entry_id])
+
+async def _async_apply_options(
+    hass: HomeAssistant, entry: ConfigEntry, coordinator: ThermosmartCoordinator
+) -> None:
+    """Apply the options of the entry owning a coordinator."""
+    coordinator.optimistic = entry.options.get(CONF_OPTIMISTIC, False)
+    coordinator.async_set_webhook(entry.options.get(CONF_WEBHOOK, None))
+    await _async_update_trace(hass, entry, coordinator)
+    # The sensor platform applies the options of its entities
+    async_dispatcher_send(
+        hass, SIGNAL_OPTIONS_UPDATED.format(entry.entry_id), dict(entry.options)
+    )
+
+class ThermosmartCoordinator(DataUpdateCoordinator[dict[str, dict[str, Any]]]):
+    """Coordinator fetching all thermostats of an account, keyed by device id."""
 
     def __init__(
         self,
         hass: HomeAssistant,
-        client: Thermosmart,
+        devices: list[ThermosmartDevice],
         webhook: str | None = None,
         old_webhook: str | None = None,
+        optimistic: bool = False,
+        api: ThermosmartApi | None = None,
+        store: Store[dict[str, Any]] | None = None,
+        metrics: ThermosmartMetrics | None = None,
     ) -> None:
         """Initialize Thermosmart coordinator."""
-        
-        self.client = client
-        
+
+        self.devices = {device.device_id: device for device in devices}
+        self._api = api
+        self._store = store
+        self.metrics = metrics or ThermosmartMetrics()
+        self.webhook = webhook
+        self.optimistic = optimistic
+        self._stable_polls = 0
+        self._boost_until = 0.0
+        # Values of the data paths read by the entities, as last notified
+        self._notified_values: dict[tuple[str, ...], Any] = {}
+        self._notified_success: bool | None = None
+        # Parsed data of every thermostat, replaced on every update
+        self.snapshots: dict[str, ThermostatSnapshot] = {}
+        self._webhook_filter = WebhookFilter()
+        self._registration: WebhookRegistration | None = None
+        # Records the received data, if enabled
+        self.trace: TraceRecorder | None = None
+        self._webhook_debouncer = Debouncer(
+            hass,
+            _LOGGER,
+            cooldown=WEBHOOK_COOLDOWN,
+            immediate=False,
+            function=self._async_publish_webhook_data,
+        )
+        # Values written optimistically that the cloud has not confirmed yet
+        self._pending: dict[str, dict[str, Any]] = {}
+        # Sequence number of the write that set every pending value
+        self._pending_writes: dict[str, dict[str, int]] = {}
+        self._write_sequence = count()
+
         super().__init__(
             hass,
             _LOGGER,
             name=DOMAIN,
-            update_interval=None if webhook else SCAN_INTERVAL,
+            # Polls normally until the webhook is registered with the cloud
+            update_interval=SCAN_INTERVAL,
             update_method=self._update,
             request_refresh_debouncer=Debouncer(
                 hass, _LOGGER, cooldown=1.0, immediate=False
@@ -108,50 +391,409 @@ class ThermosmartCoordinator(DataUpdateCoordinator[None]):
         # Unregister old webhook
         _LOGGER.debug('The old webhook is: %s', old_webhook)
         if old_webhook:
-            _LOGGER.debug("Unregister Thermosmart old webhook (%s)", old_webhook)
-            webhook_unregister(hass, old_webhook)
+            _async_unregister_webhook(hass, old_webhook)
 
         # Register a webhook
         _LOGGER.debug('The new webhook is: %s', webhook)
         if webhook:
-            _LOGGER.debug("Register Thermosmart new webhook (%s)", webhook)
-            webhook_register(
-                hass,
-                DOMAIN,
-                "Thermosmart",
-                webhook,
-                self.handle_webhook,
-            )
+            self._async_register_webhook()
+
+        @callback
+        def unregister_webhook(event):
+            self._unsub_stop = None
+            if self.webhook:
+                _async_unregister_webhook(hass, self.webhook)
+
+        # Removed on shutdown, when the last entry of the account is unloaded
+        self._unsub_stop: CALLBACK_TYPE | None = hass.bus.async_listen_once(
+            EVENT_HOMEASSISTANT_STOP, unregister_webhook
+        )
+
+    @callback
+    def _async_register_webhook(self) -> None:
+        """Receive the messages of the webhook."""
+        # The webhook component is only loaded if a webhook is used
+        from homeassistant.components.webhook import (  # pylint: disable=import-outside-toplevel
+            async_register as webhook_register,
+        )
+
+        _LOGGER.debug("Register Thermosmart new webhook (%s)", self.webhook)
+        webhook_register(
+            self.hass,
+            DOMAIN,
+            "Thermosmart",
+            self.webhook,
+            self.handle_webhook,
+        )
+
+    @callback
+    def async_add_listener(
+        self, update_callback: CALLBACK_TYPE, context: Any = None
+    ) -> Callable[[], None]:
+        """Listen for data updates, starting from the current data."""
+        if context is not None and self.data is not None:
+            for path in context:
+                self._notified_values[path] = _get_path(self.data, path)
+        return super().async_add_listener(update_callback, context)
 
-            async def unregister_webhook(event):
-                _LOGGER.debug("Unregister Thermosmart webhook (%s)", webhook)
-                webhook_unregister(hass, webhook)
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update only the listeners of which the data has changed.
 
-            hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, unregister_webhook)
-            
+        Entities register the data paths they read as listener context, e.g.
+        ("<device id>", "ot", "readable", "Water pressure"). Listeners without
+        a context are always updated, and all listeners are updated when the
+        availability of the data changes. The data is parsed into snapshots
+        once, before any listener reads it.
+        """
+        changed = set()
+        if self.data is not None:
+            self.snapshots = {
+                device_id: ThermostatSnapshot.from_data(device_data)
+                for device_id, device_data in self.data.items()
+            }
+            for context in self.async_contexts():
+                for path in context:
+                    value = _get_path(self.data, path)
+                    if (
+                        path not in self._notified_values
+                        or self._notified_values[path] != value
+                    ):
+                        self._notified_values[path] = value
+                        changed.add(path)
+
+        if self.last_update_success != self._notified_success:
+            self._notified_success = self.last_update_success
+            super().async_update_listeners()
+            return
+
+        for update_callback, context in list(self._listeners.values()):
+            if context is None or not changed.isdisjoint(context):
+                update_callback()
 
     async def _update(self):
-        """Fetch latest data."""
-        await self.hass.async_add_executor_job(self.client.get_thermostat)
-        return self.client.data
+        """Fetch latest data of all thermostats concurrently."""
+        start = perf_counter()
+        try:
+            results = await asyncio.gather(
+                *(device.get_thermostat() for device in self.devices.values())
+            )
+        except ThermosmartAuthError as err:
+            raise ConfigEntryAuthFailed(err) from err
+        except ThermosmartApiError as err:
+            raise UpdateFailed(err) from err
+        finally:
+            self.metrics.update_duration.record(perf_counter() - start)
+
+        if self.trace is not None:
+            self.trace.async_record(TRACE_DATA, dict(zip(self.devices, results)))
+        data = self._with_pending(dict(zip(self.devices, results)))
+        self._adjust_update_interval(data)
+        self._async_save()
+        return data
+
+    @callback
+    def async_set_cached_data(self, data: dict[str, dict[str, Any]]) -> None:
+        """Start from the data cached by a previous run."""
+        for device_id, device in self.devices.items():
+            device.data = data[device_id]
+        self.async_set_updated_data(data)
+
+    @callback
+    def _async_save(self) -> None:
+        """Schedule saving the latest data of the thermostats."""
+        if self._store is not None:
+            self._store.async_delay_save(self._data_to_store, STORAGE_SAVE_DELAY)
+
+    def _data_to_store(self) -> dict[str, Any]:
+        """Return the data to cache, without unconfirmed optimistic values."""
+        return {
+            "data": {
+                device_id: device.data
+                for device_id, device in self.devices.items()
+                if device.data is not None
+            }
+        }
+
+    async def async_clear_cache(self) -> None:
+        """Remove the cached data."""
+        if self._store is not None:
+            await self._store.async_remove()
+
+    def _adjust_update_interval(self, data: dict[str, dict[str, Any]]) -> None:
+        """Pick the next polling interval based on what the thermostats do."""
+        if self.push_active:
+            interval = WEBHOOK_SCAN_INTERVAL
+        elif monotonic() < self._boost_until or any(
+            _is_heating(device_data) for device_data in data.values()
+        ):
+            self._stable_polls = 0
+            interval = FAST_SCAN_INTERVAL
+        else:
+            self._stable_polls = self._stable_polls + 1 if data == self.data else 0
+            interval = min(SCAN_INTERVAL * 2**self._stable_polls, MAX_SCAN_INTERVAL)
+
+        self.update_interval = interval * random.uniform(1 - SCAN_JITTER, 1 + SCAN_JITTER)
+        _LOGGER.debug("Next Thermosmart poll in %s", self.update_interval)
+
+    def _with_pending(self, data: dict[str, dict[str, Any]]) -> dict[str, dict[str, Any]]:
+        """Overlay the unconfirmed optimistic values on the data."""
+        if not self._pending:
+            return data
+        return {
+            device_id: {**device_data, **self._pending[device_id]}
+            if device_id in self._pending
+            else device_data
+            for device_id, device_data in data.items()
+        }
+
+    async def async_write(
+        self,
+        device_id: str,
+        changes: dict[str, Any],
+        command: Callable[[], Awaitable[None]],
+    ) -> None:
+        """Send a command to a thermostat and refresh its state.
+
+        In optimistic mode the expected changes are published to the entities
+        right away and the command is sent in the background. The changes are
+        kept on top of fetched and webhook data until the command finishes, and
+        are dropped again (rolling back the state) if it fails.
+        """
+        self._boost_until = monotonic() + COMMAND_BOOST_TIME
+
+        if not self.optimistic:
+            try:
+                await command()
+            except ThermosmartApiError as err:
+                raise HomeAssistantError(
+                    f"Could not update thermostat {device_id}: {err}"
+                ) from err
+            await self.async_request_refresh()
+            return
+
+        sequence = next(self._write_sequence)
+        self._pending.setdefault(device_id, {}).update(changes)
+        self._pending_writes.setdefault(device_id, {}).update(
+            dict.fromkeys(changes, sequence)
+        )
+        self.async_set_updated_data(self._with_pending(self.data))
+
+        self.config_entry.async_create_background_task(
+            self.hass,
+            self._async_reconcile(device_id, changes, sequence, command),
+            f"{DOMAIN} write {device_id}",
+        )
+
+    async def _async_reconcile(
+        self,
+        device_id: str,
+        changes: dict[str, Any],
+        sequence: int,
+        command: Callable[[], Awaitable[None]],
+    ) -> None:
+        """Send an optimistic command and reconcile the state afterwards."""
+        succeeded = False
+        try:
+            await command()
+            succeeded = True
+        except ThermosmartApiError as err:
+            _LOGGER.error(
+                "Could not update thermostat %s, rolling back: %s", device_id, err
+            )
+        finally:
+            # Drop the changes unless a newer command has overwritten them
+            pending = self._pending.get(device_id, {})
+            writes = self._pending_writes.get(device_id, {})
+            for key in changes:
+                if writes.get(key) == sequence:
+                    del pending[key], writes[key]
+            if not pending:
+                self._pending.pop(device_id, None)
+                self._pending_writes.pop(device_id, None)
+
+            if not succeeded:
+                self.async_set_updated_data(
+                    self._with_pending(
+                        {**self.data, device_id: self.devices[device_id].data}
+                    )
+                )
+
+        await self.async_request_refresh()
+
+    @property
+    def push_active(self) -> bool:
+        """Return if the cloud pushes changes to the webhook."""
+        return self._registration is not None and self._registration.active
+
+    @callback
+    def async_start_push(self) -> None:
+        """Register the webhook with the cloud and keep it registered."""
+        self._registration = WebhookRegistration(
+            self.hass, self.webhook, self._api.set_webhook, self._async_push_changed
+        )
+        self._registration.async_start()
+
+    @callback
+    def async_set_webhook(self, webhook: str | None) -> None:
+        """Switch to another webhook, or to polling if None."""
+        if webhook == self.webhook:
+            return
+
+        if self.webhook:
+            if self._registration is not None:
+                self._registration.async_stop()
+                self._registration = None
+            _async_unregister_webhook(self.hass, self.webhook)
+
+        self.webhook = webhook
+        if webhook:
+            self._async_register_webhook()
+            self.async_start_push()
+        elif self._api is not None:
+            self.hass.async_create_background_task(
+                self._async_clear_cloud_webhook(), f"{DOMAIN} clear webhook"
+            )
+
+        # Poll normally until the new webhook is registered, from now on
+        # rather than after the long fallback interval of the old one
+        self.update_interval = SCAN_INTERVAL
+        if self._listeners:
+            self._schedule_refresh()
+
+    async def _async_clear_cloud_webhook(self) -> None:
+        """Stop the cloud from pushing to the webhook that was removed."""
+        try:
+            await self._api.set_webhook("")
+        except ThermosmartApiError as err:
+            _LOGGER.warning("Could not remove the Thermosmart webhook: %s", err)
+
+    @callback
+    def _async_push_changed(self, active: bool) -> None:
+        """Only poll as a fallback while push delivery works."""
+        if active:
+            _LOGGER.debug("Thermosmart webhook registered, polling as a fallback")
+            self.update_interval = WEBHOOK_SCAN_INTERVAL
+            return
+        _LOGGER.info("Thermosmart webhook is down, polling until it is renewed")
+        self.update_interval = SCAN_INTERVAL
+        # Catch up on the changes that were not pushed
+        self.hass.async_create_task(self.async_request_refresh())
 
     async def handle_webhook(self, hass: HomeAssistant, webhook_id: str, request) -> None:
         """Handle webhook callback."""
+        if (request.content_length or 0) > MAX_WEBHOOK_SIZE:
+            _LOGGER.warning("Thermosmart webhook message too large, ignoring")
+            return
+
         try:
             data = await request.json()
         except ValueError:
             return
 
+        if self.trace is not None:
+            self.trace.async_record(TRACE_WEBHOOK, data)
+        accepted = self.async_process_webhook(data)
+        self.metrics.record_webhook(accepted)
+        if accepted:
+            await self._webhook_debouncer.async_call()
+
+    @callback
+    def async_process_webhook(self, data: Any) -> bool:
+        """Apply a webhook message to its thermostat, return if it changed."""
         _LOGGER.debug("Got webhook data: %s", data)
 
         # Webhook expired notification
-        if data.get("code") == 510:
-            return
+        if isinstance(data, dict) and data.get("code") == WEBHOOK_EXPIRED:
+            if self._registration is not None:
+                self._registration.async_expired()
+            return False
+
+        try:
+            message = WEBHOOK_SCHEMA(data)
+        except vol.Invalid as err:
+            _LOGGER.warning("Invalid data received from Thermosmart webhook: %s", err)
+            return False
+
+        device = self.devices.get(message["thermostat"])
+        if device is None or device.data is None:
+            _LOGGER.debug("Webhook data for unknown thermostat, ignoring")
+            return False
+
+        if not self._webhook_filter.accept(message):
+            _LOGGER.debug("Duplicate or out-of-order webhook data, ignoring")
+            return False
 
         try:
-            await hass.async_add_executor_job(self.client.process_webhook, data)
-        except:
+            device.process_webhook(message)
+        except (KeyError, TypeError, ValueError):
             _LOGGER.error("Could not process data received from Thermosmart webhook")
+            return False
+
+        return True
+
+    @callback
+    def _async_publish_webhook_data(self) -> None:
+        """Publish the thermostat data changed by webhook messages."""
+        self._async_save()
+        self.async_set_updated_data(
+            self._with_pending(
+                {
+                    device_id: device.data
+                    for device_id, device in self.devices.items()
+                    if device.data is not None
+                }
+            )
+        )
+
+    @callback
+    def async_set_config_entry(self, entry: ConfigEntry) -> None:
+        """Continue with another entry of the account, when the owner unloads.
+
+        Reauth flows are started for it and renewed tokens are saved in it.
+        """
+        self.config_entry = entry
+        if self._api is not None and isinstance(self._api.auth, ConfigEntryAuth):
+            self._api.auth.entry = entry
+
+    async def async_shutdown(self) -> None:
+        """Cancel pending updates, stop receiving webhook messages and tracing."""
+        await super().async_shutdown()
+        self._webhook_debouncer.async_shutdown()
+        for device in self.devices.values():
+            device.close()
+        if self._unsub_stop is not None:
+            self._unsub_stop()
+            self._unsub_stop = None
+        if self._registration is not None:
+            self._registration.async_stop()
+        if self.webhook:
+            _async_unregister_webhook(self.hass, self.webhook)
+        if self.trace is not None:
+            await self.trace.async_stop()
+
+
+@callback
+def _async_unregister_webhook(hass: HomeAssistant, webhook_id: str) -> None:
+    """Stop receiving the messages of a webhook."""
+    from homeassistant.components.webhook import (  # pylint: disable=import-outside-toplevel
+        async_unregister as webhook_unregister,
+    )
+
+    _LOGGER.debug("Unregister Thermosmart webhook (%s)", webhook_id)
+    webhook_unregister(hass, webhook_id)
+
+
+def _is_heating(data: dict[str, Any]) -> bool:
+    """Return if the boiler of a thermostat is active."""
+    readable = (data.get("ot") or {}).get("readable") or {}
+    return bool(readable.get("CH_enabled") or readable.get("Modulation level"))
 
-        self.async_set_updated_data(self.client.data)
 
+def _get_path(data: dict[str, Any], path: tuple[str, ...]) -> Any:
+    """Return the value at a path in nested data, or None if it is missing."""
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
@@ -0,0 +1,475 @@
+"""Asyncio client for the Thermosmart cloud API."""
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+import asyncio
+from collections.abc import Callable, Coroutine
+import copy
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import partial
+import json
+import logging
+import random
+from time import monotonic, perf_counter
+from typing import Any
+
+from aiohttp import ClientError, ClientSession, ClientTimeout
+
+from thermosmart_hass import ThermosmartDevice as BaseThermosmartDevice
+
+from .metrics import ThermosmartMetrics, endpoint
+
+_LOGGER = logging.getLogger(__name__)
+
+BASE_URL = "https://api.thermosmart.com"
+
+# Window in which writes to a thermostat are collected into one request
+COMMAND_DELAY = 0.5
+
+# Creates the task sending a batch of commands, from a coroutine and a name
+TaskFactory = Callable[[Coroutine[Any, Any, None], str], "asyncio.Task[None]"]
+
+REQUEST_TIMEOUT = 15
+# Failed requests are retried after 1, 2, 4, ... seconds (with jitter)
+MAX_RETRIES = 2
+RETRY_BACKOFF = 1.0
+# Longer waits (e.g. a long Retry-After) are left to the next poll
+MAX_RETRY_DELAY = 30.0
+# Stop calling the cloud after this many failures in a row, probe it again later
+BREAKER_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 60.0
+
+
+class ThermosmartApiError(Exception):
+    """Error returned by (or while talking to) the Thermosmart API."""
+
+
+class ThermosmartUnavailableError(ThermosmartApiError):
+    """The API did not respond or failed on its side, the request may succeed later."""
+
+    def __init__(self, message: str, retry_after: float | None = None) -> None:
+        """Initialize the error."""
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ThermosmartAuthError(ThermosmartApiError):
+    """The access token was rejected and could not be renewed."""
+
+
+class CircuitOpenError(ThermosmartApiError):
+    """The API is not called because it failed repeatedly."""
+
+
+class AbstractAuth(ABC):
+    """Supply the access token for requests to the API."""
+
+    @abstractmethod
+    async def async_get_access_token(self) -> str:
+        """Return the current access token."""
+
+    async def async_renew_token(self, rejected: str) -> None:
+        """Renew a token rejected by the API, raise ThermosmartAuthError if not possible."""
+        raise ThermosmartAuthError("Access token rejected.")
+
+
+class StaticAuth(AbstractAuth):
+    """A fixed token, for flows and scripts that do not renew tokens."""
+
+    def __init__(self, token: dict[str, Any]) -> None:
+        """Initialize the token."""
+        self._token = token
+
+    async def async_get_access_token(self) -> str:
+        """Return the access token."""
+        return self._token["access_token"]
+
+
+class CircuitBreaker:
+    """Stop calling the API of an account after repeated failures.
+
+    After BREAKER_THRESHOLD failures in a row the breaker opens and all calls
+    fail right away. Once the reset timeout has passed a single call is let
+    through as a probe: if it succeeds the breaker closes, otherwise it opens
+    again for another timeout.
+    """
+
+    def __init__(
+        self,
+        threshold: int = BREAKER_THRESHOLD,
+        reset_timeout: float = BREAKER_RESET_TIMEOUT,
+    ) -> None:
+        """Initialize the breaker."""
+        self._threshold = threshold
+        self._reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        """Return if calls are being blocked."""
+        return self._opened_at is not None
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError if a call is not allowed now."""
+        if self._opened_at is None:
+            return
+        if self._probing or monotonic() - self._opened_at < self._reset_timeout:
+            raise CircuitOpenError("Thermosmart API unavailable, not retrying yet.")
+        self._probing = True
+
+    def record_success(self) -> None:
+        """Close the breaker after a successful call."""
+        if self._opened_at is not None:
+            _LOGGER.info("Thermosmart API available again")
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        """Count a failed call, opening the breaker if there are too many."""
+        self._failures += 1
+        if self._probing or self._failures >= self._threshold:
+            if self._opened_at is None:
+                _LOGGER.warning(
+                    "Thermosmart API failed %s times, pausing requests for %s seconds",
+                    self._failures,
+                    self._reset_timeout,
+                )
+            self._opened_at = monotonic()
+            self._probing = False
+
+    def record_result(self) -> None:
+        """Finish a call that neither succeeded nor failed on the API side."""
+        self._probing = False
+
+
+def _retry_after(value: str | None) -> float | None:
+    """Return the seconds to wait from a Retry-After header."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((date - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class ThermosmartApi:
+    """Make authenticated requests to the Thermosmart API over aiohttp."""
+
+    def __init__(
+        self,
+        session: ClientSession,
+        auth: AbstractAuth | dict[str, Any],
+        base_url: str = BASE_URL,
+        metrics: ThermosmartMetrics | None = None,
+        breaker: CircuitBreaker | None = None,
+        retries: int = MAX_RETRIES,
+    ) -> None:
+        """Initialize the API client."""
+        self._session = session
+        self.auth = auth if isinstance(auth, AbstractAuth) else StaticAuth(auth)
+        self._base_url = base_url
+        self.metrics = metrics or ThermosmartMetrics()
+        self.breaker = breaker or CircuitBreaker()
+        self._retries = retries
+
+    async def request(
+        self, method: str, path: str, data: dict[str, Any] | None = None
+    ) -> Any:
+        """Make a request and return the decoded JSON body (if any).
+
+        Requests that time out or fail on the API side are retried with
+        jittered exponential backoff, honoring Retry-After. If the token is
+        rejected, the request is retried once with a renewed token.
+        """
+        renewed = False
+        attempt = 0
+        while True:
+            token = await self.auth.async_get_access_token()
+            self.breaker.before_call()
+            try:
+                result = await self._attempt(method, path, data, token)
+            except ThermosmartAuthError:
+                self.breaker.record_result()
+                if renewed:
+                    raise
+                await self.auth.async_renew_token(token)
+                renewed = True
+            except ThermosmartUnavailableError as err:
+                self.breaker.record_failure()
+                delay = err.retry_after
+                if delay is None:
+                    delay = RETRY_BACKOFF * 2**attempt * random.uniform(0.5, 1.5)
+                if attempt == self._retries or delay > MAX_RETRY_DELAY:
+                    raise
+                _LOGGER.debug("%s, retrying %s %s in %.1fs", err, method, path, delay)
+                self.metrics.retries += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+            except ThermosmartApiError:
+                self.breaker.record_result()
+                raise
+            except BaseException:
+                # Cancelled (e.g. on unload or a timeout of the caller), a
+                # probe has to be let through again later
+                self.breaker.record_result()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+
+    async def _attempt(
+        self, method: str, path: str, data: dict[str, Any] | None, token: str
+    ) -> Any:
+        """Make a single request and record it in the metrics."""
+        start = perf_counter()
+        failed = True
+        try:
+            result = await self._request(method, path, data, token)
+            failed = False
+            return result
+        finally:
+            self.metrics.record_request(
+                endpoint(method, path), perf_counter() - start, failed
+            )
+
+    async def _request(
+        self, method: str, path: str, data: dict[str, Any] | None, token: str
+    ) -> Any:
+        """Make a single request."""
+        headers = {"Authorization": f"Bearer {token}"}
+
+        try:
+            response = await self._session.request(
+                method,
+                self._base_url + path,
+                json=data,
+                headers=headers,
+                timeout=ClientTimeout(total=REQUEST_TIMEOUT),
+            )
+            body = await response.text()
+        except asyncio.TimeoutError as err:
+            raise ThermosmartUnavailableError("Timeout communicating with API") from err
+        except ClientError as err:
+            raise ThermosmartUnavailableError(
+                f"Error communicating with API: {err}"
+            ) from err
+
+        if response.status == 204:
+            raise ThermosmartApiError("Empty update.")
+        if response.status == 400:
+            raise ThermosmartApiError("Invalid update: " + body)
+        if response.status == 401:
+            raise ThermosmartAuthError("Unauthorized access.")
+        if response.status == 403:
+            raise ThermosmartApiError("Unauthorized access.")
+        if response.status == 404:
+            raise ThermosmartApiError("Thermostat not found.")
+        if response.status == 429 or response.status >= 500:
+            raise ThermosmartUnavailableError(
+                "Something went wrong with processing the request.",
+                _retry_after(response.headers.get("Retry-After")),
+            )
+        if response.status >= 400:
+            raise ThermosmartApiError(f"Unexpected response {response.status}.")
+
+        if not body:
+            return None
+        try:
+            return json.loads(body)
+        except ValueError as err:
+            raise ThermosmartApiError(f"Invalid response: {err}") from err
+
+    async def get(self, path: str) -> Any:
+        """Fetch data from API."""
+        return await self.request("get", path)
+
+    async def post(self, path: str, data: dict[str, Any]) -> Any:
+        """Post data to API."""
+        return await self.request("post", path, data)
+
+    async def put(self, path: str, data: dict[str, Any]) -> Any:
+        """Put data to API."""
+        return await self.request("put", path, data)
+
+    async def set_webhook(self, url: str) -> Any:
+        """Register the webhook url of the account, return the response."""
+        return await self.post("", {"webhook_url": url})
+
+    async def get_thermostat_id(self) -> str:
+        """Return the id of the thermostat linked to the account."""
+        return (await self.get_thermostat_ids())[0]
+
+    async def get_thermostat_ids(self) -> list[str]:
+        """Return the ids of all thermostats linked to the account."""
+        result = await self.get("/thermostat")
+        if isinstance(result, list):
+            return [thermostat["hw"] for thermostat in result]
+        return [result["hw"]]
+
+
+class CommandQueue:
+    """Coalesce the writes to a thermostat made within a short window.
+
+    Fields written with PUT are merged into a single request, a later value for
+    a field replaces the earlier one. Pausing has its own endpoint, so only the
+    last pause state is sent. Requests are sent in the order they were last
+    changed, and every caller waits for (and shares the result of) the batch.
+    If the task sending a batch is cancelled, e.g. on unload, its callers get
+    an error.
+    """
+
+    def __init__(
+        self,
+        api: ThermosmartApi,
+        path: str,
+        delay: float,
+        create_task: TaskFactory | None = None,
+    ) -> None:
+        """Initialize the queue."""
+        self._api = api
+        self._path = path
+        self._delay = delay
+        self._create_task = create_task or (
+            lambda coro, name: asyncio.create_task(coro, name=name)
+        )
+        self._commands: dict[str, Any] = {}
+        self._future: asyncio.Future[None] | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    async def put(self, data: dict[str, Any]) -> None:
+        """Queue fields to be written and wait until they are sent."""
+        fields = {**self._commands.pop("put", {}), **data}
+        self._commands["put"] = fields
+        await self._schedule()
+
+    async def pause(self, pause: bool) -> None:
+        """Queue a pause state and wait until it is sent."""
+        self._commands.pop("pause", None)
+        self._commands["pause"] = pause
+        await self._schedule()
+
+    def _schedule(self) -> asyncio.Future[None]:
+        """Return the future of the pending batch, starting one if needed."""
+        if self._future is None:
+            self._future = asyncio.get_running_loop().create_future()
+            self._task = self._create_task(
+                self._async_flush(), f"thermosmart commands {self._path}"
+            )
+            self._task.add_done_callback(partial(self._task_done, self._future))
+        return asyncio.shield(self._future)
+
+    def close(self) -> None:
+        """Cancel the pending batch, failing its callers."""
+        if self._task is not None:
+            self._task.cancel()
+
+    def _task_done(
+        self, future: asyncio.Future[None], _task: asyncio.Task[None]
+    ) -> None:
+        """Fail the callers of a batch that was not sent."""
+        if self._future is future:
+            self._commands, self._future, self._task = {}, None, None
+        if not future.done():
+            future.set_exception(
+                ThermosmartApiError("Sending the commands was cancelled.")
+            )
+
+    async def _async_flush(self) -> None:
+        """Send the collected commands after the delay."""
+        await asyncio.sleep(self._delay)
+        commands, future = self._commands, self._future
+        self._commands, self._future, self._task = {}, None, None
+
+        _LOGGER.debug("Sending commands to %s: %s", self._path, commands)
+        try:
+            for command, value in commands.items():
+                if command == "pause":
+                    await self._api.post(self._path + "/pause", {"pause": value})
+                else:
+                    await self._api.put(self._path, value)
+        except Exception as err:  # pylint: disable=broad-except
+            future.set_exception(err)
+        else:
+            future.set_result(None)
+
+
+class ThermosmartDevice(BaseThermosmartDevice):
+    """Thermosmart thermostat with awaitable I/O.
+
+    The data model, OpenTherm conversion and webhook processing are inherited
+    from thermosmart_hass, only the requests are replaced by aiohttp calls.
+    """
+
+    _api: ThermosmartApi
+
+    def __init__(
+        self,
+        api: ThermosmartApi,
+        device_id: str,
+        command_delay: float = COMMAND_DELAY,
+        create_task: TaskFactory | None = None,
+    ) -> None:
+        """Initialize the thermostat."""
+        super().__init__(api=api, device_id=device_id)
+        self._commands = CommandQueue(api, self._path, command_delay, create_task)
+
+    def close(self) -> None:
+        """Stop sending queued commands."""
+        self._commands.close()
+
+    @property
+    def _path(self) -> str:
+        return "/thermostat/" + self.device_id
+
+    async def get_thermostat(self) -> dict[str, Any]:
+        """Fetch the thermostat state and decode the OpenTherm data."""
+        result = await self._api.get(self._path)
+        if not isinstance(result, dict) or not result:
+            raise ThermosmartApiError(f"Invalid thermostat data: {result!r}")
+        if result.get("ot") and result["ot"]["enabled"]:
+            result["ot"]["readable"] = self.convert_ot_data(result["ot"]["raw"])
+        self.data = result
+        return result
+
+    def process_webhook(self, message: dict[str, Any]) -> None:
+        """Apply a webhook message, leaving the data unchanged if it fails.
+
+        The message is applied to a copy, so a message that can only be
+        applied partly does not change data that is not published.
+        """
+        data = self.data
+        self.data = copy.deepcopy(data)
+        try:
+            super().process_webhook(message)
+        except Exception:
+            self.data = data
+            raise
+
+    async def set_target_temperature(self, temperature: float) -> None:
+        """Set the target temperature."""
+        await self._commands.put({"target_temperature": temperature})
+
+    async def set_exceptions(self, exceptions: list[dict[str, Any]]) -> None:
+        """Replace the exceptions to the week schedule."""
+        await self._commands.put({"exceptions": exceptions})
+
+    async def set_schedule(self, schedule: list[dict[str, Any]]) -> None:
+        """Replace the week schedule."""
+        await self._commands.put({"schedule": schedule})
+
+    async def pause_thermostat(self, pause: bool) -> None:
+        """Pause or resume the thermostat."""
+        await self._commands.pause(pause)
+
+    async def webhook(self, webhook: str) -> None:
+        """Register a webhook url."""
+        await self._api.set_webhook(webhook)
@@ -0,0 +1,85 @@
+"""Access token management for the Thermosmart API."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any
+
+from aiohttp import ClientError, ClientResponseError
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.config_entry_oauth2_flow import OAuth2Session
+
+from .api import AbstractAuth, ThermosmartAuthError, ThermosmartUnavailableError
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ConfigEntryAuth(AbstractAuth):
+    """Token of a config entry, kept in memory and renewed when rejected.
+
+    Thermosmart tokens do not expire, but they can be revoked or rotated. A
+    rejected token is renewed with the refresh token (once for all requests
+    that were rejected at the same time) and saved in the config entry. If
+    that fails, no more requests are made and a reauth flow is started.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, entry: ConfigEntry, session: OAuth2Session
+    ) -> None:
+        """Initialize the token manager."""
+        self._hass = hass
+        # Moves to another entry of the account when this one is unloaded
+        self.entry = entry
+        self._session = session
+        self._token: dict[str, Any] = session.token
+        self._lock = asyncio.Lock()
+        self._failed = False
+
+    async def async_get_access_token(self) -> str:
+        """Return the current access token."""
+        if self._failed:
+            raise ThermosmartAuthError("Reauthentication required.")
+        return self._token["access_token"]
+
+    async def async_renew_token(self, rejected: str) -> None:
+        """Renew a rejected token, start a reauth flow if that fails.
+
+        Raises ThermosmartAuthError if the token cannot be renewed.
+        """
+        async with self._lock:
+            if self._failed:
+                raise ThermosmartAuthError("Reauthentication required.")
+            if self._token["access_token"] != rejected:
+                # Already renewed for another request
+                return
+
+            if "refresh_token" not in self._token:
+                self._failed = True
+                self.entry.async_start_reauth(self._hass)
+                raise ThermosmartAuthError("Reauthentication required.")
+
+            _LOGGER.debug("Access token rejected, renewing it")
+            try:
+                token = await self._session.implementation.async_refresh_token(
+                    self._token
+                )
+            except ClientResponseError as err:
+                if err.status >= 500:
+                    raise ThermosmartUnavailableError(
+                        f"Could not renew access token: {err}"
+                    ) from err
+                self._failed = True
+                _LOGGER.warning("Thermosmart access token revoked, please reauthenticate")
+                self.entry.async_start_reauth(self._hass)
+                raise ThermosmartAuthError("Access token could not be renewed.") from err
+            except (ClientError, asyncio.TimeoutError) as err:
+                raise ThermosmartUnavailableError(
+                    f"Could not renew access token: {err}"
+                ) from err
+
+            self._token = token
+            self._hass.config_entries.async_update_entry(
+                self.entry, data={**self.entry.data, "token": token}
+            )
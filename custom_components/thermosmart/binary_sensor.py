@@ -0,0 +1,189 @@
+"""
+Support for Thermosmart binary sensors (boiler status).
+
+For more details about this platform, please refer to the documentation at
+https://home-assistant.io/components/thermosmart/
+"""
+
+from collections.abc import Mapping
+from typing import Any
+
+from .const import DOMAIN, SIGNAL_OPTIONS_UPDATED
+from .entity import ThermosmartEntity, device_name, opentherm_devices
+from .model import OT_INDEX
+from .rules import RuleEngine, compile_rules
+from . import ThermosmartCoordinator
+
+from homeassistant.components.binary_sensor import (
+    BinarySensorDeviceClass,
+    BinarySensorEntity,
+    BinarySensorEntityDescription,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+
+def _status(
+    key: str, device_class: BinarySensorDeviceClass | None = None
+) -> BinarySensorEntityDescription:
+    return BinarySensorEntityDescription(
+        key=key,
+        translation_key=key.lower(),
+        device_class=device_class,
+        entity_registry_enabled_default=False,
+    )
+
+
+def _config(key: str) -> BinarySensorEntityDescription:
+    return BinarySensorEntityDescription(
+        key=key,
+        translation_key=key.lower(),
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+    )
+
+
+# Binary OpenTherm status and configuration flags decoded by thermosmart_hass
+BINARY_SENSOR_TYPES: tuple[BinarySensorEntityDescription, ...] = (
+    _status("CH_enabled", BinarySensorDeviceClass.HEAT),
+    _status("DHW_enabled", BinarySensorDeviceClass.HEAT),
+    _status("Cooling_enabled", BinarySensorDeviceClass.COLD),
+    _status("OTC_active"),
+    _status("CH2_enabled", BinarySensorDeviceClass.HEAT),
+    _status("Summer_winter_mode"),
+    _status("DHW_blocked"),
+    _config("DHW_present"),
+    _config("Cooling_config"),
+    _config("pump_control"),
+    _config("CH2_present"),
+    _config("remote_water_fill"),
+)
+
+
+# Alerts of the rules of rules.py, keyed by rule
+ALERT_TYPES: tuple[BinarySensorEntityDescription, ...] = tuple(
+    BinarySensorEntityDescription(
+        key=key,
+        translation_key=key,
+        device_class=BinarySensorDeviceClass.PROBLEM,
+    )
+    for key in ("low_water_pressure", "boiler_fault", "setpoint_tracking")
+)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Set up the Thermosmart binary sensors."""
+
+    coordinator: ThermosmartCoordinator = hass.data[DOMAIN].entries[config_entry.entry_id]
+
+    entities: list[BinarySensorEntity] = [
+        ThermosmartBinarySensor(
+            coordinator, device_id, device_name(config_entry, device_id), description
+        )
+        for device_id, readable in opentherm_devices(coordinator).items()
+        for description in BINARY_SENSOR_TYPES
+        if description.key in readable
+    ]
+
+    engine = RuleEngine(hass, coordinator, compile_rules(config_entry.options))
+    config_entry.async_on_unload(engine.async_start())
+
+    @callback
+    def async_options_updated(options: Mapping[str, Any]) -> None:
+        """Apply changed thresholds to the rules."""
+        engine.async_set_rules(compile_rules(options))
+
+    config_entry.async_on_unload(
+        async_dispatcher_connect(
+            hass,
+            SIGNAL_OPTIONS_UPDATED.format(config_entry.entry_id),
+            async_options_updated,
+        )
+    )
+
+    # Alerts for the rules of which the thermostat reports the value
+    rules = {rule.key: rule for rule in engine.rules}
+    for device_id, snapshot in coordinator.snapshots.items():
+        for description in ALERT_TYPES:
+            if rules[description.key].value(snapshot) is not None:
+                entities.append(
+                    ThermosmartAlertBinarySensor(
+                        coordinator,
+                        engine,
+                        device_id,
+                        device_name(config_entry, device_id),
+                        description,
+                    )
+                )
+
+    async_add_entities(entities)
+
+
+class ThermosmartBinarySensor(ThermosmartEntity, BinarySensorEntity):
+    """Representation of a Thermosmart binary sensor."""
+
+    def __init__(
+        self,
+        coordinator: ThermosmartCoordinator,
+        device_id: str,
+        name: str,
+        description: BinarySensorEntityDescription,
+    ):
+        """Initialize the binary sensor."""
+        super().__init__(
+            coordinator, device_id, name, [("ot", "readable", description.key)]
+        )
+
+        self.entity_description = description
+        self._attr_unique_id = device_id + "_" + description.key
+        self._index = OT_INDEX[description.key]
+
+    @property
+    def is_on(self):
+        """Return the state of the binary sensor."""
+        ot = self.snapshot.ot
+        return None if ot is None else ot[self._index]
+
+
+class ThermosmartAlertBinarySensor(ThermosmartEntity, BinarySensorEntity):
+    """Binary sensor that is on while a rule of a thermostat is active."""
+
+    def __init__(
+        self,
+        coordinator: ThermosmartCoordinator,
+        engine: RuleEngine,
+        device_id: str,
+        name: str,
+        description: BinarySensorEntityDescription,
+    ):
+        """Initialize the binary sensor.
+
+        The state follows the rule engine, which only reports changes of the
+        state of the rule rather than of the values it checks.
+        """
+        super().__init__(coordinator, device_id, name, [])
+
+        self._engine = engine
+        self.entity_description = description
+        self._attr_unique_id = device_id + "_" + description.key
+
+    async def async_added_to_hass(self) -> None:
+        """Listen for changes of the rule."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self._engine.async_add_listener(
+                self._device_id, self.entity_description.key, self.async_write_ha_state
+            )
+        )
+
+    @property
+    def is_on(self):
+        """Return if the rule is active."""
+        return self._engine.states.get((self._device_id, self.entity_description.key))
@@ -4,6 +4,7 @@ Support for Thermosmart thermostats.
 For more details about this platform, please refer to the documentation at
 https://home-assistant.io/components/thermosmart/
 """
+from datetime import date, datetime
 import logging
 import voluptuous as vol
 
@@ -13,17 +14,24 @@ from homeassistant.components.climate.const import (
     HVACMode,
     PRESET_AWAY,
     PRESET_NONE,
-    HVACAction,
 )
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import ATTR_TEMPERATURE, TEMP_CELSIUS
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers import config_validation as cv, entity_platform
-from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.util import dt as dt_util
 
 from .const import DOMAIN
+from .entity import ThermosmartEntity, device_name
+from .schedule import (
+    DAYS,
+    ExceptionIndex,
+    ScheduleException,
+    WeekSchedule,
+    round_to_quarter,
+)
 from . import ThermosmartCoordinator
 
 _LOGGER = logging.getLogger(__name__)
@@ -32,6 +40,85 @@ SUPPORT_FLAGS = (
     ClimateEntityFeature.TARGET_TEMPERATURE | ClimateEntityFeature.PRESET_MODE
 )
 
+# Data read by the thermostat entity
+DATA_PATHS = (
+    ("room_temperature",),
+    ("target_temperature",),
+    ("source",),
+    ("ot", "readable", "CH_enabled"),
+    ("ot", "readable", "Cooling_enabled"),
+)
+
+PROGRAMS = ["anti_freeze", "not_home", "home", "comfort"]
+SCHEDULE_PROGRAMS = [*PROGRAMS, "pause"]
+
+
+def _valid_period(value: dict) -> dict:
+    """Check that an exception ends after it starts."""
+    if value["end"] <= value["start"]:
+        raise vol.Invalid("The end of an exception must be after its start")
+    return value
+
+
+def _valid_day(value: list) -> list:
+    """Check that the program changes of a day are on distinct quarters."""
+    starts = [block["start"] for block in value]
+    for start in starts:
+        if start.minute % 15 or start.second or start.microsecond:
+            raise vol.Invalid(f"Program changes must be on a quarter hour: {start}")
+    if len(set(starts)) != len(starts):
+        raise vol.Invalid("Multiple program changes at the same time")
+    return value
+
+
+SCHEDULE_SCHEMA = vol.All(
+    {
+        vol.Optional(day): vol.All(
+            cv.ensure_list,
+            [
+                {
+                    vol.Required("start"): cv.time,
+                    vol.Required("program"): vol.In(SCHEDULE_PROGRAMS),
+                }
+            ],
+            vol.Length(min=1),
+            _valid_day,
+        )
+        for day in DAYS
+    },
+    cv.has_at_least_one_key(*DAYS),
+)
+
+EXCEPTION_SCHEMA = vol.All(
+    {
+        vol.Required("start"): cv.datetime,
+        vol.Required("end"): cv.datetime,
+        vol.Required("program"): vol.In(PROGRAMS),
+    },
+    _valid_period,
+)
+
+# Service schemas, built once when the platform is loaded
+ADD_EXCEPTION_SCHEMA = cv.make_entity_service_schema(
+    {
+        vol.Required("start_day"): vol.All(cv.positive_int, vol.Range(min=1, max=31)),
+        vol.Required("start_month"): vol.All(cv.positive_int, vol.Range(min=1, max=12)),
+        vol.Required("start_year"): cv.positive_int,
+        vol.Required("start_time"): cv.time,
+        vol.Required("end_day"): vol.All(cv.positive_int, vol.Range(min=1, max=31)),
+        vol.Required("end_month"): vol.All(cv.positive_int, vol.Range(min=1, max=12)),
+        vol.Required("end_year"): cv.positive_int,
+        vol.Required("end_time"): cv.time,
+        vol.Required("program"): vol.All(cv.string, vol.In(PROGRAMS)),
+    }
+)
+EXCEPTIONS_SCHEMA = cv.make_entity_service_schema(
+    {vol.Required("exceptions"): vol.All(cv.ensure_list, [EXCEPTION_SCHEMA])}
+)
+SET_SCHEDULE_SCHEMA = cv.make_entity_service_schema(
+    {vol.Required("schedule"): SCHEDULE_SCHEMA}
+)
+
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -40,71 +127,64 @@ async def async_setup_entry(
 ) -> None:
     """Set up the Thermosmart thermostat."""
 
-    coordinator = hass.data[DOMAIN].get(config_entry.entry_id)
-    unique_id = config_entry.unique_id
-    assert unique_id is not None
-    name = config_entry.data["name"]
+    coordinator: ThermosmartCoordinator = hass.data[DOMAIN].entries[config_entry.entry_id]
 
-    thermostat = ThermosmartThermostat(coordinator, unique_id, name)
-    async_add_entities([thermostat], update_before_add=True)
+    async_add_entities(
+        [
+            ThermosmartThermostat(
+                coordinator,
+                device_id,
+                device_name(config_entry, device_id),
+            )
+            for device_id in coordinator.devices
+        ]
+    )
 
     platform = entity_platform.async_get_current_platform()
     platform.async_register_entity_service(
-        "add_exception",
-        {
-            vol.Required("start_day"): vol.All(
-                cv.positive_int, vol.Range(min=1, max=31)
-            ),
-            vol.Required("start_month"): vol.All(
-                cv.positive_int, vol.Range(min=1, max=12)
-            ),
-            vol.Required(
-                "start_year",
-            ): cv.positive_int,
-            vol.Required("start_time"): cv.time,
-            vol.Required("end_day"): vol.All(cv.positive_int, vol.Range(min=1, max=31)),
-            vol.Required("end_month"): vol.All(
-                cv.positive_int, vol.Range(min=1, max=12)
-            ),
-            vol.Required(
-                "end_year",
-            ): cv.positive_int,
-            vol.Required("end_time"): cv.time,
-            vol.Required("program"): vol.All(
-                cv.string, vol.In(["anti_freeze", "not_home", "home", "comfort"])
-            ),
-        },
-        "add_exception",
+        "add_exception", ADD_EXCEPTION_SCHEMA, "add_exception"
+    )
+
+    platform.async_register_entity_service(
+        "add_exceptions", EXCEPTIONS_SCHEMA, "add_exceptions"
+    )
+
+    platform.async_register_entity_service(
+        "set_exceptions", EXCEPTIONS_SCHEMA, "set_exceptions"
     )
 
     platform.async_register_entity_service("clear_exceptions", {}, "clear_exceptions")
 
+    platform.async_register_entity_service(
+        "get_schedule",
+        {},
+        "get_schedule",
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    platform.async_register_entity_service(
+        "set_schedule", SET_SCHEDULE_SCHEMA, "set_schedule"
+    )
+
 
-class ThermosmartThermostat(CoordinatorEntity[ThermosmartCoordinator], ClimateEntity):
+class ThermosmartThermostat(ThermosmartEntity, ClimateEntity):
     """Representation of a Thermosmart thermostat."""
 
     _attr_supported_features = SUPPORT_FLAGS
     _attr_temperature_unit = TEMP_CELSIUS
     _attr_preset_modes = [PRESET_AWAY, PRESET_NONE]
-    _attr_has_entity_name = True
     _attr_name = None
     _attr_translation_key = "thermosmart"
 
-    def __init__(self, coordinator: ThermosmartCoordinator, unique_id: str, name: str):
+    def __init__(self, coordinator: ThermosmartCoordinator, device_id: str, name: str):
         """Initialize the thermostat."""
-        super().__init__(coordinator)
+        super().__init__(coordinator, device_id, name, DATA_PATHS)
 
-        self._attr_device_info = DeviceInfo(
-            identifiers={(DOMAIN, unique_id)},
-            manufacturer="Thermosmart",
-            model="V3",
-            name=name,
-        )
-        self._attr_unique_id = unique_id + "_climate"
-        if self.coordinator.data.get("ot"):
+        self._attr_unique_id = device_id + "_climate"
+        if self.snapshot.ot is not None:
             self._attr_hvac_modes = (
                 [HVACMode.AUTO, HVACMode.HEAT, HVACMode.COOL]
-                if self.coordinator.data["ot"]["readable"]["Cooling_config"]
+                if self.snapshot.ot_value("Cooling_config")
                 else [HVACMode.AUTO, HVACMode.HEAT]
             )
         else:
@@ -112,57 +192,42 @@ class ThermosmartThermostat(CoordinatorEntity[ThermosmartCoordinator], ClimateEn
                 HVACMode.AUTO,
                 HVACMode.HEAT,
             ]  # Default if no Opentherm info available.
-        self._exceptions = self.coordinator.data["exceptions"]
+        self._exception_index = ExceptionIndex()
+        self._schedule_source = None
+        self._schedule = WeekSchedule(())
 
     @property
     def current_temperature(self):
-        return self.coordinator.data["room_temperature"]
+        return self.snapshot.room_temperature
 
     @property
     def target_temperature(self):
-        return self.coordinator.data["target_temperature"]
+        return self.snapshot.target_temperature
 
     @property
     def preset_mode(self):
-        return (
-            PRESET_AWAY if self.coordinator.data["source"] == "pause" else PRESET_NONE
-        )
+        return self.snapshot.preset_mode
 
     @property
     def hvac_mode(self):
         """Return current operation."""
-        if (
-            self.coordinator.data["source"] == "remote"
-            or self.coordinator.data["source"] == "manual"
-        ):
-            return HVACMode.HEAT
-        elif (
-            self.coordinator.data["source"] == "schedule"
-            or self.coordinator.data["source"] == "exception"
-        ):
-            return HVACMode.AUTO
+        return self.snapshot.hvac_mode
 
     @property
     def hvac_action(self):
         """Return the current running hvac operation if supported."""
-        if self.coordinator.data.get("ot"):
-            # Find current HVAC action
-            if self.coordinator.data["ot"]["readable"]["CH_enabled"]:
-                return HVACAction.HEATING
-            elif self.coordinator.data["ot"]["readable"]["Cooling_enabled"]:
-                return HVACAction.COOLING
-            else:
-                return HVACAction.IDLE
+        return self.snapshot.hvac_action
 
     async def async_set_temperature(self, **kwargs):
         """Set new target temperature."""
         temperature = kwargs.get(ATTR_TEMPERATURE)
         if temperature is None:
             return
-        await self.hass.async_add_executor_job(
-            self.coordinator.client.set_target_temperature, temperature
+        await self.coordinator.async_write(
+            self._device_id,
+            {"target_temperature": temperature, "source": "remote"},
+            lambda: self.device.set_target_temperature(temperature),
         )
-        await self.coordinator.async_request_refresh()
 
     async def async_set_preset_mode(self, preset_mode: str) -> None:
         """Activate a preset."""
@@ -170,28 +235,34 @@ class ThermosmartThermostat(CoordinatorEntity[ThermosmartCoordinator], ClimateEn
             return
 
         if preset_mode == PRESET_AWAY:
-            await self.hass.async_add_executor_job(
-                self.coordinator.client.pause_thermostat, True
+            await self.coordinator.async_write(
+                self._device_id,
+                {"source": "pause"},
+                lambda: self.device.pause_thermostat(True),
             )
 
         if preset_mode == PRESET_NONE:
-            await self.hass.async_add_executor_job(
-                self.coordinator.client.pause_thermostat, False
+            await self.coordinator.async_write(
+                self._device_id,
+                {"source": "schedule"},
+                lambda: self.device.pause_thermostat(False),
             )
 
-        await self.coordinator.async_request_refresh()
-
     async def async_set_hvac_mode(self, hvac_mode):
         """Set new target hvac mode."""
         if hvac_mode == HVACMode.AUTO:
-            await self.hass.async_add_executor_job(
-                self.coordinator.client.pause_thermostat, False
+            await self.coordinator.async_write(
+                self._device_id,
+                {"source": "schedule"},
+                lambda: self.device.pause_thermostat(False),
             )
         elif (hvac_mode == HVACMode.HEAT) or (hvac_mode == HVACMode.COOL):
-            await self.hass.async_add_executor_job(
-                self.coordinator.client.set_target_temperature, self.target_temperature
+            temperature = self.target_temperature
+            await self.coordinator.async_write(
+                self._device_id,
+                {"source": "remote"},
+                lambda: self.device.set_target_temperature(temperature),
             )
-        await self.coordinator.async_request_refresh()
 
     # Define service-calls
     async def add_exception(
@@ -206,37 +277,113 @@ class ThermosmartThermostat(CoordinatorEntity[ThermosmartCoordinator], ClimateEn
         end_time,
         program,
     ):
-        """Add exceptions to the current list."""
-        exceptions = self._exceptions
-
-        new_exception = {
-            "start": [
-                start_year,
-                start_month - 1,
-                start_day,
-                start_time.hour,
-                round(start_time.minute / 15) * 15,
-            ],
-            "end": [
-                end_year,
-                end_month - 1,
-                end_day,
-                end_time.hour,
-                round(end_time.minute / 15) * 15,
-            ],
-            "temperature": program,
-        }
+        """Add an exception to the current list."""
+        try:
+            start = datetime.combine(
+                date(start_year, start_month, start_day), start_time
+            )
+            end = datetime.combine(date(end_year, end_month, end_day), end_time)
+        except ValueError as err:
+            raise HomeAssistantError(f"Invalid exception date: {err}") from err
+
+        await self.add_exceptions(
+            [{"start": start, "end": end, "program": program}]
+        )
 
-        exceptions.append(new_exception)
+    async def add_exceptions(self, exceptions):
+        """Add exceptions to the current list in one upload."""
+        self._exception_index.sync(self.device_data["exceptions"])
+        await self._async_write_exceptions(
+            self._exception_index.add(_schedule_exceptions(exceptions), _now())
+        )
 
-        await self.hass.async_add_executor_job(
-            self.coordinator.client.set_exceptions, exceptions
+    async def set_exceptions(self, exceptions):
+        """Replace the exceptions in one upload."""
+        self._exception_index.sync(self.device_data["exceptions"])
+        await self._async_write_exceptions(
+            self._exception_index.replace(_schedule_exceptions(exceptions), _now())
         )
-        await self.coordinator.async_request_refresh()
 
     async def clear_exceptions(self):
         """Clear all exceptions."""
-        await self.hass.async_add_executor_job(
-            self.coordinator.client.set_exceptions, []
+        await self.set_exceptions([])
+
+    async def _async_write_exceptions(self, exceptions):
+        """Upload the exceptions, if they changed."""
+        if exceptions is None:
+            _LOGGER.debug("Exceptions of %s unchanged, not uploading", self._device_id)
+            return
+
+        previous = self.device_data["exceptions"]
+        await self.coordinator.async_write(
+            self._device_id,
+            {"exceptions": exceptions},
+            lambda: self.device.set_exceptions(exceptions),
+        )
+        if not self.coordinator.optimistic:
+            # Build on the upload until the refreshed data includes it
+            self._exception_index.keep(previous)
+
+    def _week_schedule(self) -> WeekSchedule:
+        """Return the week schedule, converted once per schedule update."""
+        blocks = self.device_data.get("schedule") or []
+        if blocks is not self._schedule_source:
+            self._schedule_source = blocks
+            self._schedule = WeekSchedule.from_api(blocks)
+        return self._schedule
+
+    async def get_schedule(self):
+        """Return the week schedule."""
+        return {"schedule": self._week_schedule().as_days()}
+
+    async def set_schedule(self, schedule):
+        """Replace the program changes of the given days of the week schedule."""
+        current = self._week_schedule()
+        new = current.with_days(
+            {
+                day: [(block["start"], block["program"]) for block in blocks]
+                for day, blocks in schedule.items()
+            }
+        )
+        if new == current:
+            _LOGGER.debug("Schedule of %s unchanged, not uploading", self._device_id)
+            return
+
+        _LOGGER.debug(
+            "Uploading schedule of %s, changed: %s",
+            self._device_id,
+            current.changed_days(new),
+        )
+        blocks = new.as_api()
+        previous = self._schedule_source
+        await self.coordinator.async_write(
+            self._device_id,
+            {"schedule": blocks},
+            lambda: self.device.set_schedule(blocks),
         )
-        await self.coordinator.async_request_refresh()
+        # Build on the upload until the refreshed data includes it
+        self._schedule = new
+        self._schedule_source = blocks if self.coordinator.optimistic else previous
+
+
+def _now() -> datetime:
+    """Return the local time of the thermostat."""
+    return dt_util.now().replace(tzinfo=None)
+
+
+def _local(value: datetime) -> datetime:
+    """Return a time on a quarter of an hour in local time."""
+    if value.tzinfo is not None:
+        value = dt_util.as_local(value).replace(tzinfo=None)
+    return round_to_quarter(value)
+
+
+def _schedule_exceptions(exceptions) -> list[ScheduleException]:
+    """Convert validated service data to exceptions."""
+    result = []
+    for exception in exceptions:
+        start, end = _local(exception["start"]), _local(exception["end"])
+        # Periods shorter than a quarter are lost by the rounding
+        if end > start:
+            result.append(ScheduleException(start, end, exception["program"]))
+    return result
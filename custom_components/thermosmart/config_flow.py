@@ -1,18 +1,34 @@
 """Config flow for Thermosmart."""
 from __future__ import annotations
 import logging
+from collections.abc import Mapping
 from typing import Any
 import voluptuous as vol
 
-from thermosmart_hass import thermosmart_api as Api
-
 from homeassistant import config_entries
 from homeassistant.config_entries import ConfigEntry, CONN_CLASS_CLOUD_POLL
 from homeassistant.core import callback
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.helpers import config_entry_oauth2_flow
-
-from .const import DOMAIN, CONF_WEBHOOK, CONF_WEBHOOK_OLD
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+
+from .api import ThermosmartApi, ThermosmartApiError
+from .const import (
+    DOMAIN,
+    CONF_BOILER_POWER,
+    CONF_MIN_WATER_PRESSURE,
+    CONF_OPTIMISTIC,
+    CONF_PUSH,
+    CONF_SENSOR_STATES,
+    CONF_STATISTICS,
+    CONF_TRACE,
+    CONF_TRACKING_ERROR,
+    CONF_WEBHOOK,
+    CONF_WEBHOOK_OLD,
+)
+from .derived import DEFAULT_BOILER_POWER
+from .registry import ThermosmartRegistry
+from .rules import DEFAULT_MIN_WATER_PRESSURE, DEFAULT_TRACKING_ERROR
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -23,6 +39,8 @@ class ThermosmartFlowHandler(config_entry_oauth2_flow.AbstractOAuth2FlowHandler,
     VERSION = 1
     CONNECTION_CLASS = CONN_CLASS_CLOUD_POLL
 
+    reauth_entry: ConfigEntry | None = None
+
     @property
     def logger(self) -> logging.Logger:
         """Return logger."""
@@ -34,18 +52,42 @@ class ThermosmartFlowHandler(config_entry_oauth2_flow.AbstractOAuth2FlowHandler,
         """Thermosmart options callback."""
         return ThermosmartOptionsFlow(config_entry)
 
+    async def async_step_reauth(self, entry_data: Mapping[str, Any]) -> FlowResult:
+        """Perform reauth after the token was revoked."""
+        self.reauth_entry = self.hass.config_entries.async_get_entry(
+            self.context["entry_id"]
+        )
+        return await self.async_step_reauth_confirm()
+
+    async def async_step_reauth_confirm(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Confirm reauth."""
+        if user_input is None:
+            return self.async_show_form(step_id="reauth_confirm")
+        return await self.async_step_user()
+
     async def async_oauth_create_entry(self, data: dict[str, Any]) -> FlowResult:
         """Create an entry for thermosmart."""
-        thermosmart = Api.ThermosmartApi(token=data["token"])
+        thermosmart = ThermosmartApi(async_get_clientsession(self.hass), data["token"])
 
         try:
-            id =  await self.hass.async_add_executor_job(thermosmart.get_thermostat_id)
-        except Exception:
+            id = await thermosmart.get_thermostat_id()
+        except ThermosmartApiError:
             return self.async_abort(reason="connection_error")
 
+        if self.reauth_entry:
+            if self.reauth_entry.unique_id != id:
+                return self.async_abort(reason="wrong_account")
+            return self.async_update_reload_and_abort(
+                self.reauth_entry,
+                data={**self.reauth_entry.data, "token": data["token"]},
+            )
+
         data["id"] = id
         data["name"] = "Thermosmart"
 
+        # Entries of the same account share one coordinator
         await self.async_set_unique_id(id)
 
         return self.async_create_entry(title='Thermosmart', data=data)
@@ -57,10 +99,28 @@ class ThermosmartOptionsFlow(config_entries.OptionsFlow):
         """Initialze the Thermosmart options flow."""
         self.entry = entry
         self.webhook = entry.options.get(CONF_WEBHOOK, None)
+        self.optimistic = entry.options.get(CONF_OPTIMISTIC, False)
+        self.statistics = entry.options.get(CONF_STATISTICS, False)
+        self.sensor_states = entry.options.get(CONF_SENSOR_STATES, True)
+        self.boiler_power = entry.options.get(CONF_BOILER_POWER, DEFAULT_BOILER_POWER)
+        self.min_water_pressure = entry.options.get(
+            CONF_MIN_WATER_PRESSURE, DEFAULT_MIN_WATER_PRESSURE
+        )
+        self.tracking_error = entry.options.get(
+            CONF_TRACKING_ERROR, DEFAULT_TRACKING_ERROR
+        )
+        self.trace = entry.options.get(CONF_TRACE, False)
         _LOGGER.debug(self.webhook)
 
     async def async_step_init(self, _user_input=None):
-        """Manage the options."""
+        """Manage the options, only of the entry that owns the coordinator."""
+        registry: ThermosmartRegistry | None = self.hass.data.get(DOMAIN)
+        if (
+            registry is not None
+            and self.entry.entry_id in registry.entries
+            and not registry.async_is_owner(self.entry.entry_id)
+        ):
+            return self.async_abort(reason="not_owner")
         return await self.async_step_user()
 
     async def async_step_user(
@@ -68,16 +128,39 @@ class ThermosmartOptionsFlow(config_entries.OptionsFlow):
     ) -> FlowResult:
         """Handle a flow initialized by the user."""
         if user_input is not None:
-            data = user_input
+            data = dict(user_input)
             data[CONF_WEBHOOK_OLD] = self.webhook
-            data[CONF_WEBHOOK] = None if data[CONF_WEBHOOK] == 'None' else data[CONF_WEBHOOK]
+            data[CONF_WEBHOOK] = None
+            if data.pop(CONF_PUSH):
+                # The webhook is registered with the cloud by the integration,
+                # an existing id is kept so its url stays the same
+                from homeassistant.components.webhook import (  # pylint: disable=import-outside-toplevel
+                    async_generate_id,
+                )
+
+                data[CONF_WEBHOOK] = self.webhook or async_generate_id()
             return self.async_create_entry(title="Thermosmart", data=data)
 
         return self.async_show_form(
             step_id="user", 
             data_schema=vol.Schema(
                 {
-                    vol.Optional(CONF_WEBHOOK, default=self.webhook): str, 
+                    vol.Optional(CONF_PUSH, default=self.webhook is not None): bool,
+                    vol.Optional(CONF_OPTIMISTIC, default=self.optimistic): bool,
+                    vol.Optional(CONF_STATISTICS, default=self.statistics): bool,
+                    vol.Optional(
+                        CONF_SENSOR_STATES, default=self.sensor_states
+                    ): bool,
+                    vol.Optional(
+                        CONF_BOILER_POWER, default=self.boiler_power
+                    ): vol.All(vol.Coerce(float), vol.Range(min=1, max=100)),
+                    vol.Optional(
+                        CONF_MIN_WATER_PRESSURE, default=self.min_water_pressure
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0.1, max=5)),
+                    vol.Optional(
+                        CONF_TRACKING_ERROR, default=self.tracking_error
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0.5, max=10)),
+                    vol.Optional(CONF_TRACE, default=self.trace): bool,
                 }
             )
         ) 
\ No newline at end of file
@@ -1,3 +1,12 @@
 DOMAIN = 'thermosmart'
 CONF_WEBHOOK = 'webhook'
-CONF_WEBHOOK_OLD = 'webhook_old'
\ No newline at end of file
+CONF_WEBHOOK_OLD = 'webhook_old'
+CONF_OPTIMISTIC = 'optimistic'
+CONF_PUSH = 'push'
+CONF_STATISTICS = 'statistics'
+CONF_SENSOR_STATES = 'sensor_states'
+CONF_BOILER_POWER = 'boiler_power'
+CONF_TRACE = 'trace'
+SIGNAL_OPTIONS_UPDATED = 'thermosmart_options_updated_{}'
+CONF_MIN_WATER_PRESSURE = 'min_water_pressure'
+CONF_TRACKING_ERROR = 'tracking_error'
@@ -0,0 +1,168 @@
+"""Burner runtime, duty cycle and energy derived from the OpenTherm values."""
+from __future__ import annotations
+
+import logging
+from math import exp
+from time import time
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+
+if TYPE_CHECKING:
+    from . import ThermosmartCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+STORAGE_SAVE_DELAY = 60
+# Nominal power of the boiler in kW at full modulation, if not configured
+DEFAULT_BOILER_POWER = 24.0
+# Time constant of the moving average of the heating duty cycle
+DUTY_CYCLE_WINDOW = 3600
+# Periods without data that are longer than this are not accounted
+MAX_SAMPLE_GAP = 7200
+
+
+class BurnerCounters:
+    """Counters of one boiler, updated in constant time per sample.
+
+    A sample holds until the next one: the time between two samples is
+    accounted to the state of the first. Runtime and energy only increase,
+    the duty cycle is an exponential moving average of the fraction of time
+    the boiler heats the central heating.
+    """
+
+    __slots__ = ("runtime", "energy", "duty_cycle", "_since", "_modulation", "_heating")
+
+    def __init__(
+        self, runtime: float = 0.0, energy: float = 0.0, duty_cycle: float = 0.0
+    ) -> None:
+        """Initialize the counters, runtime in seconds and energy in kWh."""
+        self.runtime = runtime
+        self.energy = energy
+        self.duty_cycle = duty_cycle
+        self._since: float | None = None
+        self._modulation = 0.0
+        self._heating = False
+
+    def add(
+        self,
+        timestamp: float,
+        modulation: float | None,
+        ch_enabled: bool,
+        power: float,
+    ) -> bool:
+        """Add a sample, None if unknown, return if the counters changed."""
+        changed = False
+        if self._since is not None and 0 < timestamp - self._since <= MAX_SAMPLE_GAP:
+            elapsed = timestamp - self._since
+            if self._modulation > 0:
+                self.runtime += elapsed
+                self.energy += power * self._modulation / 100 * elapsed / 3600
+                changed = True
+            weight = 1 - exp(-elapsed / DUTY_CYCLE_WINDOW)
+            duty_cycle = self.duty_cycle + (self._heating - self.duty_cycle) * weight
+            changed = changed or duty_cycle != self.duty_cycle
+            self.duty_cycle = duty_cycle
+
+        if modulation is None:
+            self._since = None
+            return changed
+        self._since = timestamp
+        self._modulation = modulation
+        # The burner is on while it modulates, for heating if CH is enabled
+        self._heating = modulation > 0 and ch_enabled
+        return changed
+
+    def as_dict(self) -> dict[str, float]:
+        """Return the counters to store."""
+        return {
+            "runtime": self.runtime,
+            "energy": self.energy,
+            "duty_cycle": self.duty_cycle,
+        }
+
+
+class DerivedCounters:
+    """Burner counters of the thermostats of a coordinator.
+
+    The counters are stored so they continue after a restart. Listeners are
+    notified after the coordinator data was sampled, if a counter changed.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        coordinator: ThermosmartCoordinator,
+        entry_id: str,
+        power: float = DEFAULT_BOILER_POWER,
+    ) -> None:
+        """Initialize the counters of an entry."""
+        self._coordinator = coordinator
+        self.power = power
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.derived"
+        )
+        self.devices: dict[str, BurnerCounters] = {}
+        self._listeners: list[CALLBACK_TYPE] = []
+        self._remove_listener: CALLBACK_TYPE | None = None
+
+    async def async_load(self, device_ids: list[str]) -> None:
+        """Load the stored counters of the thermostats."""
+        stored = (await self._store.async_load() or {}).get("devices", {})
+        for device_id in device_ids:
+            self.devices[device_id] = BurnerCounters(**stored.get(device_id, {}))
+        _LOGGER.debug("Loaded burner counters %s", stored)
+
+    @callback
+    def async_start(self) -> None:
+        """Start sampling the coordinator data."""
+        self._async_sample()
+        self._remove_listener = self._coordinator.async_add_listener(
+            self._async_sample
+        )
+
+    async def async_stop(self) -> None:
+        """Stop sampling and store the counters."""
+        if self._remove_listener is not None:
+            self._remove_listener()
+            self._remove_listener = None
+        await self._store.async_save(self._data_to_store())
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        """Listen for changes of the counters."""
+        self._listeners.append(update_callback)
+        return lambda: self._listeners.remove(update_callback)
+
+    @callback
+    def _async_sample(self) -> None:
+        """Add the values of the latest coordinator data."""
+        now = time()
+        changed = False
+        for device_id, counters in self.devices.items():
+            modulation = ch_enabled = None
+            snapshot = self._coordinator.snapshots.get(device_id)
+            if self._coordinator.last_update_success and snapshot is not None:
+                modulation = snapshot.ot_value("Modulation level")
+                ch_enabled = snapshot.ot_value("CH_enabled")
+            if not isinstance(modulation, int | float):
+                modulation = None
+            changed |= counters.add(now, modulation, bool(ch_enabled), self.power)
+
+        if changed:
+            self._store.async_delay_save(self._data_to_store, STORAGE_SAVE_DELAY)
+            for update_callback in list(self._listeners):
+                update_callback()
+
+    def _data_to_store(self) -> dict[str, Any]:
+        """Return the counters to store."""
+        return {
+            "devices": {
+                device_id: counters.as_dict()
+                for device_id, counters in self.devices.items()
+            }
+        }
@@ -0,0 +1,30 @@
+"""Diagnostics support for Thermosmart."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, CONF_WEBHOOK, CONF_WEBHOOK_OLD
+from . import ThermosmartCoordinator
+
+TO_REDACT = {"token", "access_token", "refresh_token", CONF_WEBHOOK, CONF_WEBHOOK_OLD}
+# Personal fields of the thermostat data
+TO_REDACT_DATA = {"location", "latitude", "longitude", "geofence_devices"}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator: ThermosmartCoordinator = hass.data[DOMAIN].entries[entry.entry_id]
+
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "update_interval": str(coordinator.update_interval),
+        "last_update_success": coordinator.last_update_success,
+        "metrics": coordinator.metrics.as_dict(),
+        "data": async_redact_data(coordinator.data, TO_REDACT_DATA),
+    }
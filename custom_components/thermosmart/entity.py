@@ -0,0 +1,88 @@
+"""Base entity for Thermosmart."""
+from __future__ import annotations
+
+from collections.abc import Iterable
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import callback
+from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .api import ThermosmartDevice
+from .const import DOMAIN
+from .model import ThermostatSnapshot
+from . import ThermosmartCoordinator
+
+
+def device_name(config_entry: ConfigEntry, device_id: str) -> str:
+    """Return the name of a thermostat of the config entry."""
+    name = config_entry.data["name"]
+    if device_id == config_entry.unique_id:
+        return name
+    return f"{name} {device_id}"
+
+
+def opentherm_devices(coordinator: ThermosmartCoordinator) -> dict[str, dict[str, Any]]:
+    """Return the decoded OpenTherm data of the thermostats that have it."""
+    return {
+        device_id: data["ot"]["readable"]
+        for device_id, data in coordinator.data.items()
+        if data.get("ot") and data["ot"]["enabled"]
+    }
+
+
+class ThermosmartEntity(CoordinatorEntity[ThermosmartCoordinator]):
+    """Entity bound to a single thermostat of a coordinator."""
+
+    _attr_has_entity_name = True
+
+    def __init__(
+        self,
+        coordinator: ThermosmartCoordinator,
+        device_id: str,
+        name: str,
+        paths: Iterable[tuple[str, ...]],
+    ) -> None:
+        """Initialize the entity.
+
+        The paths are the keys in the data of the thermostat that the entity
+        reads, the entity is only updated when one of them changes.
+        """
+        super().__init__(
+            coordinator, frozenset((device_id, *path) for path in paths)
+        )
+
+        self._device_id = device_id
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, device_id)},
+            manufacturer="Thermosmart",
+            model="V3",
+            name=name,
+        )
+
+    @callback
+    def async_write_ha_state(self) -> None:
+        """Write the state, counting the writes of the entry."""
+        self.coordinator.metrics.entity_writes += 1
+        super().async_write_ha_state()
+
+    @property
+    def device(self) -> ThermosmartDevice:
+        """Return the client of the thermostat."""
+        return self.coordinator.devices[self._device_id]
+
+    @property
+    def device_data(self) -> dict[str, Any]:
+        """Return the latest data of the thermostat."""
+        return self.coordinator.data[self._device_id]
+
+    @property
+    def snapshot(self) -> ThermostatSnapshot:
+        """Return the parsed latest data of the thermostat."""
+        return self.coordinator.snapshots[self._device_id]
+
+    @property
+    def available(self) -> bool:
+        """Return if the thermostat is in the latest data."""
+        return super().available and self._device_id in self.coordinator.data
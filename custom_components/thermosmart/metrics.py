@@ -0,0 +1,132 @@
+"""Request, webhook and update metrics of a Thermosmart config entry."""
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections import Counter, deque
+import re
+from time import monotonic
+from typing import Any
+
+# Upper bounds of the latency buckets: 1 ms up to ~80 s, 25% apart
+LATENCY_BUCKETS = tuple(0.001 * 1.25**step for step in range(51))
+# Number of recent webhook messages the receive rate is computed over
+WEBHOOK_RATE_WINDOW = 100
+
+_DEVICE_PATH = re.compile(r"^/thermostat/[^/]+")
+
+
+def endpoint(method: str, path: str) -> str:
+    """Return the endpoint of a request, without the thermostat id."""
+    return f"{method.upper()} {_DEVICE_PATH.sub('/thermostat/{id}', path) or '/'}"
+
+
+class LatencyHistogram:
+    """Histogram with fixed buckets, so memory does not grow with samples."""
+
+    def __init__(self) -> None:
+        """Initialize the histogram."""
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds: float) -> None:
+        """Add a sample."""
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, percent: float) -> float | None:
+        """Return the upper bound of the bucket holding the percentile."""
+        if not self.count:
+            return None
+        rank = percent / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return LATENCY_BUCKETS[min(index, len(LATENCY_BUCKETS) - 1)]
+        return LATENCY_BUCKETS[-1]
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a summary in milliseconds."""
+        summary: dict[str, Any] = {"count": self.count}
+        if self.count:
+            summary["mean_ms"] = round(self.total / self.count * 1000, 1)
+            for percent in (50, 95, 99):
+                summary[f"p{percent}_ms"] = round(self.percentile(percent) * 1000, 1)
+        return summary
+
+
+class ThermosmartMetrics:
+    """Counters and histograms of the cloud calls, webhooks and updates."""
+
+    def __init__(self) -> None:
+        """Initialize the metrics."""
+        self.requests: Counter[str] = Counter()
+        self.errors: Counter[str] = Counter()
+        self.retries = 0
+        self.latency: dict[str, LatencyHistogram] = {}
+        self.update_duration = LatencyHistogram()
+        self.webhooks_received = 0
+        self.webhooks_accepted = 0
+        self._webhook_times: deque[float] = deque(maxlen=WEBHOOK_RATE_WINDOW)
+        self.entity_writes = 0
+        # Duration of the stages of the entry setup in seconds
+        self.setup_time: dict[str, float] = {}
+
+    def record_request(self, name: str, seconds: float, error: bool) -> None:
+        """Record a request to an endpoint."""
+        self.requests[name] += 1
+        if error:
+            self.errors[name] += 1
+        if name not in self.latency:
+            self.latency[name] = LatencyHistogram()
+        self.latency[name].record(seconds)
+
+    def record_webhook(self, accepted: bool) -> None:
+        """Record a received webhook message."""
+        self.webhooks_received += 1
+        if accepted:
+            self.webhooks_accepted += 1
+        self._webhook_times.append(monotonic())
+
+    @property
+    def webhook_rate(self) -> float | None:
+        """Return the recent webhook messages per minute."""
+        if not self._webhook_times:
+            return None
+        elapsed = monotonic() - self._webhook_times[0]
+        if elapsed <= 0:
+            return None
+        return round(len(self._webhook_times) / elapsed * 60, 2)
+
+    def latency_percentile(self, percent: float) -> float | None:
+        """Return a latency percentile over all endpoints in milliseconds."""
+        combined = LatencyHistogram()
+        for histogram in self.latency.values():
+            combined.counts = [
+                total + count for total, count in zip(combined.counts, histogram.counts)
+            ]
+            combined.count += histogram.count
+        value = combined.percentile(percent)
+        return None if value is None else round(value * 1000, 1)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return all metrics."""
+        return {
+            "requests": dict(self.requests),
+            "errors": dict(self.errors),
+            "retries": self.retries,
+            "latency": {
+                name: histogram.as_dict() for name, histogram in self.latency.items()
+            },
+            "update_duration": self.update_duration.as_dict(),
+            "webhooks_received": self.webhooks_received,
+            "webhooks_accepted": self.webhooks_accepted,
+            "webhook_rate_per_minute": self.webhook_rate,
+            "entity_writes": self.entity_writes,
+            "setup_ms": {
+                stage: round(seconds * 1000, 1)
+                for stage, seconds in self.setup_time.items()
+            },
+        }
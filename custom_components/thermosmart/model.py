@@ -0,0 +1,111 @@
+"""Immutable snapshot of the data of a thermostat."""
+from __future__ import annotations
+
+from typing import Any, NamedTuple
+
+from homeassistant.components.climate.const import (
+    PRESET_AWAY,
+    PRESET_NONE,
+    HVACAction,
+    HVACMode,
+)
+
+# OpenTherm values decoded by thermosmart_hass, in the order of the values of
+# a snapshot
+OT_KEYS: tuple[str, ...] = (
+    "CH_enabled",
+    "DHW_enabled",
+    "Cooling_enabled",
+    "OTC_active",
+    "CH2_enabled",
+    "Summer_winter_mode",
+    "DHW_blocked",
+    "Control setpoint",
+    "DHW_present",
+    "Control_type",
+    "Cooling_config",
+    "DHW_config",
+    "pump_control",
+    "CH2_present",
+    "remote_water_fill",
+    "heat_cool_control",
+    "Modulation level",
+    "Water pressure",
+    "Hot water flow rate",
+    "Boiler temperature",
+    "Hot water temperature",
+    "Outside temperature",
+    "Return water temperature",
+    "Heat exchanger temperature",
+    "Hot water setpoint",
+    "Opentherm version",
+)
+OT_INDEX: dict[str, int] = {key: index for index, key in enumerate(OT_KEYS)}
+
+_CH_ENABLED = OT_INDEX["CH_enabled"]
+_COOLING_ENABLED = OT_INDEX["Cooling_enabled"]
+
+HVAC_MODES = {
+    "remote": HVACMode.HEAT,
+    "manual": HVACMode.HEAT,
+    "schedule": HVACMode.AUTO,
+    "exception": HVACMode.AUTO,
+}
+
+
+class ThermostatSnapshot(NamedTuple):
+    """Data of a thermostat as read by the entities, parsed once per update.
+
+    The OpenTherm values are a tuple indexed by OT_INDEX, None if the
+    thermostat has no (enabled) OpenTherm connection.
+    """
+
+    room_temperature: float | None
+    target_temperature: float | None
+    source: str | None
+    hvac_mode: HVACMode | None
+    hvac_action: HVACAction | None
+    preset_mode: str
+    # Fault indication of the boiler, from the slave status flags
+    fault: bool | None
+    ot: tuple[Any, ...] | None
+
+    @classmethod
+    def from_data(cls, data: dict[str, Any]) -> ThermostatSnapshot:
+        """Parse the data of a thermostat."""
+        opentherm = data.get("ot") or {}
+        readable = opentherm.get("readable")
+        ot = None
+        hvac_action = None
+        if opentherm and readable is not None:
+            ot = tuple(readable.get(key) for key in OT_KEYS)
+            if ot[_CH_ENABLED]:
+                hvac_action = HVACAction.HEATING
+            elif ot[_COOLING_ENABLED]:
+                hvac_action = HVACAction.COOLING
+            else:
+                hvac_action = HVACAction.IDLE
+
+        source = data.get("source")
+        return cls(
+            data.get("room_temperature"),
+            data.get("target_temperature"),
+            source,
+            HVAC_MODES.get(source),
+            hvac_action,
+            PRESET_AWAY if source == "pause" else PRESET_NONE,
+            _fault((opentherm.get("raw") or {}).get("ot0")) if ot else None,
+            ot,
+        )
+
+    def ot_value(self, key: str) -> Any:
+        """Return a decoded OpenTherm value, None if unknown."""
+        return None if self.ot is None else self.ot[OT_INDEX[key]]
+
+
+def _fault(status: Any) -> bool | None:
+    """Return the fault bit of the slave status byte of OpenTherm message 0."""
+    try:
+        return bool(bytes.fromhex(status[2:])[1] & 1)
+    except (TypeError, ValueError, IndexError):
+        return None
@@ -0,0 +1,88 @@
+"""Registry of the Thermosmart accounts set up in Home Assistant."""
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+
+from homeassistant.core import callback
+
+from .scheduler import StartupScheduler
+
+if TYPE_CHECKING:
+    from . import ThermosmartCoordinator
+
+
+class ThermosmartRegistry:
+    """Share one reference-counted coordinator between the entries of an account.
+
+    The first entry of an account creates the API client and coordinator,
+    later entries of the same account take a reference to it. The coordinator
+    is shut down when its last reference is released, so unloading an entry
+    does not affect the other entries of the account. The entry that creates
+    the coordinator has the entities, the first entry holding a reference
+    owns it: its options apply. Stored in hass.data[DOMAIN].
+    """
+
+    def __init__(self) -> None:
+        """Initialize the registry."""
+        # Coordinator referenced by every loaded entry, in the order they
+        # were set up
+        self.entries: dict[str, ThermosmartCoordinator] = {}
+        # Coordinator new entries of an account share
+        self._accounts: dict[str, ThermosmartCoordinator] = {}
+        # Entries that set up the entities of their coordinator
+        self.entity_entries: set[str] = set()
+        self._locks: dict[str, asyncio.Lock] = {}
+        # Spreads the cloud requests of the entries while they start
+        self.scheduler = StartupScheduler()
+
+    def lock(self, account: str) -> asyncio.Lock:
+        """Return the lock to hold while setting up an entry of an account."""
+        return self._locks.setdefault(account, asyncio.Lock())
+
+    @callback
+    def async_get(self, account: str) -> ThermosmartCoordinator | None:
+        """Return the coordinator of an account, if it is set up."""
+        return self._accounts.get(account)
+
+    @callback
+    def async_add(
+        self, account: str, entry_id: str, coordinator: ThermosmartCoordinator
+    ) -> None:
+        """Add a reference of an entry to the coordinator of its account."""
+        self._accounts.setdefault(account, coordinator)
+        self.entries[entry_id] = coordinator
+
+    @callback
+    def async_entry_ids(self, coordinator: ThermosmartCoordinator) -> list[str]:
+        """Return the entries referencing a coordinator, the owner first."""
+        return [
+            entry_id for entry_id, other in self.entries.items() if other is coordinator
+        ]
+
+    @callback
+    def async_is_owner(self, entry_id: str) -> bool:
+        """Return if an entry owns the coordinator it references."""
+        if (coordinator := self.entries.get(entry_id)) is None:
+            return False
+        return self.async_entry_ids(coordinator)[0] == entry_id
+
+    @callback
+    def async_discard(self, coordinator: ThermosmartCoordinator) -> None:
+        """Stop sharing a coordinator, entries set up later create a new one."""
+        for account, other in list(self._accounts.items()):
+            if other is coordinator:
+                del self._accounts[account]
+
+    @callback
+    def async_remove(self, entry_id: str) -> list[str]:
+        """Release the reference of an entry.
+
+        Returns the entries still referencing its coordinator, the new owner
+        first. If there are none, the coordinator has to be shut down.
+        """
+        if (coordinator := self.entries.pop(entry_id, None)) is None:
+            return []
+        if not (entry_ids := self.async_entry_ids(coordinator)):
+            self.async_discard(coordinator)
+        return entry_ids
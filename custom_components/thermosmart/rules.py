@@ -0,0 +1,229 @@
+"""Boiler fault and threshold alerts evaluated on every coordinator update."""
+from __future__ import annotations
+
+from collections.abc import Callable, Mapping
+from datetime import datetime
+import logging
+from time import monotonic
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .const import CONF_MIN_WATER_PRESSURE, CONF_TRACKING_ERROR, DOMAIN
+from .model import OT_INDEX, ThermostatSnapshot
+
+if TYPE_CHECKING:
+    from . import ThermosmartCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+EVENT_ALERT = f"{DOMAIN}_alert"
+DEFAULT_MIN_WATER_PRESSURE = 1.0
+DEFAULT_TRACKING_ERROR = 2.0
+# Time the room may stay below the target temperature, e.g. after a change
+TRACKING_DELAY = 3600
+
+
+def _opentherm(key: str) -> Callable[[ThermostatSnapshot], Any]:
+    """Return a reader of a decoded OpenTherm value."""
+    index = OT_INDEX[key]
+
+    def read(snapshot: ThermostatSnapshot) -> Any:
+        return None if snapshot.ot is None else snapshot.ot[index]
+
+    return read
+
+
+def _fault(snapshot: ThermostatSnapshot) -> bool | None:
+    """Return the fault indication of the boiler."""
+    return snapshot.fault
+
+
+def _tracking_error(snapshot: ThermostatSnapshot) -> float | None:
+    """Return how far the room temperature is below the target temperature."""
+    try:
+        return snapshot.target_temperature - snapshot.room_temperature
+    except TypeError:
+        return None
+
+
+class Rule:
+    """Threshold on a value of a thermostat, with hysteresis.
+
+    The rule becomes active when the value crosses the limit (above or below,
+    for at least the delay), and only clears once the value is back past the
+    limit by the hysteresis. Unknown values keep the state.
+    """
+
+    __slots__ = ("key", "read", "limit", "clear", "sign", "delay")
+
+    def __init__(
+        self,
+        key: str,
+        read: Callable[[ThermostatSnapshot], Any],
+        *,
+        above: float | None = None,
+        below: float | None = None,
+        hysteresis: float = 0.0,
+        delay: float = 0.0,
+    ) -> None:
+        """Initialize the rule, with either an upper or a lower limit."""
+        self.key = key
+        self.read = read
+        # Values are compared multiplied by the sign, so "below" is "above"
+        self.sign = 1 if below is None else -1
+        self.limit = self.sign * (above if below is None else below)
+        self.clear = self.limit - hysteresis
+        self.delay = delay
+
+    def value(self, snapshot: ThermostatSnapshot) -> float | None:
+        """Return the value the rule checks, None if unknown."""
+        value = self.read(snapshot)
+        # Flags are booleans, which are integers too
+        return value if isinstance(value, int | float) else None
+
+    def crossed(self, value: float, active: bool) -> bool:
+        """Return if the value is past the limit, or not yet cleared if active."""
+        if active:
+            return self.sign * value > self.clear
+        return self.sign * value > self.limit
+
+
+def compile_rules(options: Mapping[str, Any]) -> tuple[Rule, ...]:
+    """Return the rules for the options of an entry."""
+    return (
+        Rule(
+            "low_water_pressure",
+            _opentherm("Water pressure"),
+            below=options.get(CONF_MIN_WATER_PRESSURE, DEFAULT_MIN_WATER_PRESSURE),
+            hysteresis=0.2,
+        ),
+        Rule("boiler_fault", _fault, above=0),
+        Rule(
+            "setpoint_tracking",
+            _tracking_error,
+            above=options.get(CONF_TRACKING_ERROR, DEFAULT_TRACKING_ERROR),
+            hysteresis=0.5,
+            delay=TRACKING_DELAY,
+        ),
+    )
+
+
+class RuleEngine:
+    """Evaluate the rules against the snapshot of every thermostat.
+
+    The rules are checked in one pass per coordinator update, the listeners of
+    a rule are notified only when its state changes. The first known state of
+    a rule is not an alert, after that every change also fires an event. A
+    rule waiting for its delay is checked again when the delay ends, also if
+    there is no update by then.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        coordinator: ThermosmartCoordinator,
+        rules: tuple[Rule, ...],
+    ) -> None:
+        """Initialize the engine."""
+        self._hass = hass
+        self._coordinator = coordinator
+        self.rules = rules
+        # Active state and start of the crossing of every thermostat and rule
+        self.states: dict[tuple[str, str], bool] = {}
+        self._since: dict[tuple[str, str], float] = {}
+        self._listeners: dict[tuple[str, str], list[CALLBACK_TYPE]] = {}
+        self._unsub_timer: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_start(self) -> CALLBACK_TYPE:
+        """Start evaluating the coordinator data, return a function to stop."""
+        self._async_evaluate()
+        remove_listener = self._coordinator.async_add_listener(self._async_evaluate)
+
+        @callback
+        def stop() -> None:
+            remove_listener()
+            self._async_cancel_timer()
+
+        return stop
+
+    @callback
+    def async_set_rules(self, rules: tuple[Rule, ...]) -> None:
+        """Replace the rules, keeping the states, and check them."""
+        self.rules = rules
+        self._async_evaluate()
+
+    @callback
+    def async_add_listener(
+        self, device_id: str, key: str, update_callback: CALLBACK_TYPE
+    ) -> CALLBACK_TYPE:
+        """Listen for changes of a rule of a thermostat."""
+        listeners = self._listeners.setdefault((device_id, key), [])
+        listeners.append(update_callback)
+        return lambda: listeners.remove(update_callback)
+
+    @callback
+    def _async_evaluate(self) -> None:
+        """Check all rules, report the ones that changed."""
+        if not self._coordinator.last_update_success:
+            return
+        now = monotonic()
+        # End of the first delay of a rule that crossed its limit
+        due: float | None = None
+        for device_id, snapshot in self._coordinator.snapshots.items():
+            for rule in self.rules:
+                state_key = (device_id, rule.key)
+                value = rule.value(snapshot)
+                if value is None:
+                    continue
+
+                known = self.states.get(state_key)
+                if not rule.crossed(value, bool(known)):
+                    self._since.pop(state_key, None)
+                    active = False
+                else:
+                    since = self._since.setdefault(state_key, now)
+                    # Only a new crossing waits for the delay
+                    active = bool(known) or now - since >= rule.delay
+                    if not active and (due is None or since + rule.delay < due):
+                        due = since + rule.delay
+                if active == known:
+                    continue
+
+                self.states[state_key] = active
+                if known is not None:
+                    _LOGGER.debug(
+                        "%s of %s is %s at %s", rule.key, device_id, active, value
+                    )
+                    self._hass.bus.async_fire(
+                        EVENT_ALERT,
+                        {
+                            "device_id": device_id,
+                            "rule": rule.key,
+                            "active": active,
+                            "value": value,
+                        },
+                    )
+                for update_callback in list(self._listeners.get(state_key, ())):
+                    update_callback()
+
+        self._async_cancel_timer()
+        if due is not None:
+            self._unsub_timer = async_call_later(
+                self._hass, due - now, self._async_delay_ended
+            )
+
+    @callback
+    def _async_delay_ended(self, _now: datetime) -> None:
+        """Check the rules again when the delay of a rule ended."""
+        self._unsub_timer = None
+        self._async_evaluate()
+
+    @callback
+    def _async_cancel_timer(self) -> None:
+        """Cancel the check at the end of a delay, if any."""
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+            self._unsub_timer = None
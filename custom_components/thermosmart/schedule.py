@@ -0,0 +1,290 @@
+"""Local model of the week schedule and exceptions of a Thermosmart thermostat."""
+from __future__ import annotations
+
+from collections.abc import Iterable
+from datetime import datetime, time, timedelta
+import logging
+from typing import Any, NamedTuple
+
+_LOGGER = logging.getLogger(__name__)
+
+# Day 0 of the week schedule of the API is monday
+DAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+SLOTS_PER_DAY = 24 * 4
+SLOTS_PER_WEEK = 7 * SLOTS_PER_DAY
+
+
+def round_to_quarter(value: datetime) -> datetime:
+    """Round a time to the nearest quarter, the thermostat switches on quarters."""
+    value = value.replace(second=0, microsecond=0)
+    minutes = round(value.minute / 15) * 15
+    return value.replace(minute=0) + timedelta(minutes=minutes)
+
+
+class ScheduleException(NamedTuple):
+    """A period in which a program overrides the week schedule."""
+
+    start: datetime
+    end: datetime
+    program: str
+
+    @classmethod
+    def from_api(cls, data: dict[str, Any]) -> ScheduleException:
+        """Create from the API format, in which months start at 0."""
+        start, end = data["start"], data["end"]
+        return cls(
+            datetime(start[0], start[1] + 1, start[2], start[3], start[4]),
+            datetime(end[0], end[1] + 1, end[2], end[3], end[4]),
+            data["temperature"],
+        )
+
+    def as_api(self) -> dict[str, Any]:
+        """Return the exception in the API format."""
+        return {
+            "start": [
+                self.start.year,
+                self.start.month - 1,
+                self.start.day,
+                self.start.hour,
+                self.start.minute,
+            ],
+            "end": [
+                self.end.year,
+                self.end.month - 1,
+                self.end.day,
+                self.end.hour,
+                self.end.minute,
+            ],
+            "temperature": self.program,
+        }
+
+
+class ExceptionIndex:
+    """Exceptions of a thermostat, sorted by start time and non-overlapping.
+
+    The index follows the exceptions in the coordinator data: it is rebuilt
+    whenever a list other than the one it was built from (or last produced) is
+    passed to sync(). Changes are applied to the index first, so changes made
+    before the next update build on each other, and are only returned for
+    upload if they change the list.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty index."""
+        self._source: list[dict[str, Any]] | None = None
+        self._entries: list[ScheduleException] = []
+
+    @property
+    def entries(self) -> list[ScheduleException]:
+        """Return the exceptions, sorted by start time."""
+        return list(self._entries)
+
+    def sync(self, exceptions: list[dict[str, Any]] | None) -> None:
+        """Rebuild the index if the exceptions of the thermostat changed."""
+        if exceptions is self._source:
+            return
+        self._source = exceptions
+
+        entries = []
+        for data in exceptions or []:
+            try:
+                entries.append(ScheduleException.from_api(data))
+            except (IndexError, KeyError, TypeError, ValueError):
+                _LOGGER.debug("Ignoring invalid schedule exception %s", data)
+        entries.sort()
+
+        self._entries = []
+        for entry in entries:
+            self._entries = _insert(self._entries, entry)
+
+    def keep(self, exceptions: list[dict[str, Any]] | None) -> None:
+        """Keep the local changes until the data holds another list than this."""
+        self._source = exceptions
+
+    def add(
+        self, entries: Iterable[ScheduleException], now: datetime
+    ) -> list[dict[str, Any]] | None:
+        """Add exceptions, return the new list if it changed.
+
+        Later exceptions override earlier (and existing) ones where they
+        overlap, overlapping or adjacent exceptions with the same program are
+        merged, and exceptions that already ended are dropped.
+        """
+        return self._apply(self._entries, entries, now)
+
+    def replace(
+        self, entries: Iterable[ScheduleException], now: datetime
+    ) -> list[dict[str, Any]] | None:
+        """Replace all exceptions, return the new list if it changed."""
+        return self._apply([], entries, now)
+
+    def _apply(
+        self,
+        base: list[ScheduleException],
+        entries: Iterable[ScheduleException],
+        now: datetime,
+    ) -> list[dict[str, Any]] | None:
+        """Insert exceptions into a base list and store the result."""
+        result = [entry for entry in base if entry.end > now]
+        for entry in entries:
+            if entry.end > now:
+                result = _insert(result, entry)
+
+        current = [entry for entry in self._entries if entry.end > now]
+        if result == current:
+            return None
+        self._entries = result
+        self._source = [entry.as_api() for entry in result]
+        return self._source
+
+
+def _insert(
+    entries: list[ScheduleException], new: ScheduleException
+) -> list[ScheduleException]:
+    """Insert an exception into a sorted, non-overlapping list."""
+    # Merge with overlapping and adjacent exceptions of the same program
+    for entry in entries:
+        if (
+            entry.program == new.program
+            and entry.start <= new.end
+            and entry.end >= new.start
+        ):
+            new = new._replace(
+                start=min(entry.start, new.start), end=max(entry.end, new.end)
+            )
+
+    result = []
+    for entry in entries:
+        if entry.program == new.program and new.start <= entry.start <= new.end:
+            continue
+        if entry.end <= new.start or entry.start >= new.end:
+            result.append(entry)
+            continue
+        # Keep the parts of other programs outside the new exception
+        if entry.start < new.start:
+            result.append(entry._replace(end=new.start))
+        if entry.end > new.end:
+            result.append(entry._replace(start=new.end))
+
+    result.append(new)
+    result.sort()
+    return result
+
+
+class WeekSchedule:
+    """Week schedule as the program of each quarter of an hour of the week.
+
+    The API describes the schedule as the blocks at which a program starts, a
+    program continues (over midnight and from sunday to monday) until the next
+    block. Using a fixed array of slots makes comparing schedules and
+    replacing days cheap, and every array maps to exactly one list of blocks.
+    The slots of an empty schedule are None.
+    """
+
+    __slots__ = ("slots",)
+
+    def __init__(self, slots: tuple[str | None, ...]) -> None:
+        """Initialize the schedule from its slots."""
+        self.slots = slots
+
+    def __eq__(self, other: object) -> bool:
+        """Return if two schedules are the same."""
+        return isinstance(other, WeekSchedule) and self.slots == other.slots
+
+    def __hash__(self) -> int:
+        """Return the hash of the slots."""
+        return hash(self.slots)
+
+    @classmethod
+    def from_api(cls, blocks: list[dict[str, Any]]) -> WeekSchedule:
+        """Create from the blocks of the API."""
+        starts: list[str | None] = [None] * SLOTS_PER_WEEK
+        for block in blocks:
+            try:
+                day, hour, minute = block["start"]
+                slot = day * SLOTS_PER_DAY + hour * 4 + minute // 15
+                starts[slot % SLOTS_PER_WEEK] = block["temperature"]
+            except (KeyError, TypeError, ValueError):
+                _LOGGER.debug("Ignoring invalid schedule block %s", block)
+        return cls(_fill(starts))
+
+    def as_api(self) -> list[dict[str, Any]]:
+        """Return the blocks of the API, one for every program change."""
+        blocks = []
+        for slot, program in enumerate(self.slots):
+            if program is not None and (slot == 0 or program != self.slots[slot - 1]):
+                day, quarter = divmod(slot, SLOTS_PER_DAY)
+                blocks.append(
+                    {
+                        "start": [day, quarter // 4, quarter % 4 * 15],
+                        "temperature": program,
+                    }
+                )
+        return blocks
+
+    def as_days(self) -> dict[str, list[dict[str, str]]]:
+        """Return the program changes per day, starting at midnight."""
+        days = {}
+        for day, name in enumerate(DAYS):
+            offset = day * SLOTS_PER_DAY
+            days[name] = [
+                {"start": _slot_time(quarter), "program": program}
+                for quarter, program in enumerate(
+                    self.slots[offset : offset + SLOTS_PER_DAY]
+                )
+                if program is not None
+                and (quarter == 0 or program != self.slots[offset + quarter - 1])
+            ]
+        return days
+
+    def with_days(self, days: dict[str, list[tuple[time, str]]]) -> WeekSchedule:
+        """Return the schedule with the program changes of some days replaced.
+
+        A day without a change at midnight continues the program of the day
+        before it, also when that day is replaced.
+        """
+        starts = self._starts()
+        if not any(starts) and self.slots[0] is not None:
+            # A single program all week starts on a day that is kept
+            kept = [day for day, name in enumerate(DAYS) if name not in days]
+            if kept:
+                starts[kept[0] * SLOTS_PER_DAY] = self.slots[0]
+        for day, name in enumerate(DAYS):
+            if name not in days:
+                continue
+            offset = day * SLOTS_PER_DAY
+            starts[offset : offset + SLOTS_PER_DAY] = [None] * SLOTS_PER_DAY
+            for start, program in days[name]:
+                starts[offset + start.hour * 4 + start.minute // 15] = program
+        return WeekSchedule(_fill(starts))
+
+    def _starts(self) -> list[str | None]:
+        """Return the program changes, the slots in which a program starts."""
+        return [
+            program if program != self.slots[slot - 1] else None
+            for slot, program in enumerate(self.slots)
+        ]
+
+    def changed_days(self, other: WeekSchedule) -> list[str]:
+        """Return the days on which two schedules differ."""
+        return [
+            name
+            for day, name in enumerate(DAYS)
+            if self.slots[day * SLOTS_PER_DAY : (day + 1) * SLOTS_PER_DAY]
+            != other.slots[day * SLOTS_PER_DAY : (day + 1) * SLOTS_PER_DAY]
+        ]
+
+
+def _fill(starts: list[str | None]) -> tuple[str | None, ...]:
+    """Continue every program until the next start, around the week."""
+    last = next((program for program in reversed(starts) if program), None)
+    slots = []
+    for program in starts:
+        last = program or last
+        slots.append(last)
+    return tuple(slots)
+
+
+def _slot_time(quarter: int) -> str:
+    """Return the start time of a slot of a day."""
+    return f"{quarter // 4:02d}:{quarter % 4 * 15:02d}"
@@ -0,0 +1,83 @@
+"""Spread the cloud requests of Thermosmart entries that start together."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+import heapq
+from itertools import count
+
+# Entries calling the cloud during their setup at the same time
+STARTUP_CONCURRENCY = 4
+# Entries started from cache refresh within this many seconds
+STARTUP_SPREAD = 60.0
+# Entries with entities in use start first
+PRIORITY_HIGH = 0
+PRIORITY_LOW = 1
+# Fractional part of the golden ratio, consecutive phases are spread evenly
+_PHASE_STEP = 0.6180339887498949
+
+
+class StartupScheduler:
+    """Limit and order the cloud requests of starting entries.
+
+    At most a limited number of entries call the cloud at a time, waiting
+    entries get a slot in order of priority and then of arrival. Every entry
+    also gets a phase between 0 and 1, spread evenly however many entries
+    start, to stagger its first refresh and polls. Stored on the registry.
+    """
+
+    def __init__(self, limit: int = STARTUP_CONCURRENCY) -> None:
+        """Initialize the scheduler, a limit of 0 disables it."""
+        self.limit = limit
+        self.active = 0
+        self.peak = 0
+        self._waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._order = count()
+        self._phase = 0.0
+
+    def next_phase(self) -> float:
+        """Return the phase of the next entry, the first one starts right away."""
+        phase = self._phase
+        self._phase = (phase + _PHASE_STEP) % 1
+        return phase
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_HIGH) -> AsyncIterator[None]:
+        """Hold a slot to call the cloud while starting an entry."""
+        await self._acquire(priority)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, priority: int) -> None:
+        """Wait for a free slot."""
+        if not self.limit or (self.active < self.limit and not self._waiters):
+            self._take()
+            return
+
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # The slot may have been handed over just before the cancellation
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+
+    def _take(self) -> None:
+        """Count a slot in use."""
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+
+    def _release(self) -> None:
+        """Hand a slot over to the first waiting entry, or free it."""
+        self.active -= 1
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self._take()
+                future.set_result(None)
+                return
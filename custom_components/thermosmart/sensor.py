@@ -5,28 +5,221 @@ For more details about this platform, please refer to the documentation at
 https://home-assistant.io/components/thermosmart/
 """
 
+from collections.abc import Callable, Mapping
+from datetime import datetime, timedelta
 import logging
+from time import monotonic
+from typing import Any
 
-from thermosmart_hass import SENSOR_LIST
-
-from .const import DOMAIN
+from .const import (
+    DOMAIN,
+    CONF_BOILER_POWER,
+    CONF_SENSOR_STATES,
+    CONF_STATISTICS,
+    SIGNAL_OPTIONS_UPDATED,
+)
+from .derived import DEFAULT_BOILER_POWER, BurnerCounters, DerivedCounters
+from .entity import ThermosmartEntity, device_name, opentherm_devices
+from .metrics import ThermosmartMetrics
+from .model import OT_INDEX
+from .telemetry import BoilerStatistics
 from . import ThermosmartCoordinator
 
 from homeassistant.components.sensor import (
     SensorDeviceClass,
-    STATE_CLASS_MEASUREMENT,
     SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant, callback
-from homeassistant.const import UnitOfTemperature, UnitOfPressure
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.const import (
+    PERCENTAGE,
+    EntityCategory,
+    UnitOfEnergy,
+    UnitOfTime,
+    UnitOfPressure,
+    UnitOfTemperature,
+    UnitOfVolumeFlowRate,
+)
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.helpers.event import async_call_later
 
 
 _LOGGER = logging.getLogger(__name__)
 
+# Only the metric sensors are polled, they read in-memory counters
+SCAN_INTERVAL = timedelta(seconds=60)
+# Interval of the state writes of measurements, if not written on every change
+STATE_WRITE_INTERVAL = 3600
+
+
+def _temperature(key: str, enabled: bool = False) -> SensorEntityDescription:
+    return SensorEntityDescription(
+        key=key,
+        translation_key=key.lower().replace(" ", "_"),
+        device_class=SensorDeviceClass.TEMPERATURE,
+        native_unit_of_measurement=UnitOfTemperature.CELSIUS,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_registry_enabled_default=enabled,
+    )
+
+
+# Sensors for the OpenTherm values decoded by thermosmart_hass, the rarely
+# used ones are disabled by default.
+SENSOR_TYPES: tuple[SensorEntityDescription, ...] = (
+    _temperature("Control setpoint", enabled=True),
+    SensorEntityDescription(
+        key="Modulation level",
+        translation_key="modulation_level",
+        native_unit_of_measurement=PERCENTAGE,
+        state_class=SensorStateClass.MEASUREMENT,
+    ),
+    SensorEntityDescription(
+        key="Water pressure",
+        translation_key="water_pressure",
+        device_class=SensorDeviceClass.PRESSURE,
+        native_unit_of_measurement=UnitOfPressure.BAR,
+        state_class=SensorStateClass.MEASUREMENT,
+    ),
+    SensorEntityDescription(
+        key="Hot water flow rate",
+        translation_key="hot_water_flow_rate",
+        device_class=SensorDeviceClass.VOLUME_FLOW_RATE,
+        native_unit_of_measurement=UnitOfVolumeFlowRate.LITERS_PER_MINUTE,
+        state_class=SensorStateClass.MEASUREMENT,
+    ),
+    _temperature("Hot water temperature", enabled=True),
+    _temperature("Return water temperature", enabled=True),
+    _temperature("Boiler temperature"),
+    _temperature("Outside temperature"),
+    _temperature("Heat exchanger temperature"),
+    _temperature("Hot water setpoint"),
+    SensorEntityDescription(
+        key="Opentherm version",
+        translation_key="opentherm_version",
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+    ),
+    SensorEntityDescription(
+        key="Control_type",
+        translation_key="control_type",
+        device_class=SensorDeviceClass.ENUM,
+        options=["on/off", "modulating"],
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+    ),
+    SensorEntityDescription(
+        key="DHW_config",
+        translation_key="dhw_config",
+        device_class=SensorDeviceClass.ENUM,
+        options=["storage_tank", "instantaneous"],
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+    ),
+    SensorEntityDescription(
+        key="heat_cool_control",
+        translation_key="heat_cool_control",
+        device_class=SensorDeviceClass.ENUM,
+        options=["master", "slave"],
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+    ),
+)
+
+
+# Sensors derived from the modulation level, for boilers that report it
+DERIVED_SENSOR_TYPES: tuple[SensorEntityDescription, ...] = (
+    SensorEntityDescription(
+        key="burner_runtime",
+        translation_key="burner_runtime",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.HOURS,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        suggested_display_precision=2,
+    ),
+    SensorEntityDescription(
+        key="heating_duty_cycle",
+        translation_key="heating_duty_cycle",
+        native_unit_of_measurement=PERCENTAGE,
+        state_class=SensorStateClass.MEASUREMENT,
+        suggested_display_precision=0,
+    ),
+    SensorEntityDescription(
+        key="energy",
+        translation_key="energy",
+        device_class=SensorDeviceClass.ENERGY,
+        native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        suggested_display_precision=2,
+    ),
+)
+
+DERIVED_VALUES: dict[str, Callable[[BurnerCounters], float]] = {
+    "burner_runtime": lambda counters: round(counters.runtime / 3600, 3),
+    "heating_duty_cycle": lambda counters: round(counters.duty_cycle * 100, 1),
+    "energy": lambda counters: round(counters.energy, 3),
+}
+
+
+def _duration(key: str) -> SensorEntityDescription:
+    return SensorEntityDescription(
+        key=key,
+        translation_key=key,
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+    )
+
+
+def _count(key: str) -> SensorEntityDescription:
+    return SensorEntityDescription(
+        key=key,
+        translation_key=key,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+    )
+
+
+# Diagnostic sensors for the metrics of the config entry
+METRIC_SENSOR_TYPES: tuple[SensorEntityDescription, ...] = (
+    _count("api_requests"),
+    _count("api_errors"),
+    _count("api_retries"),
+    _duration("api_latency_p50"),
+    _duration("api_latency_p95"),
+    _duration("api_latency_p99"),
+    _duration("update_duration"),
+    SensorEntityDescription(
+        key="webhook_rate",
+        translation_key="webhook_rate",
+        native_unit_of_measurement="messages/min",
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+    ),
+    _count("entity_writes"),
+)
+
+METRIC_VALUES: dict[str, Callable[[ThermosmartMetrics], Any]] = {
+    "api_requests": lambda metrics: sum(metrics.requests.values()),
+    "api_errors": lambda metrics: sum(metrics.errors.values()),
+    "api_retries": lambda metrics: metrics.retries,
+    "api_latency_p50": lambda metrics: metrics.latency_percentile(50),
+    "api_latency_p95": lambda metrics: metrics.latency_percentile(95),
+    "api_latency_p99": lambda metrics: metrics.latency_percentile(99),
+    "update_duration": lambda metrics: metrics.update_duration.as_dict().get(
+        "p50_ms"
+    ),
+    "webhook_rate": lambda metrics: metrics.webhook_rate,
+    "entity_writes": lambda metrics: metrics.entity_writes,
+}
+
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -35,83 +228,282 @@ async def async_setup_entry(
 ) -> None:
     """Set up the Thermosmart thermostat."""
 
-    coordinator = hass.data[DOMAIN].get(config_entry.entry_id)
-    unique_id = config_entry.unique_id
-    assert unique_id is not None
-    name = config_entry.data["name"]
+    coordinator: ThermosmartCoordinator = hass.data[DOMAIN].entries[config_entry.entry_id]
 
-    # Check if Openterm is enabled
-    if coordinator.data.get("ot"):
-        if not coordinator.data["ot"]["enabled"]:
+    for device_id, data in coordinator.data.items():
+        # Check if Openterm is enabled
+        if data.get("ot") and not data["ot"]["enabled"]:
             _LOGGER.warning(
-                "Openterm is not enabled, cannot read sensors. Please contact supplier to enabled it."
+                "Openterm is not enabled for %s, cannot read sensors. Please contact supplier to enabled it.",
+                device_id,
             )
-            return
-
-    sensors_to_read = [
-        "Control setpoint",
-        "Modulation level",
-        "Water pressure",
-        "Hot water flow rate",
-        "Hot water temperature",
-        "Return water temperature",
-    ]
+
     sensors = []
-    for sensor in sensors_to_read:
-        new_sensor = ThermosmartSensor(coordinator, unique_id, name, sensor)
-        sensors.append(new_sensor)
+    names = {}
+    for device_id, readable in opentherm_devices(coordinator).items():
+        name = names[device_id] = device_name(config_entry, device_id)
+        for description in SENSOR_TYPES:
+            if description.key in readable:
+                sensors.append(
+                    ThermosmartSensor(
+                        coordinator,
+                        device_id,
+                        name,
+                        description,
+                        _write_interval(config_entry.options),
+                    )
+                )
+    boiler_sensors = list(sensors)
+    # Stops importing the statistics, while they are imported
+    stop_statistics: list[CALLBACK_TYPE] = []
+
+    @callback
+    def async_update_statistics(options: Mapping[str, Any]) -> None:
+        """Start or stop importing statistics, as configured."""
+        enabled = (
+            bool(names)
+            and options.get(CONF_STATISTICS, False)
+            and "recorder" in hass.config.components
+        )
+        if stop_statistics and not enabled:
+            stop_statistics.pop()()
+        elif enabled and not stop_statistics:
+            # Every start begins new hours, a gap is not accounted
+            statistics = BoilerStatistics(
+                hass,
+                coordinator,
+                names,
+                {
+                    description.key: description.native_unit_of_measurement
+                    for description in SENSOR_TYPES
+                    if description.state_class == SensorStateClass.MEASUREMENT
+                },
+            )
+            stop_statistics.append(statistics.async_start())
 
-    async_add_entities(sensors, update_before_add=True)
+    async_update_statistics(config_entry.options)
+    config_entry.async_on_unload(lambda: async_update_statistics({}))
+
+    derived_ids = [
+        device_id
+        for device_id, readable in opentherm_devices(coordinator).items()
+        if "Modulation level" in readable
+    ]
+    counters: DerivedCounters | None = None
+    if derived_ids:
+        counters = DerivedCounters(
+            hass,
+            coordinator,
+            config_entry.entry_id,
+            config_entry.options.get(CONF_BOILER_POWER, DEFAULT_BOILER_POWER),
+        )
+        await counters.async_load(derived_ids)
+        counters.async_start()
+        config_entry.async_on_unload(counters.async_stop)
+        for device_id in derived_ids:
+            for description in DERIVED_SENSOR_TYPES:
+                sensors.append(
+                    ThermosmartDerivedSensor(
+                        coordinator, counters, device_id, names[device_id], description
+                    )
+                )
+
+    # The metrics are per entry, they are shown on the thermostat of the entry
+    device_id = config_entry.unique_id
+    if device_id not in coordinator.devices:
+        device_id = next(iter(coordinator.devices))
+    name = device_name(config_entry, device_id)
+    for description in METRIC_SENSOR_TYPES:
+        sensors.append(
+            ThermosmartMetricSensor(coordinator, config_entry, device_id, name, description)
+        )
+
+    @callback
+    def async_options_updated(options: Mapping[str, Any]) -> None:
+        """Apply changed options to the sensors of the entry."""
+        for sensor in boiler_sensors:
+            sensor.async_set_write_interval(_write_interval(options))
+        async_update_statistics(options)
+        if counters is not None:
+            counters.power = options.get(CONF_BOILER_POWER, DEFAULT_BOILER_POWER)
+
+    config_entry.async_on_unload(
+        async_dispatcher_connect(
+            hass,
+            SIGNAL_OPTIONS_UPDATED.format(config_entry.entry_id),
+            async_options_updated,
+        )
+    )
+
+    async_add_entities(sensors)
 
     return True
 
 
-class ThermosmartSensor(CoordinatorEntity[ThermosmartCoordinator], SensorEntity):
+def _write_interval(options: Mapping[str, Any]) -> float:
+    """Return the write interval of measurements for the options."""
+    return 0 if options.get(CONF_SENSOR_STATES, True) else STATE_WRITE_INTERVAL
+
+
+class ThermosmartSensor(ThermosmartEntity, SensorEntity):
     """Representation of a Thermosmart sensor."""
 
-    _attr_state_class = STATE_CLASS_MEASUREMENT
-    _attr_has_entity_name = True
+    def __init__(
+        self,
+        coordinator: ThermosmartCoordinator,
+        device_id: str,
+        name: str,
+        description: SensorEntityDescription,
+        write_interval: float = 0,
+    ):
+        """Initialize the sensor.
+
+        Measurements change state at most once per write interval, if any.
+        """
+        super().__init__(
+            coordinator, device_id, name, [("ot", "readable", description.key)]
+        )
+
+        self.entity_description = description
+        self._attr_unique_id = device_id + "_" + description.key
+        self._index = OT_INDEX[description.key]
+        self._write_interval = 0.0
+        self._next_write = 0.0
+        # Writes an update skipped within the interval once it ends
+        self._unsub_pending: CALLBACK_TYPE | None = None
+        self.async_set_write_interval(write_interval)
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Drop a pending write."""
+        await super().async_will_remove_from_hass()
+        self._async_cancel_pending()
+
+    @callback
+    def async_set_write_interval(self, write_interval: float) -> None:
+        """Change the write interval, only measurements have one."""
+        if self.entity_description.state_class != SensorStateClass.MEASUREMENT:
+            write_interval = 0
+        if write_interval != self._write_interval:
+            self._write_interval = write_interval
+            # The next update is written right away, also a pending one
+            self._next_write = 0.0
+            if self._unsub_pending is not None:
+                self._async_cancel_pending()
+                self._handle_coordinator_update()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the state, or when the interval since the last write ends."""
+        if self._write_interval:
+            delay = self._next_write - monotonic()
+            if self.available and delay > 0:
+                # The coordinator does not notify an unchanged value again, so
+                # the latest one is written when the interval ends
+                if self._unsub_pending is None:
+                    self._unsub_pending = async_call_later(
+                        self.hass, delay, self._async_write_pending
+                    )
+                return
+            self._next_write = monotonic() + self._write_interval
+        self._async_cancel_pending()
+        super()._handle_coordinator_update()
+
+    @callback
+    def _async_write_pending(self, _now: datetime) -> None:
+        """Write the update skipped within the interval."""
+        self._unsub_pending = None
+        self._handle_coordinator_update()
+
+    @callback
+    def _async_cancel_pending(self) -> None:
+        """Cancel writing a skipped update."""
+        if self._unsub_pending is not None:
+            self._unsub_pending()
+            self._unsub_pending = None
+
+    @property
+    def native_value(self):
+        """Return the value of the sensor."""
+        ot = self.snapshot.ot
+        return None if ot is None else ot[self._index]
+
+
+class ThermosmartDerivedSensor(ThermosmartEntity, SensorEntity):
+    """Sensor showing a burner counter of a thermostat."""
 
     def __init__(
         self,
         coordinator: ThermosmartCoordinator,
-        unique_id: str,
+        counters: DerivedCounters,
+        device_id: str,
         name: str,
-        sensor: str,
+        description: SensorEntityDescription,
     ):
-        """Initialize the sensor."""
-        super().__init__(coordinator)
+        """Initialize the sensor.
+
+        The state follows the counters, which change on every sample while the
+        burner is on, rather than the OpenTherm values.
+        """
+        super().__init__(coordinator, device_id, name, [])
 
-        self._sensor = sensor
+        self._counters = counters
+        self.entity_description = description
+        self._attr_unique_id = device_id + "_" + description.key
+        self._written_value: float | None = None
 
-        self._attr_translation_key = sensor.lower().replace(" ", "_")
+    async def async_added_to_hass(self) -> None:
+        """Listen for changes of the counters."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self._counters.async_add_listener(self._handle_counters_update)
+        )
+
+    @callback
+    def _handle_counters_update(self) -> None:
+        """Write the state if the rounded value changed."""
+        if self.native_value != self._written_value:
+            self.async_write_ha_state()
+
+    @callback
+    def async_write_ha_state(self) -> None:
+        """Write the state, remembering the value."""
+        self._written_value = self.native_value
+        super().async_write_ha_state()
+
+    @property
+    def native_value(self):
+        """Return the value of the counter."""
+        return DERIVED_VALUES[self.entity_description.key](
+            self._counters.devices[self._device_id]
+        )
+
+
+class ThermosmartMetricSensor(SensorEntity):
+    """Diagnostic sensor showing a metric of the config entry."""
+
+    _attr_has_entity_name = True
+    _attr_should_poll = True
+
+    def __init__(
+        self,
+        coordinator: ThermosmartCoordinator,
+        config_entry: ConfigEntry,
+        device_id: str,
+        name: str,
+        description: SensorEntityDescription,
+    ):
+        """Initialize the sensor."""
+        self._metrics = coordinator.metrics
+        self.entity_description = description
+        self._attr_unique_id = config_entry.entry_id + "_" + description.key
         self._attr_device_info = DeviceInfo(
-            identifiers={(DOMAIN, unique_id)},
+            identifiers={(DOMAIN, device_id)},
             manufacturer="Thermosmart",
             model="V3",
             name=name,
         )
-        self._attr_unique_id = unique_id + "_" + sensor
-
-        if (
-            sensor == "Control setpoint"
-            or "Hot water temperature"
-            or "Return water temperature"
-        ):
-            self._attr_device_class = SensorDeviceClass.TEMPERATURE
-            self._attr_native_unit_of_measurement = UnitOfTemperature.CELSIUS
-        if sensor == "Water pressure":
-            self._attr_device_class = SensorDeviceClass.PRESSURE
-            self._attr_native_unit_of_measurement = UnitOfPressure.BAR
-        else:
-            self._attr_device_class = None
-            self._attr_native_unit_of_measurement = SENSOR_LIST.get(sensor, "")
 
-    @callback
-    def _handle_coordinator_update(self) -> None:
-        self._attr_native_value = (
-            self.coordinator.data["ot"]["readable"][self._sensor]
-            if self.coordinator.data.get("ot")
-            else None
-        )
-        self.async_write_ha_state()
+    @property
+    def native_value(self):
+        """Return the current value of the metric."""
+        return METRIC_VALUES[self.entity_description.key](self._metrics)
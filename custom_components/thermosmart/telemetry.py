@@ -0,0 +1,200 @@
+"""Hourly long-term statistics of the OpenTherm boiler values."""
+from __future__ import annotations
+
+from collections import deque
+from datetime import datetime
+import logging
+from time import time
+from typing import TYPE_CHECKING, NamedTuple
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_change
+from homeassistant.util import dt as dt_util, slugify
+
+from .const import DOMAIN
+
+if TYPE_CHECKING:
+    from . import ThermosmartCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+HOUR = 3600
+# Completed hours kept per channel until they are imported
+PENDING_HOURS = 48
+
+
+class HourStatistics(NamedTuple):
+    """Time-weighted mean, minimum and maximum of a channel over an hour."""
+
+    start: float
+    mean: float
+    min: float
+    max: float
+
+
+class HourlyChannel:
+    """Aggregate the samples of one value into hourly statistics.
+
+    A value holds until the next sample, so the mean is weighted by how long
+    each value was reported. Only the running sums of the current hour and a
+    ring buffer of completed hours are kept, memory does not depend on the
+    number of samples.
+    """
+
+    __slots__ = (
+        "completed",
+        "_hour",
+        "_value",
+        "_since",
+        "_area",
+        "_covered",
+        "_min",
+        "_max",
+    )
+
+    def __init__(self) -> None:
+        """Initialize the channel."""
+        self.completed: deque[HourStatistics] = deque(maxlen=PENDING_HOURS)
+        self._hour: float | None = None
+        self._value: float | None = None
+        self._since = 0.0
+        self._area = 0.0
+        self._covered = 0.0
+        self._min: float | None = None
+        self._max: float | None = None
+
+    def add(self, timestamp: float, value: float | None) -> None:
+        """Add a sample, None if the value is not available."""
+        self.advance(timestamp)
+        if self._hour is None:
+            self._hour = timestamp - timestamp % HOUR
+        self._value = value
+        self._since = timestamp
+        if value is not None:
+            self._min = value if self._min is None else min(self._min, value)
+            self._max = value if self._max is None else max(self._max, value)
+
+    def advance(self, timestamp: float) -> None:
+        """Account the current value up to a time, completing past hours."""
+        if self._hour is None or timestamp <= self._since:
+            return
+        while timestamp >= self._hour + HOUR:
+            end = self._hour + HOUR
+            self._accumulate(end)
+            if self._covered:
+                self.completed.append(
+                    HourStatistics(
+                        self._hour, self._area / self._covered, self._min, self._max
+                    )
+                )
+            self._hour = end
+            self._area = self._covered = 0.0
+            self._min = self._max = self._value
+        self._accumulate(timestamp)
+
+    def _accumulate(self, timestamp: float) -> None:
+        """Add the current value from the last sample up to a time."""
+        if self._value is not None:
+            self._area += self._value * (timestamp - self._since)
+            self._covered += timestamp - self._since
+        self._since = timestamp
+
+
+class BoilerStatistics:
+    """Import hourly statistics of the boiler values of a coordinator.
+
+    Statistics are imported as external statistics with the id
+    thermosmart:<thermostat>_<value>, once an hour has passed.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        coordinator: ThermosmartCoordinator,
+        names: dict[str, str],
+        units: dict[str, str | None],
+    ) -> None:
+        """Initialize the statistics of the named thermostats and values."""
+        self._hass = hass
+        self._coordinator = coordinator
+        self._names = names
+        self._units = units
+        self._channels: dict[tuple[str, str], HourlyChannel] = {}
+
+    @callback
+    def async_start(self) -> CALLBACK_TYPE:
+        """Start collecting samples, return a function to stop."""
+        remove_listener = self._coordinator.async_add_listener(self._async_sample)
+        # Complete and import the past hour shortly after it ends
+        remove_timer = async_track_time_change(
+            self._hass, self._async_import, minute=0, second=30
+        )
+
+        @callback
+        def stop() -> None:
+            remove_listener()
+            remove_timer()
+
+        return stop
+
+    @callback
+    def _async_sample(self) -> None:
+        """Add the values of the latest coordinator data."""
+        if not self._coordinator.last_update_success:
+            return
+        now = time()
+        for device_id, snapshot in self._coordinator.snapshots.items():
+            if device_id not in self._names:
+                continue
+            for key in self._units:
+                value = snapshot.ot_value(key)
+                channel = self._channels.get((device_id, key))
+                if channel is None:
+                    if not isinstance(value, int | float):
+                        continue
+                    channel = self._channels[(device_id, key)] = HourlyChannel()
+                channel.add(now, value if isinstance(value, int | float) else None)
+
+    @callback
+    def _async_import(self, _now: datetime | None = None) -> None:
+        """Import the statistics of all completed hours."""
+        # Imported lazily, the recorder is an optional dependency
+        from homeassistant.components.recorder.models import (  # pylint: disable=import-outside-toplevel
+            StatisticData,
+            StatisticMetaData,
+        )
+        from homeassistant.components.recorder.statistics import (  # pylint: disable=import-outside-toplevel
+            async_add_external_statistics,
+        )
+
+        now = time()
+        for (device_id, key), channel in self._channels.items():
+            channel.advance(now)
+            if not channel.completed:
+                continue
+
+            statistics = [
+                StatisticData(
+                    start=dt_util.utc_from_timestamp(hour.start),
+                    mean=hour.mean,
+                    min=hour.min,
+                    max=hour.max,
+                )
+                for hour in channel.completed
+            ]
+            channel.completed.clear()
+            _LOGGER.debug(
+                "Importing %s hours of %s of %s", len(statistics), key, device_id
+            )
+            async_add_external_statistics(
+                self._hass,
+                StatisticMetaData(
+                    has_mean=True,
+                    has_sum=False,
+                    name=f"{self._names[device_id]} {key}",
+                    source=DOMAIN,
+                    statistic_id=f"{DOMAIN}:{slugify(f'{device_id}_{key}')}",
+                    unit_of_measurement=self._units[key],
+                ),
+                statistics,
+            )
@@ -0,0 +1,123 @@
+"""Opt-in trace of the data received from the Thermosmart cloud.
+
+The trace is an append-only, gzip compressed file with one JSON record per
+line: {"t": <unix time>, "k": "data" | "webhook", "d": <payload>}. "data"
+records are the polled data of all thermostats (keyed by device id), "webhook"
+records the webhook messages as received. scripts/replay feeds a trace back
+through a coordinator.
+"""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta
+import gzip
+import json
+import logging
+import os
+from time import time
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+
+_LOGGER = logging.getLogger(__name__)
+
+TRACE_FILE = "thermosmart_trace_{entry_id}.jsonl.gz"
+TRACE_DATA = "data"
+TRACE_WEBHOOK = "webhook"
+# Buffered records are written at this interval, or once there are this many
+TRACE_FLUSH_INTERVAL = timedelta(seconds=30)
+TRACE_FLUSH_SIZE = 100
+# Recording stops when the file reaches this size
+MAX_TRACE_SIZE = 50 * 1024 * 1024
+
+
+def read_trace(path: str) -> list[dict[str, Any]]:
+    """Return the records of a trace, skipping a truncated last line."""
+    records = []
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        try:
+            for line in file:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    _LOGGER.debug("Skipping invalid trace record %s", line)
+        except EOFError:
+            _LOGGER.debug("Trace %s ends with an incomplete block", path)
+    return records
+
+
+class TraceRecorder:
+    """Append the received data of a coordinator to a trace file.
+
+    Records are serialized when they are received, so later changes to the
+    data do not affect them, and written in batches in the executor.
+    """
+
+    def __init__(self, hass: HomeAssistant, path: str) -> None:
+        """Initialize the recorder of a trace file."""
+        self._hass = hass
+        self.path = path
+        self._buffer: list[str] = []
+        self._lock = asyncio.Lock()
+        self._full = False
+        self._cancel_timer: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_start(self) -> None:
+        """Start writing the buffered records periodically."""
+        _LOGGER.info("Recording a Thermosmart trace to %s", self.path)
+        self._cancel_timer = async_track_time_interval(
+            self._hass, self._async_flush, TRACE_FLUSH_INTERVAL
+        )
+
+    async def async_stop(self) -> None:
+        """Stop recording and write the remaining records."""
+        if self._cancel_timer is not None:
+            self._cancel_timer()
+            self._cancel_timer = None
+        await self._async_flush()
+        self._full = True
+
+    @callback
+    def async_record(self, kind: str, payload: Any) -> None:
+        """Add a record to the trace."""
+        if self._full:
+            return
+        self._buffer.append(
+            json.dumps(
+                {"t": round(time(), 3), "k": kind, "d": payload},
+                separators=(",", ":"),
+                default=str,
+            )
+        )
+        if len(self._buffer) >= TRACE_FLUSH_SIZE:
+            self._hass.async_create_task(self._async_flush())
+
+    async def _async_flush(self, _now: datetime | None = None) -> None:
+        """Write the buffered records, in the order they were recorded."""
+        async with self._lock:
+            if not self._buffer:
+                return
+            lines, self._buffer = self._buffer, []
+            try:
+                size = await self._hass.async_add_executor_job(self._write, lines)
+            except OSError as err:
+                _LOGGER.warning("Could not write the Thermosmart trace: %s", err)
+                self._full = True
+                return
+
+        if size >= MAX_TRACE_SIZE and not self._full:
+            _LOGGER.warning(
+                "Thermosmart trace %s reached %s bytes, stopped recording",
+                self.path,
+                size,
+            )
+            self._full = True
+
+    def _write(self, lines: list[str]) -> int:
+        """Append lines to the trace file, return its size."""
+        # Every batch is a gzip member, a sequence of members is a valid file
+        with gzip.open(self.path, "at", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+        return os.path.getsize(self.path)
@@ -0,0 +1,201 @@
+"""Validation and filtering of Thermosmart webhook messages."""
+from __future__ import annotations
+
+from collections.abc import Awaitable, Callable
+from datetime import datetime
+import json
+import logging
+from typing import Any
+
+import voluptuous as vol
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.network import NoURLAvailableError
+
+from .api import ThermosmartApiError
+
+_LOGGER = logging.getLogger(__name__)
+
+# Larger requests are dropped without reading them
+MAX_WEBHOOK_SIZE = 65536
+# Messages received within this window result in one coordinator update
+WEBHOOK_COOLDOWN = 0.5
+# Fields that, if the cloud sends them, order the messages of a thermostat
+SEQUENCE_KEYS = ("seq", "timestamp")
+# Code of the message the cloud sends when the webhook has expired
+WEBHOOK_EXPIRED = 510
+# Renew the webhook this often, unless the cloud says when it expires
+WEBHOOK_RENEW_INTERVAL = 12 * 3600
+# Renew when this fraction of the lifetime given by the cloud has passed
+WEBHOOK_RENEW_FRACTION = 0.8
+# Delay of the first retry of a failed registration, doubled up to the maximum
+WEBHOOK_RETRY_DELAY = 60
+MAX_WEBHOOK_RETRY_DELAY = 3600
+
+_NUMBER = vol.Any(None, vol.Coerce(float))
+
+WEBHOOK_SCHEMA = vol.Schema(
+    {
+        vol.Required("thermostat"): cv.string,
+        vol.Optional("room_temperature"): _NUMBER,
+        vol.Optional("target_temperature"): _NUMBER,
+        vol.Optional("outside_temperature"): _NUMBER,
+        vol.Optional("programs"): {cv.string: _NUMBER},
+        vol.Optional("schedule"): [dict],
+        vol.Optional("exceptions"): [dict],
+        vol.Optional("source"): cv.string,
+        vol.Optional("ot"): vol.Schema(
+            {
+                # OpenTherm messages are a two character prefix and hex bytes
+                vol.Required("raw"): {
+                    cv.string: vol.Match(r"^\w{2}(?:[0-9A-Fa-f]{2})+$")
+                },
+            },
+            extra=vol.ALLOW_EXTRA,
+        ),
+        vol.Optional("seq"): vol.Coerce(float),
+        vol.Optional("timestamp"): vol.Coerce(float),
+    },
+    extra=vol.ALLOW_EXTRA,
+)
+
+
+class WebhookFilter:
+    """Drop duplicate and out-of-order webhook messages.
+
+    Only the sequence number (if any) and a digest of the last accepted
+    message are kept per thermostat, so memory use does not grow with the
+    number of messages.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the filter."""
+        self._last: dict[str, tuple[float | None, int]] = {}
+
+    def accept(self, message: dict[str, Any]) -> bool:
+        """Return if a validated message is new and should be processed."""
+        device_id = message["thermostat"]
+        sequence = next(
+            (message[key] for key in SEQUENCE_KEYS if key in message), None
+        )
+        digest = hash(json.dumps(message, sort_keys=True, default=str))
+
+        last_sequence, last_digest = self._last.get(device_id, (None, None))
+        if digest == last_digest:
+            return False
+        if None not in (sequence, last_sequence) and sequence <= last_sequence:
+            return False
+
+        self._last[device_id] = (
+            sequence if sequence is not None else last_sequence,
+            digest,
+        )
+        return True
+
+
+class WebhookRegistration:
+    """Keep the webhook of an account registered with the Thermosmart cloud.
+
+    The url of the webhook is registered on start and renewed in the
+    background before it expires, or right away when the cloud reports that
+    it expired. Failed registrations are retried with an increasing delay.
+    The callback is called with the new state whenever push delivery starts
+    or stops working.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        webhook_id: str,
+        register: Callable[[str], Awaitable[Any]],
+        on_change: Callable[[bool], None],
+    ) -> None:
+        """Initialize the registration of a webhook."""
+        self._hass = hass
+        self._webhook_id = webhook_id
+        self._register = register
+        self._on_change = on_change
+        self.active = False
+        self._retry_delay = WEBHOOK_RETRY_DELAY
+        self._cancel_timer: CALLBACK_TYPE | None = None
+        self._stopped = False
+
+    @callback
+    def async_start(self) -> None:
+        """Register the webhook in the background."""
+        self._async_schedule(0)
+
+    @callback
+    def async_expired(self) -> None:
+        """Handle the expired notification of the cloud."""
+        _LOGGER.info("Thermosmart webhook expired, renewing")
+        self._async_set_active(False)
+        self._retry_delay = WEBHOOK_RETRY_DELAY
+        self._async_schedule(0)
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop renewing the webhook."""
+        self._stopped = True
+        if self._cancel_timer is not None:
+            self._cancel_timer()
+            self._cancel_timer = None
+
+    @callback
+    def _async_schedule(self, delay: float) -> None:
+        """Schedule a registration."""
+        if self._stopped:
+            return
+        if self._cancel_timer is not None:
+            self._cancel_timer()
+        self._cancel_timer = async_call_later(self._hass, delay, self._async_renew)
+
+    async def _async_renew(self, _now: datetime | None = None) -> None:
+        """Register the url of the webhook with the cloud."""
+        # Imported lazily, the webhook component is only used with a webhook
+        from homeassistant.components.webhook import (  # pylint: disable=import-outside-toplevel
+            async_generate_url,
+        )
+
+        self._cancel_timer = None
+        try:
+            result = await self._register(
+                async_generate_url(self._hass, self._webhook_id)
+            )
+        except NoURLAvailableError:
+            # Retrying will not help until the url is configured and reloaded
+            _LOGGER.warning(
+                "Could not register the Thermosmart webhook, the url of Home "
+                "Assistant is not configured"
+            )
+            self._async_set_active(False)
+            return
+        except ThermosmartApiError as err:
+            _LOGGER.warning(
+                "Could not register the Thermosmart webhook, retrying in %s s: %s",
+                self._retry_delay,
+                err,
+            )
+            self._async_set_active(False)
+            self._async_schedule(self._retry_delay)
+            self._retry_delay = min(self._retry_delay * 2, MAX_WEBHOOK_RETRY_DELAY)
+            return
+
+        self._retry_delay = WEBHOOK_RETRY_DELAY
+        lifetime = result.get("expires_in") if isinstance(result, dict) else None
+        if isinstance(lifetime, int | float) and lifetime > 0:
+            delay = lifetime * WEBHOOK_RENEW_FRACTION
+        else:
+            delay = WEBHOOK_RENEW_INTERVAL
+        _LOGGER.debug("Registered the Thermosmart webhook, renewing in %s s", delay)
+        self._async_set_active(True)
+        self._async_schedule(delay)
+
+    @callback
+    def _async_set_active(self, active: bool) -> None:
+        """Update whether push delivery works, until stopped."""
+        if active != self.active and not self._stopped:
+            self.active = active
+            self._on_change(active)
@@ -0,0 +1,402 @@
+"""Benchmark the Thermosmart integration against the fake cloud.
+
+Starts FakeThermosmartCloud and a bare Home Assistant core in-process and
+sets up config entries of the integration against it, through the config
+entry manager like Home Assistant does. Measures:
+
+- setup: async_setup_entry per entry, i.e. token refresh, thermostat
+  discovery, first refresh and the entities, limited by the startup scheduler
+  of the integration
+- startup: setup time and peak concurrent requests for a growing number of
+  entries, with and without the scheduler (--sweep)
+- polling: throughput of refreshing all entries
+- commands: round trip of a setpoint change until the refreshed data shows it
+- webhook: time from a cloud push until the coordinator publishes the update
+
+The entries are MockConfigEntry objects, which take the arguments of the
+ConfigEntry of the installed Home Assistant, so the benchmark needs the test
+requirements (requirements_test.txt).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any
+from unittest.mock import patch
+
+from aiohttp import ClientResponse, ClientSession, web
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from homeassistant.auth import auth_manager_from_config  # noqa: E402
+from homeassistant.bootstrap import async_load_base_functionality  # noqa: E402
+from homeassistant.config_entries import (  # noqa: E402
+    ConfigEntries,
+    ConfigEntry,
+    ConfigEntryState,
+)
+from homeassistant.core import HomeAssistant  # noqa: E402
+from homeassistant.helpers.config_entry_oauth2_flow import (  # noqa: E402
+    LocalOAuth2Implementation,
+    async_register_implementation,
+)
+from homeassistant.loader import async_setup as async_setup_loader  # noqa: E402
+from homeassistant.setup import async_setup_component  # noqa: E402
+from pytest_homeassistant_custom_component.common import (  # noqa: E402
+    MockConfigEntry,
+)
+
+from custom_components.thermosmart import ThermosmartCoordinator  # noqa: E402
+from custom_components.thermosmart.api import (  # noqa: E402
+    BASE_URL,
+    COMMAND_DELAY,
+    ThermosmartDevice,
+)
+from custom_components.thermosmart.const import DOMAIN  # noqa: E402
+from custom_components.thermosmart.registry import ThermosmartRegistry  # noqa: E402
+from custom_components.thermosmart.scheduler import (  # noqa: E402
+    STARTUP_CONCURRENCY,
+    StartupScheduler,
+)
+from fake_cloud import FakeThermosmartCloud  # noqa: E402
+
+WEBHOOK_ID = "benchmark"
+REPOSITORY = os.path.join(os.path.dirname(__file__), "..")
+
+
+def _summary(samples: list[float]) -> dict[str, float]:
+    """Return latency percentiles in milliseconds."""
+    if not samples:
+        return {}
+    if len(samples) == 1:
+        samples = samples * 2
+    quantiles = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "p50_ms": round(quantiles[49] * 1000, 2),
+        "p95_ms": round(quantiles[94] * 1000, 2),
+        "max_ms": round(max(samples) * 1000, 2),
+    }
+
+
+class CloudSession:
+    """Send the requests of the integration to the fake cloud."""
+
+    def __init__(self, session: ClientSession, url: str) -> None:
+        """Initialize the session."""
+        self._session = session
+        self._url = url
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> ClientResponse:
+        """Make a request to the fake cloud instead of the Thermosmart API."""
+        return await self._session.request(
+            method, self._url + url.removeprefix(BASE_URL), **kwargs
+        )
+
+
+class Benchmark:
+    """Runs the benchmarks and collects the results."""
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        """Initialize the benchmark."""
+        self.args = args
+        self.cloud = FakeThermosmartCloud(
+            accounts=max([args.entries, *args.sweep]),
+            thermostats=args.thermostats,
+            latency=args.latency,
+            error_rate=args.error_rate,
+        )
+        self.results: dict[str, dict[str, Any]] = {}
+        self.coordinators: list[ThermosmartCoordinator] = []
+
+    async def run(self) -> dict[str, dict[str, Any]]:
+        """Run all benchmarks."""
+        url = await self.cloud.start()
+        config_dir = tempfile.mkdtemp()
+        # The config directory of the core holds the custom integration
+        os.symlink(
+            os.path.abspath(os.path.join(REPOSITORY, "custom_components")),
+            os.path.join(config_dir, "custom_components"),
+        )
+        hass = HomeAssistant(config_dir)
+        hass.config.skip_pip = True
+        try:
+            async with ClientSession() as session:
+                with self._patch(session, url):
+                    await self._setup_hass(hass, url)
+                    await self.startup(hass)
+                    await self.setup(hass)
+                    await self.polling()
+                    await self.commands()
+                    await self.webhook(hass)
+        finally:
+            await hass.async_stop(force=True)
+            await self.cloud.stop()
+        return self.results
+
+    def _patch(self, session: ClientSession, url: str) -> Any:
+        """Point the integration at the fake cloud, with the command delay."""
+        return patch.multiple(
+            "custom_components.thermosmart",
+            async_get_clientsession=lambda hass: CloudSession(session, url),
+            ThermosmartDevice=lambda *args, **kwargs: ThermosmartDevice(
+                *args, command_delay=self.args.command_delay, **kwargs
+            ),
+        )
+
+    async def _setup_hass(self, hass: HomeAssistant, url: str) -> None:
+        """Set up the core and the integration, without entries."""
+        async_setup_loader(hass)
+        hass.config_entries = ConfigEntries(hass, {})
+        await async_load_base_functionality(hass)
+        # The integration depends on application_credentials, which needs auth
+        hass.auth = await auth_manager_from_config(hass, [], [])
+        async_register_implementation(
+            hass,
+            DOMAIN,
+            LocalOAuth2Implementation(
+                hass,
+                DOMAIN,
+                "benchmark",
+                "benchmark",
+                url + "/oauth2/authorize",
+                url + "/oauth2/token",
+            ),
+        )
+        if not await async_setup_component(hass, DOMAIN, {}):
+            raise RuntimeError("Could not set up the Thermosmart integration")
+
+    async def _setup_entry(
+        self, hass: HomeAssistant, number: int
+    ) -> tuple[ConfigEntry, float | None]:
+        """Add and set up the entry of an account, as created by the config flow.
+
+        Returns the entry and the duration, None if the setup failed.
+        """
+        thermostat_id = self.cloud.accounts[f"token-{number}"][0]
+        entry = MockConfigEntry(
+            domain=DOMAIN,
+            title="Thermosmart",
+            data={
+                "auth_implementation": DOMAIN,
+                # Expired, so the setup starts with a token refresh
+                "token": {
+                    "access_token": "expired",
+                    "refresh_token": f"token-{number}",
+                    "token_type": "Bearer",
+                    "expires_at": 0,
+                },
+                "id": thermostat_id,
+                "name": f"Thermosmart {number}",
+            },
+            unique_id=thermostat_id,
+        )
+        start = time.perf_counter()
+        await hass.config_entries.async_add(entry)
+        if entry.state is not ConfigEntryState.LOADED:
+            return entry, None
+        return entry, time.perf_counter() - start
+
+    async def _setup_entries(
+        self, hass: HomeAssistant, entries: int, limit: int
+    ) -> tuple[list[ConfigEntry], dict[str, Any]]:
+        """Set up entries concurrently, return the entries and results."""
+        self.cloud.reset_stats()
+        registry: ThermosmartRegistry = hass.data.setdefault(
+            DOMAIN, ThermosmartRegistry()
+        )
+        registry.scheduler = StartupScheduler(limit)
+        start = time.perf_counter()
+        setups = await asyncio.gather(
+            *(self._setup_entry(hass, number) for number in range(entries))
+        )
+        durations = [duration for _, duration in setups if duration is not None]
+        return [entry for entry, _ in setups], {
+            "entries": entries,
+            "startup_limit": limit,
+            "total_s": round(time.perf_counter() - start, 3),
+            **_summary(durations),
+            "failed": entries - len(durations),
+            "requests": sum(self.cloud.requests.values()),
+            "peak_concurrent_requests": self.cloud.peak_in_flight,
+        }
+
+    async def setup(self, hass: HomeAssistant) -> None:
+        """Set up all entries concurrently."""
+        entries, self.results["setup"] = await self._setup_entries(
+            hass, self.args.entries, self.args.startup_limit
+        )
+        registry: ThermosmartRegistry = hass.data[DOMAIN]
+        self.coordinators = [
+            registry.entries[entry.entry_id]
+            for entry in entries
+            if entry.entry_id in registry.entries
+        ]
+
+    async def startup(self, hass: HomeAssistant) -> None:
+        """Set up a growing number of entries, with and without the scheduler."""
+        for entries in self.args.sweep:
+            for limit in sorted({0, self.args.startup_limit}):
+                added, results = await self._setup_entries(hass, entries, limit)
+                for entry in added:
+                    await hass.config_entries.async_remove(entry.entry_id)
+                self.results[f"startup {entries} entries, limit {limit}"] = results
+
+    async def polling(self) -> None:
+        """Refresh all entries for a number of rounds."""
+        self.cloud.reset_stats()
+        durations = []
+        failed = 0
+        retries = sum(coordinator.metrics.retries for coordinator in self.coordinators)
+        start = time.perf_counter()
+        for _ in range(self.args.rounds):
+            round_start = time.perf_counter()
+            await asyncio.gather(
+                *(coordinator.async_refresh() for coordinator in self.coordinators)
+            )
+            durations.append(time.perf_counter() - round_start)
+            failed += sum(
+                not coordinator.last_update_success
+                for coordinator in self.coordinators
+            )
+        elapsed = time.perf_counter() - start
+        requests = sum(self.cloud.requests.values())
+        self.results["polling"] = {
+            "rounds": self.args.rounds,
+            "refreshes_per_s": round(
+                self.args.rounds * len(self.coordinators) / elapsed, 1
+            ),
+            "requests_per_s": round(requests / elapsed, 1),
+            "failed_refreshes": failed,
+            "retries": sum(
+                coordinator.metrics.retries for coordinator in self.coordinators
+            )
+            - retries,
+            **_summary(durations),
+        }
+
+    async def commands(self) -> None:
+        """Change the setpoint of the first thermostat and wait until it shows."""
+        coordinator = self.coordinators[0]
+        device_id, device = next(iter(coordinator.devices.items()))
+        self.cloud.reset_stats()
+        durations = []
+        failed = 0
+        for number in range(self.args.commands):
+            temperature = 15 + number % 10
+            start = time.perf_counter()
+            try:
+                await device.set_target_temperature(temperature)
+            except Exception:  # pylint: disable=broad-except
+                failed += 1
+                continue
+            await coordinator.async_refresh()
+            if coordinator.data[device_id]["target_temperature"] == temperature:
+                durations.append(time.perf_counter() - start)
+            else:
+                failed += 1
+        self.results["commands"] = {
+            "commands": self.args.commands,
+            "failed": failed,
+            "requests": sum(self.cloud.requests.values()),
+            **_summary(durations),
+        }
+
+    async def webhook(self, hass: HomeAssistant) -> None:
+        """Push changes from the cloud and wait for the coordinator update."""
+        coordinator = self.coordinators[0]
+        device_id = next(iter(coordinator.devices))
+        updated = asyncio.Event()
+        remove_listener = coordinator.async_add_listener(updated.set)
+
+        async def receive(request: web.Request) -> web.Response:
+            await coordinator.handle_webhook(hass, WEBHOOK_ID, request)
+            return web.Response()
+
+        app = web.Application()
+        app.router.add_post(f"/api/webhook/{WEBHOOK_ID}", receive)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        account = next(
+            account for account, ids in self.cloud.accounts.items() if device_id in ids
+        )
+        self.cloud.webhooks[account] = f"http://127.0.0.1:{port}/api/webhook/{WEBHOOK_ID}"
+
+        durations = []
+        try:
+            for number in range(self.args.pushes):
+                updated.clear()
+                start = time.perf_counter()
+                await self.cloud.push(
+                    device_id, {"room_temperature": 15 + number / 10}
+                )
+                try:
+                    await asyncio.wait_for(updated.wait(), 5)
+                except asyncio.TimeoutError:
+                    continue
+                durations.append(time.perf_counter() - start)
+        finally:
+            remove_listener()
+            await runner.cleanup()
+
+        self.results["webhook"] = {
+            "pushes": self.args.pushes,
+            "delivered": len(durations),
+            **_summary(durations),
+        }
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=10, help="config entries")
+    parser.add_argument("--thermostats", type=int, default=1, help="per entry")
+    parser.add_argument("--rounds", type=int, default=20, help="polling rounds")
+    parser.add_argument("--commands", type=int, default=20)
+    parser.add_argument("--pushes", type=int, default=20, help="webhook pushes")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="0-1")
+    parser.add_argument(
+        "--command-delay",
+        type=float,
+        default=COMMAND_DELAY,
+        help="command coalescing window in seconds",
+    )
+    parser.add_argument(
+        "--startup-limit",
+        type=int,
+        default=STARTUP_CONCURRENCY,
+        help="entries calling the cloud at once during setup, 0 for no limit",
+    )
+    parser.add_argument(
+        "--sweep",
+        type=lambda value: [int(entries) for entries in value.split(",") if entries],
+        default=[],
+        help="comma separated numbers of entries to compare startup for, e.g. 10,100,500",
+    )
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = asyncio.run(Benchmark(args).run())
+
+    if args.json:
+        sys.stdout.write(json.dumps(results, indent=2) + "\n")
+        return
+    for name, values in results.items():
+        sys.stdout.write(f"{name}:\n")
+        for key, value in values.items():
+            sys.stdout.write(f"  {key:<26} {value}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+"""Local stand-in for the Thermosmart cloud API.
+
+Implements the OAuth, thermostat, exceptions, pause and webhook endpoints used
+by the integration, with optional latency, errors and webhook pushes. Run it
+stand-alone with ``scripts/fake_cloud`` or embed FakeThermosmartCloud in a
+benchmark.
+
+Every account has its own access token ``token-<n>`` (the authorization code
+``account-<n>`` is exchanged for it) and owns ``--thermostats`` thermostats.
+The behaviour can be changed at runtime:
+
+    POST /_control        {"latency": 0.2, "error_rate": 0.1}
+    POST /_control/push   {"thermostat": "ts-0-0", "room_temperature": 21}
+    GET  /_control        request statistics
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections import Counter
+import contextlib
+import copy
+import logging
+import random
+from typing import Any
+
+from aiohttp import ClientError, ClientSession, web
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _f88(value: float) -> str:
+    """Encode a value as an OpenTherm f8.8 message."""
+    return "0x" + int(value * 256).to_bytes(2, "big", signed=True).hex()
+
+
+def _thermostat(thermostat_id: str) -> dict[str, Any]:
+    """Return the initial state of a thermostat."""
+    return {
+        "hw": thermostat_id,
+        "name": thermostat_id,
+        "room_temperature": 20.0,
+        "target_temperature": 20.0,
+        "outside_temperature": 10.0,
+        "source": "schedule",
+        "programs": {
+            "anti_freeze": 5,
+            "not_home": 15,
+            "home": 19,
+            "comfort": 21,
+            "pause": 5,
+        },
+        "schedule": [
+            {"start": [day, 7, 0], "temperature": "home"} for day in range(7)
+        ]
+        + [{"start": [day, 23, 0], "temperature": "not_home"} for day in range(7)],
+        "exceptions": [],
+        "ot": {
+            "enabled": True,
+            "raw": {
+                "ot0": "0x0000",
+                "ot1": _f88(40),
+                "ot3": "0x0000",
+                "ot17": _f88(0),
+                "ot18": _f88(1.5),
+                "ot19": _f88(0),
+                "ot25": _f88(45),
+                "ot26": _f88(50),
+                "ot28": _f88(35),
+            },
+        },
+    }
+
+
+class FakeThermosmartCloud:
+    """In-memory Thermosmart cloud served over aiohttp."""
+
+    def __init__(
+        self,
+        accounts: int = 1,
+        thermostats: int = 1,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        retry_after: float | None = None,
+    ) -> None:
+        """Initialize the fake cloud."""
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+
+        self.accounts: dict[str, list[str]] = {}
+        self.thermostats: dict[str, dict[str, Any]] = {}
+        for account in range(accounts):
+            ids = [f"ts-{account}-{number}" for number in range(thermostats)]
+            self.accounts[f"token-{account}"] = ids
+            for thermostat_id in ids:
+                self.thermostats[thermostat_id] = _thermostat(thermostat_id)
+        self.webhooks: dict[str, str] = {}
+
+        self.requests: Counter[str] = Counter()
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+        self._runner: web.AppRunner | None = None
+        self._session: ClientSession | None = None
+        # Pushes started by API requests, referenced until they are done
+        self._pushes: set[asyncio.Task[bool]] = set()
+        self.url = ""
+
+    def reset_stats(self) -> None:
+        """Reset the request statistics."""
+        self.requests.clear()
+        self.errors = 0
+        self.peak_in_flight = self.in_flight
+
+    def app(self) -> web.Application:
+        """Return the aiohttp application."""
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_post("/oauth2/token", self._token)
+        app.router.add_get("/oauth2/authorize", self._authorize)
+        app.router.add_get("/thermostat", self._list)
+        app.router.add_get("/thermostat/{id}", self._get)
+        app.router.add_put("/thermostat/{id}", self._put)
+        app.router.add_post("/thermostat/{id}/pause", self._pause)
+        app.router.add_post("/", self._webhook)
+        app.router.add_get("/_control", self._control_stats)
+        app.router.add_post("/_control", self._control)
+        app.router.add_post("/_control/push", self._control_push)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving and return the base url."""
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self) -> None:
+        """Stop serving."""
+        for task in self._pushes:
+            task.cancel()
+        if self._session:
+            await self._session.close()
+        if self._runner:
+            await self._runner.cleanup()
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler) -> web.StreamResponse:
+        """Count requests and inject latency and errors."""
+        if request.path.startswith("/_control"):
+            return await handler(request)
+
+        route = request.match_info.route.resource
+        self.requests[f"{request.method} {route.canonical if route else request.path}"] += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            # Errors are only injected in the API, not in the OAuth endpoints
+            if (
+                not request.path.startswith("/oauth2")
+                and random.random() < self.error_rate
+            ):
+                self.errors += 1
+                headers = {}
+                if self.retry_after is not None:
+                    headers["Retry-After"] = str(self.retry_after)
+                return web.Response(status=self.error_status, headers=headers)
+            return await handler(request)
+        finally:
+            self.in_flight -= 1
+
+    def _account(self, request: web.Request) -> str:
+        """Return the account of the bearer token of a request."""
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if token not in self.accounts:
+            raise web.HTTPUnauthorized
+        return token
+
+    def _owned(self, request: web.Request) -> dict[str, Any]:
+        """Return the requested thermostat if the account owns it."""
+        account = self._account(request)
+        thermostat_id = request.match_info["id"]
+        if thermostat_id not in self.thermostats:
+            raise web.HTTPNotFound
+        if thermostat_id not in self.accounts[account]:
+            raise web.HTTPForbidden
+        return self.thermostats[thermostat_id]
+
+    async def _token(self, request: web.Request) -> web.Response:
+        data = await request.post()
+        if data.get("grant_type") == "refresh_token":
+            token = str(data.get("refresh_token"))
+        else:
+            token = str(data.get("code", "")).replace("account-", "token-")
+        if token not in self.accounts:
+            return web.json_response({"error": "invalid_grant"}, status=400)
+        return web.json_response(
+            {
+                "access_token": token,
+                "refresh_token": token,
+                "token_type": "Bearer",
+                "expires_in": 3600,
+            }
+        )
+
+    async def _authorize(self, request: web.Request) -> web.Response:
+        query = request.query
+        raise web.HTTPFound(
+            f"{query['redirect_uri']}?code=account-0&state={query.get('state', '')}"
+        )
+
+    async def _list(self, request: web.Request) -> web.Response:
+        ids = self.accounts[self._account(request)]
+        if len(ids) == 1:
+            return web.json_response(self.thermostats[ids[0]])
+        return web.json_response([self.thermostats[thermostat] for thermostat in ids])
+
+    async def _get(self, request: web.Request) -> web.Response:
+        return web.json_response(self._owned(request))
+
+    async def _put(self, request: web.Request) -> web.Response:
+        thermostat = self._owned(request)
+        changes = await request.json()
+        thermostat.update(changes)
+        if "target_temperature" in changes:
+            thermostat["source"] = "remote"
+        self._notify(thermostat["hw"], changes)
+        return web.json_response({})
+
+    async def _pause(self, request: web.Request) -> web.Response:
+        thermostat = self._owned(request)
+        pause = (await request.json())["pause"]
+        thermostat["source"] = "pause" if pause else "schedule"
+        self._notify(thermostat["hw"], {"source": thermostat["source"]})
+        return web.json_response({})
+
+    async def _webhook(self, request: web.Request) -> web.Response:
+        self.webhooks[self._account(request)] = (await request.json())["webhook_url"]
+        return web.json_response({})
+
+    async def _control_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "requests": dict(self.requests),
+                "errors": self.errors,
+                "peak_in_flight": self.peak_in_flight,
+            }
+        )
+
+    async def _control(self, request: web.Request) -> web.Response:
+        for key, value in (await request.json()).items():
+            if key in ("latency", "error_rate", "error_status", "retry_after"):
+                setattr(self, key, value)
+        return web.json_response({})
+
+    async def _control_push(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        await self.push(data.pop("thermostat"), data)
+        return web.json_response({})
+
+    def _notify(self, thermostat_id: str, changes: dict[str, Any]) -> None:
+        """Push changes made through the API to the webhook, if any."""
+        if self.webhook_url(thermostat_id):
+            task = asyncio.get_running_loop().create_task(
+                self.push(thermostat_id, changes)
+            )
+            self._pushes.add(task)
+            task.add_done_callback(self._pushes.discard)
+
+    def webhook_url(self, thermostat_id: str) -> str | None:
+        """Return the webhook of the account owning a thermostat."""
+        for account, ids in self.accounts.items():
+            if thermostat_id in ids:
+                return self.webhooks.get(account)
+        return None
+
+    async def push(self, thermostat_id: str, changes: dict[str, Any]) -> bool:
+        """Apply changes to a thermostat and send them to its webhook."""
+        thermostat = self.thermostats[thermostat_id]
+        changes = copy.deepcopy(changes)
+        if "ot" in changes:
+            thermostat["ot"]["raw"].update(changes["ot"]["raw"])
+        thermostat.update({key: val for key, val in changes.items() if key != "ot"})
+
+        if not (url := self.webhook_url(thermostat_id)):
+            return False
+        if self._session is None:
+            self._session = ClientSession()
+        try:
+            async with self._session.post(
+                url, json={"thermostat": thermostat_id, **changes}
+            ) as response:
+                return response.status < 400
+        except ClientError as err:
+            _LOGGER.warning("Could not push to %s: %s", url, err)
+            return False
+
+    def random_changes(self) -> dict[str, Any]:
+        """Return a random change in room temperature and boiler state."""
+        modulation = random.choice([0, 0, 20, 50, 80])
+        return {
+            "room_temperature": round(random.uniform(18, 22), 1),
+            "ot": {
+                "raw": {
+                    "ot0": "0x0001" if modulation else "0x0000",
+                    "ot17": _f88(modulation),
+                    "ot18": _f88(round(random.uniform(1.2, 1.8), 1)),
+                }
+            },
+        }
+
+    async def push_forever(self, interval: float) -> None:
+        """Push random changes of all thermostats every interval."""
+        while True:
+            await asyncio.sleep(interval)
+            for thermostat_id in self.thermostats:
+                if self.webhook_url(thermostat_id):
+                    await self.push(thermostat_id, self.random_changes())
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    cloud = FakeThermosmartCloud(
+        accounts=args.accounts,
+        thermostats=args.thermostats,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        retry_after=args.retry_after,
+    )
+    url = await cloud.start(args.host, args.port)
+    _LOGGER.info("Fake Thermosmart cloud listening on %s", url)
+    try:
+        if args.push_interval:
+            await cloud.push_forever(args.push_interval)
+        else:
+            await asyncio.Event().wait()
+    finally:
+        await cloud.stop()
+
+
+def main() -> None:
+    """Run the fake cloud from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--accounts", type=int, default=1)
+    parser.add_argument("--thermostats", type=int, default=1, help="per account")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="0-1")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--retry-after", type=float, default=None, help="seconds")
+    parser.add_argument(
+        "--push-interval", type=float, default=0.0, help="seconds, 0 to disable"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(_serve(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""Replay a recorded Thermosmart trace through the integration.
+
+Reads a trace written with the *Record a trace* option (see
+custom_components/thermosmart/trace.py), sets up a coordinator with the
+climate, sensor and binary sensor entities of the traced thermostats in a bare
+Home Assistant core, and feeds the records back: polled data through
+async_set_updated_data and webhook messages through handle_webhook. Reports
+the CPU time of every stage and the number of entity state writes.
+
+- data: applying polled data, including the entity updates
+- webhook: validating and applying a webhook message
+- publish: publishing the data changed by webhook messages to the entities
+
+Like the benchmark, the replay creates its entry with MockConfigEntry and
+needs the test requirements (requirements_test.txt).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections import defaultdict
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from typing import Any
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from homeassistant.bootstrap import async_load_base_functionality  # noqa: E402
+from homeassistant.config_entries import ConfigEntries  # noqa: E402
+from homeassistant.const import EVENT_STATE_CHANGED  # noqa: E402
+from homeassistant.core import HomeAssistant  # noqa: E402
+from homeassistant.helpers import entity_platform  # noqa: E402
+from pytest_homeassistant_custom_component.common import (  # noqa: E402
+    MockConfigEntry,
+)
+
+from custom_components.thermosmart import (  # noqa: E402
+    PLATFORMS,
+    ThermosmartCoordinator,
+    binary_sensor,
+    climate,
+    sensor,
+)
+from custom_components.thermosmart.api import ThermosmartDevice  # noqa: E402
+from custom_components.thermosmart.const import DOMAIN  # noqa: E402
+from custom_components.thermosmart.registry import ThermosmartRegistry  # noqa: E402
+from custom_components.thermosmart.trace import (  # noqa: E402
+    TRACE_DATA,
+    TRACE_WEBHOOK,
+    read_trace,
+)
+from custom_components.thermosmart.webhook import WEBHOOK_COOLDOWN  # noqa: E402
+
+_LOGGER = logging.getLogger(__name__)
+
+PLATFORM_MODULES = {"binary_sensor": binary_sensor, "climate": climate, "sensor": sensor}
+
+
+class TraceRequest:
+    """Stand-in for the web request of a webhook message."""
+
+    def __init__(self, data: Any) -> None:
+        """Initialize the request with its JSON body."""
+        self._body = json.dumps(data)
+        self.content_length = len(self._body)
+
+    async def json(self) -> Any:
+        """Return the JSON body."""
+        return json.loads(self._body)
+
+
+class StageTimer:
+    """CPU time spent in every stage of the update path."""
+
+    def __init__(self) -> None:
+        """Initialize the timer."""
+        self.seconds: dict[str, float] = defaultdict(float)
+        self.calls: dict[str, int] = defaultdict(int)
+
+    def add(self, stage: str, seconds: float) -> None:
+        """Add the CPU time of a call of a stage."""
+        self.seconds[stage] += seconds
+        self.calls[stage] += 1
+
+    def as_dict(self) -> dict[str, dict[str, float]]:
+        """Return the total and mean CPU time of every stage."""
+        return {
+            stage: {
+                "calls": self.calls[stage],
+                "cpu_ms": round(seconds * 1000, 2),
+                "mean_us": round(seconds / self.calls[stage] * 1e6, 1),
+            }
+            for stage, seconds in self.seconds.items()
+        }
+
+
+class Replay:
+    """Sets up the entities and replays the records of a trace."""
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        """Initialize the replay."""
+        self.args = args
+        self.records = read_trace(args.trace)
+        self.timer = StageTimer()
+        self.state_changes = 0
+
+    async def run(self) -> dict[str, Any]:
+        """Replay the trace and return the results."""
+        snapshot = next(
+            (record["d"] for record in self.records if record["k"] == TRACE_DATA),
+            None,
+        )
+        if not snapshot:
+            raise SystemExit("The trace holds no thermostat data")
+
+        hass = HomeAssistant(tempfile.mkdtemp())
+        hass.config_entries = ConfigEntries(hass, {})
+        await async_load_base_functionality(hass)
+        coordinator = ThermosmartCoordinator(
+            hass, [ThermosmartDevice(None, device_id) for device_id in snapshot]
+        )
+        try:
+            await self._async_setup(hass, coordinator, snapshot)
+            start = time.perf_counter()
+            await self._async_replay(coordinator)
+            duration = time.perf_counter() - start
+        finally:
+            await coordinator.async_shutdown()
+            await hass.async_stop(force=True)
+
+        return {
+            "records": len(self.records),
+            "thermostats": len(snapshot),
+            "entities": len(hass.states.async_all()),
+            "wall_s": round(duration, 3),
+            "entity_writes": coordinator.metrics.entity_writes,
+            "state_changes": self.state_changes,
+            "stages": self.timer.as_dict(),
+        }
+
+    async def _async_setup(
+        self,
+        hass: HomeAssistant,
+        coordinator: ThermosmartCoordinator,
+        snapshot: dict[str, dict[str, Any]],
+    ) -> None:
+        """Start from the first data of the trace and add the entities."""
+        entry = MockConfigEntry(
+            domain=DOMAIN,
+            title="Replay",
+            data={"name": "Replay"},
+            unique_id=next(iter(snapshot)),
+        )
+        coordinator.config_entry = entry
+        registry = hass.data[DOMAIN] = ThermosmartRegistry()
+        registry.async_add(entry.unique_id, entry.entry_id, coordinator)
+        self._apply(coordinator, snapshot)
+
+        # The entry is not added to Home Assistant, so the entities are added
+        # to platforms without it (and without devices)
+        for domain in PLATFORMS:
+            module = PLATFORM_MODULES[domain]
+            platform = entity_platform.EntityPlatform(
+                hass=hass,
+                logger=_LOGGER,
+                domain=domain,
+                platform_name=DOMAIN,
+                platform=module,
+                scan_interval=sensor.SCAN_INTERVAL,
+                entity_namespace=None,
+            )
+            entity_platform.current_platform.set(platform)
+            await module.async_setup_entry(
+                hass,
+                entry,
+                platform._async_schedule_add_entities,  # pylint: disable=protected-access
+            )
+        await hass.async_block_till_done()
+
+        def count(_event: Any) -> None:
+            self.state_changes += 1
+
+        hass.bus.async_listen(EVENT_STATE_CHANGED, count)
+        # Time the debounced publishing of webhook data, faster with the speed
+        publish = coordinator._async_publish_webhook_data  # pylint: disable=protected-access
+
+        def timed_publish() -> None:
+            start = time.process_time()
+            publish()
+            self.timer.add("publish", time.process_time() - start)
+
+        debouncer = coordinator._webhook_debouncer  # pylint: disable=protected-access
+        debouncer.function = timed_publish
+        debouncer.cooldown = WEBHOOK_COOLDOWN / self.args.speed if self.args.speed else 0
+
+    async def _async_replay(self, coordinator: ThermosmartCoordinator) -> None:
+        """Feed the records at their recorded pace divided by the speed."""
+        previous = None
+        for record in self.records:
+            if self.args.speed and previous is not None:
+                await asyncio.sleep(max(record["t"] - previous, 0) / self.args.speed)
+            previous = record["t"]
+
+            start = time.process_time()
+            if record["k"] == TRACE_DATA:
+                self._apply(coordinator, record["d"])
+                self.timer.add("data", time.process_time() - start)
+            elif record["k"] == TRACE_WEBHOOK:
+                await coordinator.handle_webhook(
+                    coordinator.hass, "replay", TraceRequest(record["d"])
+                )
+                self.timer.add("webhook", time.process_time() - start)
+            if not self.args.speed:
+                # Let the (zero) cooldown pass so every message is published
+                await asyncio.sleep(0)
+                await coordinator.hass.async_block_till_done()
+        # Wait for the last publish
+        await asyncio.sleep(WEBHOOK_COOLDOWN / self.args.speed if self.args.speed else 0)
+        await coordinator.hass.async_block_till_done()
+
+    @staticmethod
+    def _apply(
+        coordinator: ThermosmartCoordinator, data: dict[str, dict[str, Any]]
+    ) -> None:
+        """Apply polled data like a refresh of the coordinator does."""
+        for device_id, device_data in data.items():
+            if device_id in coordinator.devices:
+                coordinator.devices[device_id].data = device_data
+        coordinator.async_set_updated_data(
+            {
+                device_id: device_data
+                for device_id, device_data in data.items()
+                if device_id in coordinator.devices
+            }
+        )
+
+
+def main() -> None:
+    """Replay a trace from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("trace", help="trace file (thermosmart_trace_*.jsonl.gz)")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=0,
+        help="replay at this multiple of real time, 0 (default) as fast as possible",
+    )
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = asyncio.run(Replay(args).run())
+
+    if args.json:
+        sys.stdout.write(json.dumps(results, indent=2) + "\n")
+        return
+    for key, value in results.items():
+        if key != "stages":
+            sys.stdout.write(f"{key:<28} {value}\n")
+    for stage, values in results["stages"].items():
+        sys.stdout.write(f"{stage}:\n")
+        for key, value in values.items():
+            sys.stdout.write(f"  {key:<26} {value}\n")
+
+
+if __name__ == "__main__":
+    main()
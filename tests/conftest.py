@@ -0,0 +1,87 @@
+"""Fixtures for the Thermosmart tests."""
+import time
+from typing import Any
+from unittest.mock import MagicMock, patch
+
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.thermosmart.const import DOMAIN
+
+pytest_plugins = "pytest_homeassistant_custom_component"
+
+API_URL = "https://api.thermosmart.com"
+THERMOSTAT_ID = "abc"
+
+
+def thermostat_data(**changes: Any) -> dict[str, Any]:
+    """Return the data of a thermostat with OpenTherm, as sent by the API."""
+    return {
+        "hw": THERMOSTAT_ID,
+        "name": "Living room",
+        "room_temperature": 20.5,
+        "target_temperature": 21,
+        "source": "schedule",
+        "programs": {
+            "anti_freeze": 5,
+            "not_home": 15,
+            "home": 19,
+            "comfort": 21,
+            "pause": 5,
+        },
+        "schedule": [],
+        "exceptions": [],
+        "ot": {
+            "enabled": True,
+            "raw": {
+                "ot0": "0x0000",
+                "ot1": "0x2800",
+                "ot3": "0x0100",
+                "ot17": "0x3200",
+                "ot18": "0x0180",
+                "ot19": "0x0000",
+                "ot26": "0x2800",
+                "ot28": "0x1e00",
+            },
+        },
+        **changes,
+    }
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations):
+    """Load the integration from custom_components."""
+    yield
+
+
+@pytest.fixture
+def config_entry(hass) -> MockConfigEntry:
+    """Return a config entry of the thermostat."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        unique_id=THERMOSTAT_ID,
+        data={
+            "auth_implementation": DOMAIN,
+            "token": {
+                "access_token": "access",
+                "refresh_token": "refresh",
+                "token_type": "Bearer",
+                "expires_at": time.time() + 3600,
+            },
+            "id": THERMOSTAT_ID,
+            "name": "Thermosmart",
+        },
+    )
+    entry.add_to_hass(hass)
+    return entry
+
+
+@pytest.fixture
+def oauth_implementation():
+    """Patch the OAuth implementation of the config entries."""
+    implementation = MagicMock(domain=DOMAIN)
+    with patch(
+        "custom_components.thermosmart.async_get_config_entry_implementation",
+        return_value=implementation,
+    ):
+        yield implementation
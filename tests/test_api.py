@@ -0,0 +1,125 @@
+"""Tests for the Thermosmart API client."""
+import asyncio
+
+import pytest
+
+from custom_components.thermosmart.api import (
+    CircuitBreaker,
+    CommandQueue,
+    ThermosmartApi,
+    ThermosmartApiError,
+)
+
+PATH = "/thermostat/abc"
+
+
+class HangingSession:
+    """Session whose requests never complete."""
+
+    async def request(self, *args, **kwargs):
+        """Wait forever."""
+        await asyncio.Event().wait()
+
+
+async def test_cancelled_probe_releases_breaker() -> None:
+    """Test a cancelled probe does not keep the breaker open."""
+    breaker = CircuitBreaker(threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.is_open
+
+    api = ThermosmartApi(HangingSession(), {"access_token": "token"}, breaker=breaker)
+    probe = asyncio.create_task(api.get("/thermostat"))
+    await asyncio.sleep(0)
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+
+    # The next call is let through as a new probe
+    breaker.before_call()
+
+
+class FakeApi:
+    """API recording the commands sent, optionally failing them."""
+
+    def __init__(self, error: Exception | None = None) -> None:
+        """Initialize the API."""
+        self.requests: list[tuple[str, str, dict]] = []
+        self.error = error
+
+    async def put(self, path: str, data: dict) -> None:
+        """Record a PUT request."""
+        self.requests.append(("put", path, data))
+        if self.error:
+            raise self.error
+
+    async def post(self, path: str, data: dict) -> None:
+        """Record a POST request."""
+        self.requests.append(("post", path, data))
+        if self.error:
+            raise self.error
+
+
+async def test_commands_within_window_coalesced() -> None:
+    """Test writes within the delay are sent as one request per endpoint."""
+    api = FakeApi()
+    queue = CommandQueue(api, PATH, 0.01)
+
+    await asyncio.gather(
+        queue.put({"target_temperature": 20}),
+        queue.put({"target_temperature": 21, "source": "remote"}),
+    )
+
+    assert api.requests == [
+        ("put", PATH, {"target_temperature": 21, "source": "remote"})
+    ]
+
+
+async def test_commands_sent_in_order_of_last_change() -> None:
+    """Test the batch sends the endpoint changed last, last."""
+    api = FakeApi()
+    queue = CommandQueue(api, PATH, 0.01)
+
+    await asyncio.gather(
+        queue.put({"target_temperature": 20}),
+        queue.pause(True),
+        queue.put({"source": "remote"}),
+        queue.pause(False),
+    )
+
+    assert api.requests == [
+        ("put", PATH, {"target_temperature": 20, "source": "remote"}),
+        ("post", PATH + "/pause", {"pause": False}),
+    ]
+
+    # A write after the batch is sent starts a new one
+    await queue.put({"target_temperature": 22})
+    assert api.requests[-1] == ("put", PATH, {"target_temperature": 22})
+
+
+async def test_command_error_reaches_all_callers() -> None:
+    """Test a failed batch raises the error for every coalesced caller."""
+    api = FakeApi(ThermosmartApiError("Failed"))
+    queue = CommandQueue(api, PATH, 0.01)
+
+    results = await asyncio.gather(
+        queue.put({"target_temperature": 20}),
+        queue.pause(True),
+        return_exceptions=True,
+    )
+
+    assert [str(result) for result in results] == ["Failed", "Failed"]
+    assert len(api.requests) == 1
+
+
+async def test_closed_queue_fails_callers() -> None:
+    """Test closing the queue fails the callers of the pending batch."""
+    api = FakeApi()
+    queue = CommandQueue(api, PATH, 10)
+
+    write = asyncio.create_task(queue.put({"target_temperature": 20}))
+    await asyncio.sleep(0)
+    queue.close()
+
+    with pytest.raises(ThermosmartApiError):
+        await write
+    assert api.requests == []
@@ -0,0 +1,88 @@
+"""Tests for the Thermosmart coordinator."""
+import asyncio
+import copy
+
+from custom_components.thermosmart.api import ThermosmartApiError
+from custom_components.thermosmart.const import CONF_OPTIMISTIC, DOMAIN
+
+from .conftest import API_URL, THERMOSTAT_ID, thermostat_data
+
+
+async def _async_setup(hass, config_entry, aioclient_mock, **options):
+    """Set up the entry and return its coordinator."""
+    hass.config_entries.async_update_entry(config_entry, options=options)
+    aioclient_mock.get(f"{API_URL}/thermostat", json=thermostat_data())
+    aioclient_mock.get(f"{API_URL}/thermostat/{THERMOSTAT_ID}", json=thermostat_data())
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    return hass.data[DOMAIN].entries[config_entry.entry_id]
+
+
+async def test_optimistic_write_kept_until_latest_command_finishes(
+    hass, config_entry, oauth_implementation, aioclient_mock
+) -> None:
+    """Test an older command does not drop the equal value of a newer one."""
+    coordinator = await _async_setup(
+        hass, config_entry, aioclient_mock, **{CONF_OPTIMISTIC: True}
+    )
+    first = hass.loop.create_future()
+    second = hass.loop.create_future()
+
+    async def command(future: asyncio.Future) -> None:
+        await future
+
+    await coordinator.async_write(
+        THERMOSTAT_ID, {"source": "pause"}, lambda: command(first)
+    )
+    await coordinator.async_write(
+        THERMOSTAT_ID, {"source": "pause"}, lambda: command(second)
+    )
+    assert coordinator.data[THERMOSTAT_ID]["source"] == "pause"
+
+    # The cloud does not show the second command yet
+    first.set_result(None)
+    await hass.async_block_till_done()
+    await coordinator.async_refresh()
+    assert coordinator.data[THERMOSTAT_ID]["source"] == "pause"
+
+    second.set_exception(ThermosmartApiError("Failed"))
+    await hass.async_block_till_done()
+    assert coordinator.data[THERMOSTAT_ID]["source"] == "schedule"
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+
+
+async def test_listeners_updated_when_their_data_changes(
+    hass, config_entry, oauth_implementation, aioclient_mock
+) -> None:
+    """Test listeners with a context are only updated when their paths change."""
+    coordinator = await _async_setup(hass, config_entry, aioclient_mock)
+    room, target, always = [], [], []
+    unsubs = [
+        coordinator.async_add_listener(
+            lambda: room.append(coordinator.data[THERMOSTAT_ID]["room_temperature"]),
+            frozenset({(THERMOSTAT_ID, "room_temperature")}),
+        ),
+        coordinator.async_add_listener(
+            lambda: target.append(True),
+            frozenset({(THERMOSTAT_ID, "target_temperature")}),
+        ),
+        coordinator.async_add_listener(lambda: always.append(True)),
+    ]
+
+    data = copy.deepcopy(coordinator.data)
+    data[THERMOSTAT_ID]["room_temperature"] = 19
+    coordinator.async_set_updated_data(data)
+    assert room == [19]
+    assert target == []
+    assert always == [True]
+
+    # Unchanged data only updates the listener without a context
+    coordinator.async_set_updated_data(copy.deepcopy(data))
+    assert room == [19]
+    assert target == []
+    assert always == [True, True]
+
+    for unsub in unsubs:
+        unsub()
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
@@ -0,0 +1,80 @@
+"""Tests for the burner counters derived from the OpenTherm values."""
+from math import exp
+
+import pytest
+
+from custom_components.thermosmart.derived import (
+    DUTY_CYCLE_WINDOW,
+    MAX_SAMPLE_GAP,
+    BurnerCounters,
+)
+
+POWER = 24.0
+
+
+@pytest.mark.parametrize(
+    ("samples", "runtime", "energy"),
+    [
+        # The burner modulating at 50% for an hour
+        ([(0, 50, True), (3600, 0, True)], 3600, 12.0),
+        # A sample holds until the next one
+        ([(0, 25, True), (1800, 100, True), (2700, 0, True)], 2700, 9.0),
+        # Hot water also runs the burner
+        ([(0, 100, False), (900, 0, False)], 900, 6.0),
+        # An idle burner counts nothing
+        ([(0, 0, True), (3600, 0, True)], 0, 0.0),
+        # Unknown modulation is not accounted
+        ([(0, 50, True), (600, None, True), (1200, 50, True), (1800, 0, True)], 1200, 4.0),
+        # Neither are long gaps without data
+        ([(0, 50, True), (MAX_SAMPLE_GAP + 1, 0, True)], 0, 0.0),
+        ([(0, 50, True), (MAX_SAMPLE_GAP, 0, True)], MAX_SAMPLE_GAP, 24.0),
+        # Repeated samples count once
+        ([(0, 50, True), (0, 50, True), (600, 0, True), (600, 0, True)], 600, 2.0),
+    ],
+)
+def test_runtime_and_energy(
+    samples: list[tuple[float, float | None, bool]], runtime: float, energy: float
+) -> None:
+    """Test the burner runtime and energy."""
+    counters = BurnerCounters()
+    for timestamp, modulation, ch_enabled in samples:
+        counters.add(timestamp, modulation, ch_enabled, POWER)
+
+    assert counters.runtime == runtime
+    assert counters.energy == pytest.approx(energy)
+
+
+def test_duty_cycle() -> None:
+    """Test the duty cycle is a moving average of the time spent heating."""
+    counters = BurnerCounters()
+    counters.add(0, 100, True, POWER)
+    counters.add(DUTY_CYCLE_WINDOW, 100, True, POWER)
+    # One time constant of heating from 0
+    assert counters.duty_cycle == pytest.approx(1 - exp(-1))
+
+    # Heating for hot water does not count
+    counters.add(DUTY_CYCLE_WINDOW, 100, False, POWER)
+    counters.add(2 * DUTY_CYCLE_WINDOW, 0, False, POWER)
+    assert counters.duty_cycle == pytest.approx((1 - exp(-1)) * exp(-1))
+
+    # The average converges to the fraction of time heating
+    for minute in range(2 * 60, 30 * 60):
+        counters.add(minute * 60, 100 if minute % 4 == 0 else 0, True, POWER)
+    assert counters.duty_cycle == pytest.approx(0.25, abs=0.02)
+
+
+def test_changed() -> None:
+    """Test a sample reports if it changed the counters."""
+    counters = BurnerCounters(runtime=60, energy=1.0, duty_cycle=0.5)
+
+    assert not counters.add(0, 50, True, POWER)
+    assert counters.add(600, 0, True, POWER)
+    assert counters.as_dict() == {
+        "runtime": 660,
+        "energy": pytest.approx(1.0 + POWER * 0.5 * 600 / 3600),
+        "duty_cycle": pytest.approx(1 - 0.5 * exp(-600 / DUTY_CYCLE_WINDOW)),
+    }
+    # A duty cycle of 0 stays 0 while the burner is off
+    counters = BurnerCounters()
+    counters.add(0, 0, True, POWER)
+    assert not counters.add(600, 0, True, POWER)
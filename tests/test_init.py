@@ -0,0 +1,50 @@
+"""Tests for setting up and unloading Thermosmart entries."""
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.config_entries import ConfigEntryState
+
+from custom_components.thermosmart.const import DOMAIN
+
+from .conftest import API_URL, THERMOSTAT_ID, thermostat_data
+
+
+async def test_entries_of_account_share_coordinator(
+    hass, config_entry, oauth_implementation, aioclient_mock
+) -> None:
+    """Test the coordinator of an account lives until its last entry unloads."""
+    aioclient_mock.get(f"{API_URL}/thermostat", json=thermostat_data())
+    aioclient_mock.get(f"{API_URL}/thermostat/{THERMOSTAT_ID}", json=thermostat_data())
+    other = MockConfigEntry(
+        domain=DOMAIN,
+        unique_id=THERMOSTAT_ID,
+        data={**config_entry.data, "name": "Other"},
+    )
+    other.add_to_hass(hass)
+
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    registry = hass.data[DOMAIN]
+    coordinator = registry.entries[config_entry.entry_id]
+    assert registry.entries[other.entry_id] is coordinator
+    # One thermostat list and one thermostat request for both entries
+    assert aioclient_mock.call_count == 2
+    assert len(hass.states.async_entity_ids("climate")) == 1
+
+    # The other entry takes over, without being reloaded
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+    await hass.async_block_till_done()
+    assert other.state is ConfigEntryState.LOADED
+    assert registry.entries == {other.entry_id: coordinator}
+    assert registry.async_is_owner(other.entry_id)
+    assert coordinator.config_entry is other
+    assert aioclient_mock.call_count == 2
+
+    # A new entry of the account shares the coordinator again
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    assert registry.entries[config_entry.entry_id] is coordinator
+    assert not registry.async_is_owner(config_entry.entry_id)
+
+    assert await hass.config_entries.async_unload(other.entry_id)
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+    assert registry.entries == {}
+    assert registry.async_get(THERMOSTAT_ID) is None
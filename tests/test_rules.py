@@ -0,0 +1,180 @@
+"""Tests for the boiler alerts."""
+from datetime import timedelta
+from typing import Any
+from unittest.mock import patch
+
+from pytest_homeassistant_custom_component.common import (
+    async_capture_events,
+    async_fire_time_changed,
+)
+import pytest
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from custom_components.thermosmart.model import ThermostatSnapshot
+from custom_components.thermosmart.rules import (
+    EVENT_ALERT,
+    TRACKING_DELAY,
+    Rule,
+    RuleEngine,
+    compile_rules,
+)
+
+from .conftest import THERMOSTAT_ID
+
+
+class FakeCoordinator:
+    """Coordinator holding the snapshot of one thermostat."""
+
+    def __init__(self) -> None:
+        """Initialize the coordinator."""
+        self.last_update_success = True
+        self.snapshots: dict[str, ThermostatSnapshot] = {}
+        self._listeners: list = []
+
+    def async_add_listener(self, update_callback):
+        """Listen for updates."""
+        self._listeners.append(update_callback)
+        return lambda: self._listeners.remove(update_callback)
+
+    def update(self, **data: Any) -> None:
+        """Publish new data of the thermostat."""
+        self.snapshots = {THERMOSTAT_ID: ThermostatSnapshot.from_data(data)}
+        for update_callback in list(self._listeners):
+            update_callback()
+
+
+def _opentherm(pressure: float, status: str = "0x0000") -> dict[str, Any]:
+    """Return OpenTherm data with a water pressure and slave status."""
+    return {"enabled": True, "raw": {"ot0": status}, "readable": {"Water pressure": pressure}}
+
+
+@pytest.mark.parametrize(
+    ("rule", "values"),
+    [
+        # Below a limit, cleared above limit + hysteresis
+        (
+            Rule("low", float, below=1.0, hysteresis=0.2),
+            [(1.1, False), (0.9, True), (1.1, True), (1.19, True), (1.2, False), (1.1, False)],
+        ),
+        # Above a limit, cleared below limit - hysteresis
+        (
+            Rule("high", float, above=2.0, hysteresis=0.5),
+            [(2.0, False), (2.1, True), (1.6, True), (1.5, False), (1.9, False)],
+        ),
+        # Flags
+        (Rule("flag", bool, above=0), [(False, False), (True, True), (False, False)]),
+    ],
+)
+def test_rule_hysteresis(rule: Rule, values: list[tuple[float, bool]]) -> None:
+    """Test a rule clears only once the value is back past the hysteresis."""
+    active = False
+    for value, expected in values:
+        active = rule.crossed(value, active)
+        assert active == expected, value
+
+
+async def test_alert_events(hass: HomeAssistant) -> None:
+    """Test every change after the first known state fires an event."""
+    events = async_capture_events(hass, EVENT_ALERT)
+    coordinator = FakeCoordinator()
+    engine = RuleEngine(hass, coordinator, compile_rules({}))
+    stop = engine.async_start()
+
+    coordinator.update(ot=_opentherm(1.5))
+    assert engine.states[(THERMOSTAT_ID, "low_water_pressure")] is False
+    coordinator.update(ot=_opentherm(0.8))
+    coordinator.update(ot=_opentherm(1.1))
+    coordinator.update(ot=_opentherm(1.3))
+    coordinator.update(ot=_opentherm(1.3, status="0x0001"))
+    # Unknown values keep the state
+    coordinator.last_update_success = False
+    coordinator.update(ot=_opentherm(0.5))
+    coordinator.last_update_success = True
+    coordinator.update()
+    await hass.async_block_till_done()
+
+    assert [event.data for event in events] == [
+        {
+            "device_id": THERMOSTAT_ID,
+            "rule": "low_water_pressure",
+            "active": True,
+            "value": 0.8,
+        },
+        {
+            "device_id": THERMOSTAT_ID,
+            "rule": "low_water_pressure",
+            "active": False,
+            "value": 1.3,
+        },
+        {
+            "device_id": THERMOSTAT_ID,
+            "rule": "boiler_fault",
+            "active": True,
+            "value": True,
+        },
+    ]
+    assert engine.states[(THERMOSTAT_ID, "low_water_pressure")] is False
+    assert engine.states[(THERMOSTAT_ID, "boiler_fault")] is True
+    stop()
+
+
+async def test_delay(hass: HomeAssistant) -> None:
+    """Test a delayed rule activates when its delay ends, without an update."""
+    events = async_capture_events(hass, EVENT_ALERT)
+    coordinator = FakeCoordinator()
+    engine = RuleEngine(hass, coordinator, compile_rules({}))
+    clock = [0.0]
+    key = (THERMOSTAT_ID, "setpoint_tracking")
+
+    def advance(seconds: float) -> None:
+        clock[0] += seconds
+        async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=clock[0]))
+
+    with patch(
+        "custom_components.thermosmart.rules.monotonic", side_effect=lambda: clock[0]
+    ):
+        stop = engine.async_start()
+        coordinator.update(room_temperature=20, target_temperature=20.5)
+        assert engine.states[key] is False
+
+        # Recovering within the delay is no alert
+        coordinator.update(room_temperature=18, target_temperature=21)
+        advance(TRACKING_DELAY / 2)
+        coordinator.update(room_temperature=20.2, target_temperature=21)
+        advance(TRACKING_DELAY)
+        await hass.async_block_till_done()
+        assert engine.states[key] is False
+        assert not events
+
+        # The delay restarts with the next crossing
+        coordinator.update(room_temperature=18, target_temperature=21)
+        advance(TRACKING_DELAY - 1)
+        await hass.async_block_till_done()
+        assert engine.states[key] is False
+        advance(1)
+        await hass.async_block_till_done()
+        assert engine.states[key] is True
+        assert [event.data for event in events] == [
+            {
+                "device_id": THERMOSTAT_ID,
+                "rule": "setpoint_tracking",
+                "active": True,
+                "value": 3,
+            }
+        ]
+
+        # Clearing is not delayed, within the hysteresis it stays active
+        coordinator.update(room_temperature=19.2, target_temperature=21)
+        assert engine.states[key] is True
+        coordinator.update(room_temperature=19.6, target_temperature=21)
+        assert engine.states[key] is False
+        assert len(events) == 2
+
+        # No check after stopping
+        coordinator.update(room_temperature=18, target_temperature=21)
+        stop()
+        advance(TRACKING_DELAY)
+        await hass.async_block_till_done()
+        assert engine.states[key] is False
@@ -0,0 +1,319 @@
+"""Tests for the Thermosmart schedule model."""
+from datetime import datetime, time
+
+import pytest
+
+from custom_components.thermosmart.schedule import (
+    ExceptionIndex,
+    ScheduleException,
+    WeekSchedule,
+)
+
+NOW = datetime(2024, 1, 15, 9, 0)
+
+
+def exception(start: int, end: int, program: str) -> ScheduleException:
+    """Return an exception between two hours of the day of NOW."""
+    return ScheduleException(NOW.replace(hour=start), NOW.replace(hour=end), program)
+
+
+def as_api(*entries: ScheduleException) -> list[dict]:
+    """Return exceptions in the API format."""
+    return [entry.as_api() for entry in entries]
+
+
+@pytest.mark.parametrize(
+    ("existing", "added", "expected"),
+    [
+        # Overlapping exceptions with the same program are merged
+        (
+            [exception(10, 12, "home")],
+            [exception(11, 14, "home")],
+            [exception(10, 14, "home")],
+        ),
+        # Adjacent exceptions with the same program are merged
+        (
+            [exception(10, 12, "home")],
+            [exception(12, 13, "home")],
+            [exception(10, 13, "home")],
+        ),
+        # An exception within another one of the same program merges into it
+        (
+            [exception(10, 14, "home")],
+            [exception(11, 12, "home")],
+            None,
+        ),
+        # Another program splits an exception it overlaps
+        (
+            [exception(10, 14, "home")],
+            [exception(11, 12, "comfort")],
+            [
+                exception(10, 11, "home"),
+                exception(11, 12, "comfort"),
+                exception(12, 14, "home"),
+            ],
+        ),
+        # Another program overrides the overlapping part
+        (
+            [exception(10, 12, "home"), exception(13, 15, "pause")],
+            [exception(11, 14, "comfort")],
+            [
+                exception(10, 11, "home"),
+                exception(11, 14, "comfort"),
+                exception(14, 15, "pause"),
+            ],
+        ),
+        # Another program replaces the exceptions it covers
+        (
+            [exception(11, 12, "home"), exception(12, 13, "pause")],
+            [exception(10, 14, "comfort")],
+            [exception(10, 14, "comfort")],
+        ),
+        # Later exceptions override earlier ones
+        (
+            [],
+            [exception(10, 14, "home"), exception(12, 16, "comfort")],
+            [exception(10, 12, "home"), exception(12, 16, "comfort")],
+        ),
+        # Expired exceptions are dropped
+        (
+            [exception(7, 8, "home"), exception(10, 11, "home")],
+            [exception(12, 13, "comfort")],
+            [exception(10, 11, "home"), exception(12, 13, "comfort")],
+        ),
+        # Adding expired exceptions changes nothing
+        (
+            [exception(10, 11, "home")],
+            [exception(6, 9, "comfort")],
+            None,
+        ),
+        # Dropping expired exceptions alone is no change to upload
+        (
+            [exception(7, 8, "home"), exception(10, 11, "home")],
+            [],
+            None,
+        ),
+        # Adding an existing exception is no change
+        (
+            [exception(10, 11, "home"), exception(12, 13, "comfort")],
+            [exception(12, 13, "comfort")],
+            None,
+        ),
+    ],
+)
+def test_add(
+    existing: list[ScheduleException],
+    added: list[ScheduleException],
+    expected: list[ScheduleException] | None,
+) -> None:
+    """Test adding exceptions."""
+    index = ExceptionIndex()
+    index.sync(as_api(*existing))
+    before = index.entries
+
+    result = index.add(added, NOW)
+
+    if expected is None:
+        assert result is None
+        assert index.entries == before
+    else:
+        assert result == as_api(*expected)
+        assert index.entries == expected
+
+
+@pytest.mark.parametrize(
+    ("existing", "replacement", "expected"),
+    [
+        (
+            [exception(10, 11, "home")],
+            [exception(12, 13, "comfort")],
+            [exception(12, 13, "comfort")],
+        ),
+        ([exception(10, 11, "home")], [], []),
+        # Only expired exceptions remain
+        ([exception(7, 8, "home"), exception(10, 11, "home")], [], []),
+        ([exception(10, 11, "home")], [exception(10, 11, "home")], None),
+        ([exception(7, 8, "home")], [], None),
+        ([], [], None),
+    ],
+)
+def test_replace(
+    existing: list[ScheduleException],
+    replacement: list[ScheduleException],
+    expected: list[ScheduleException] | None,
+) -> None:
+    """Test replacing all exceptions."""
+    index = ExceptionIndex()
+    index.sync(as_api(*existing))
+
+    result = index.replace(replacement, NOW)
+
+    if expected is None:
+        assert result is None
+    else:
+        assert result == as_api(*expected)
+        assert index.entries == expected
+
+
+def test_sync() -> None:
+    """Test the index follows the exceptions of the thermostat."""
+    index = ExceptionIndex()
+    exceptions = as_api(
+        exception(12, 14, "comfort"),
+        exception(10, 13, "home"),
+        exception(11, 12, "home"),
+    ) + [{"start": [2024], "end": [2024], "temperature": "home"}, {}]
+
+    # Sorted, with invalid exceptions ignored and overlaps resolved
+    index.sync(exceptions)
+    assert index.entries == [exception(10, 12, "home"), exception(12, 14, "comfort")]
+
+    # The list it produced is not rebuilt
+    result = index.add([exception(15, 16, "pause")], NOW)
+    index.sync(result)
+    assert index.entries[-1] == exception(15, 16, "pause")
+
+    # Local changes are kept until the data holds another list
+    index.add([exception(17, 18, "pause")], NOW)
+    index.keep(result)
+    index.sync(result)
+    assert index.entries[-1] == exception(17, 18, "pause")
+
+    index.sync(as_api(exception(10, 11, "home")))
+    assert index.entries == [exception(10, 11, "home")]
+
+    index.sync(None)
+    assert index.entries == []
+
+
+def block(day: int, hour: int, minute: int, program: str) -> dict:
+    """Return a block of the week schedule in the API format."""
+    return {"start": [day, hour, minute], "temperature": program}
+
+
+WEEK = [
+    block(0, 0, 0, "not_home"),
+    block(0, 7, 0, "home"),
+    block(0, 23, 0, "not_home"),
+    block(1, 7, 0, "home"),
+    block(1, 23, 0, "not_home"),
+    block(5, 9, 30, "comfort"),
+    block(6, 22, 45, "not_home"),
+]
+
+
+@pytest.mark.parametrize(
+    ("blocks", "expected"),
+    [
+        (WEEK, WEEK),
+        ([], []),
+        # Unsorted, with blocks that change nothing and invalid blocks
+        (
+            [
+                block(1, 7, 0, "home"),
+                block(0, 7, 0, "home"),
+                block(0, 23, 0, "not_home"),
+                block(1, 0, 0, "not_home"),
+                {"start": [1, 8], "temperature": "comfort"},
+                {"temperature": "comfort"},
+            ],
+            # The last program of the week continues on monday
+            [
+                block(0, 0, 0, "home"),
+                block(0, 23, 0, "not_home"),
+                block(1, 7, 0, "home"),
+            ],
+        ),
+        # A single program all week
+        ([block(3, 12, 0, "home")], [block(0, 0, 0, "home")]),
+    ],
+)
+def test_week_schedule_api(blocks: list[dict], expected: list[dict]) -> None:
+    """Test converting the week schedule from and to the API format."""
+    schedule = WeekSchedule.from_api(blocks)
+    assert schedule.as_api() == expected
+    assert WeekSchedule.from_api(schedule.as_api()) == schedule
+
+
+def test_week_schedule_days() -> None:
+    """Test the program changes per day start at midnight."""
+    days = WeekSchedule.from_api(WEEK).as_days()
+
+    assert days["monday"] == [
+        {"start": "00:00", "program": "not_home"},
+        {"start": "07:00", "program": "home"},
+        {"start": "23:00", "program": "not_home"},
+    ]
+    assert days["wednesday"] == [{"start": "00:00", "program": "not_home"}]
+    assert days["saturday"] == [
+        {"start": "00:00", "program": "not_home"},
+        {"start": "09:30", "program": "comfort"},
+    ]
+    assert days["sunday"] == [
+        {"start": "00:00", "program": "comfort"},
+        {"start": "22:45", "program": "not_home"},
+    ]
+    assert WeekSchedule.from_api([]).as_days() == {
+        name: [] for name in days
+    }
+
+
+def test_week_schedule_with_days() -> None:
+    """Test replacing days recomputes the program carried over midnight."""
+    schedule = WeekSchedule.from_api(WEEK)
+
+    changed = schedule.with_days(
+        {"tuesday": [(time(7, 0), "home"), (time(22, 0), "comfort")]}
+    )
+
+    # Wednesday continues the new program of tuesday, without a block of its own
+    assert changed.as_days()["wednesday"] == [{"start": "00:00", "program": "comfort"}]
+    assert changed.as_api() == [
+        *WEEK[:4],
+        block(1, 22, 0, "comfort"),
+        block(6, 22, 45, "not_home"),
+    ]
+    assert schedule.changed_days(changed) == [
+        "tuesday",
+        "wednesday",
+        "thursday",
+        "friday",
+        "saturday",
+    ]
+
+    # Replacing a day with its own program changes is no change
+    same = schedule.with_days(
+        {"tuesday": [(time(7, 0), "home"), (time(23, 0), "not_home")]}
+    )
+    assert same == schedule
+    assert same.as_api() == WEEK
+    assert schedule.changed_days(same) == []
+
+
+def test_week_schedule_with_days_carry_over() -> None:
+    """Test a replaced day without a change at midnight continues the day before."""
+    schedule = WeekSchedule.from_api(WEEK)
+
+    changed = schedule.with_days({"monday": [(time(8, 0), "home")]})
+
+    # Monday continues sunday, tuesday continues the new monday
+    assert changed.as_days()["monday"] == [
+        {"start": "00:00", "program": "not_home"},
+        {"start": "08:00", "program": "home"},
+    ]
+    assert changed.as_days()["tuesday"][0] == {"start": "00:00", "program": "home"}
+    assert changed.as_api()[:2] == [
+        block(0, 0, 0, "not_home"),
+        block(0, 8, 0, "home"),
+    ]
+    assert schedule.changed_days(changed) == ["monday", "tuesday"]
+
+    # A program all week continues into the replaced day
+    single = WeekSchedule.from_api([block(0, 0, 0, "home")])
+    changed = single.with_days({"monday": [(time(8, 0), "comfort")]})
+    assert changed.as_api() == [
+        block(0, 0, 0, "home"),
+        block(0, 8, 0, "comfort"),
+        block(1, 0, 0, "home"),
+    ]
+    assert single.with_days({}) == single
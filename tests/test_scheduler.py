@@ -0,0 +1,99 @@
+"""Tests for the startup scheduler of the Thermosmart entries."""
+import asyncio
+
+import pytest
+
+from custom_components.thermosmart.scheduler import (
+    PRIORITY_HIGH,
+    PRIORITY_LOW,
+    STARTUP_CONCURRENCY,
+    StartupScheduler,
+)
+
+
+async def _start(
+    scheduler: StartupScheduler, entries: list[tuple[str, int]]
+) -> tuple[list[str], asyncio.Event, list[asyncio.Task]]:
+    """Start entries that hold their slot until released, in order."""
+    started: list[str] = []
+    release = asyncio.Event()
+
+    async def entry(name: str, priority: int) -> None:
+        async with scheduler.slot(priority):
+            started.append(name)
+            await release.wait()
+
+    tasks = []
+    for name, priority in entries:
+        tasks.append(asyncio.create_task(entry(name, priority)))
+        await asyncio.sleep(0)
+    return started, release, tasks
+
+
+@pytest.mark.parametrize(
+    ("limit", "expected"),
+    [(STARTUP_CONCURRENCY, STARTUP_CONCURRENCY), (1, 1), (0, 10)],
+)
+async def test_concurrency_limit(limit: int, expected: int) -> None:
+    """Test at most the limit of entries hold a slot, 0 for no limit."""
+    scheduler = StartupScheduler(limit)
+    started, release, tasks = await _start(
+        scheduler, [(f"entry {number}", PRIORITY_HIGH) for number in range(10)]
+    )
+
+    assert len(started) == expected
+    assert scheduler.active == expected
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert len(started) == 10
+    assert scheduler.active == 0
+    assert scheduler.peak == expected
+
+
+async def test_priority_order() -> None:
+    """Test waiting entries start by priority, then in order of arrival."""
+    scheduler = StartupScheduler(1)
+    started, release, tasks = await _start(
+        scheduler,
+        [
+            ("first", PRIORITY_LOW),
+            ("low 1", PRIORITY_LOW),
+            ("high 1", PRIORITY_HIGH),
+            ("low 2", PRIORITY_LOW),
+            ("high 2", PRIORITY_HIGH),
+        ],
+    )
+    assert started == ["first"]
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert started == ["first", "high 1", "high 2", "low 1", "low 2"]
+    assert scheduler.peak == 1
+
+
+async def test_cancelled_waiter() -> None:
+    """Test a cancelled waiting entry does not keep or skip a slot."""
+    scheduler = StartupScheduler(1)
+    started, release, tasks = await _start(
+        scheduler,
+        [("first", PRIORITY_HIGH), ("cancelled", PRIORITY_HIGH), ("last", PRIORITY_LOW)],
+    )
+    tasks[1].cancel()
+    await asyncio.sleep(0)
+
+    release.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    assert started == ["first", "last"]
+    assert scheduler.active == 0
+
+
+def test_phases() -> None:
+    """Test the phases of the entries are spread between 0 and 1."""
+    scheduler = StartupScheduler()
+    phases = [scheduler.next_phase() for _ in range(20)]
+
+    assert phases[0] == 0
+    assert all(0 <= phase < 1 for phase in phases)
+    # Every tenth of the interval gets a phase
+    assert {int(phase * 10) for phase in phases} == set(range(10))
@@ -0,0 +1,60 @@
+"""Tests for the Thermosmart sensors."""
+import copy
+from datetime import timedelta
+from unittest.mock import patch
+
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.thermosmart.const import CONF_SENSOR_STATES, DOMAIN
+from custom_components.thermosmart.sensor import STATE_WRITE_INTERVAL
+
+from .conftest import API_URL, THERMOSTAT_ID, thermostat_data
+
+WATER_PRESSURE = "sensor.thermosmart_water_pressure"
+
+
+async def test_throttled_measurement_written_after_interval(
+    hass, config_entry, oauth_implementation, aioclient_mock
+) -> None:
+    """Test a measurement skipped within the write interval is written later."""
+    hass.config_entries.async_update_entry(
+        config_entry, options={CONF_SENSOR_STATES: False}
+    )
+    aioclient_mock.get(f"{API_URL}/thermostat", json=thermostat_data())
+    aioclient_mock.get(f"{API_URL}/thermostat/{THERMOSTAT_ID}", json=thermostat_data())
+    now = 1000.0
+
+    def set_pressure(pressure: float) -> None:
+        data = copy.deepcopy(coordinator.data)
+        data[THERMOSTAT_ID]["ot"]["readable"]["Water pressure"] = pressure
+        coordinator.async_set_updated_data(data)
+
+    with patch(
+        "custom_components.thermosmart.sensor.monotonic", side_effect=lambda: now
+    ):
+        assert await hass.config_entries.async_setup(config_entry.entry_id)
+        await hass.async_block_till_done()
+        coordinator = hass.data[DOMAIN].entries[config_entry.entry_id]
+        assert hass.states.get(WATER_PRESSURE).state == "1.5"
+
+        now += STATE_WRITE_INTERVAL + 1
+        set_pressure(1.0)
+        await hass.async_block_till_done()
+        assert hass.states.get(WATER_PRESSURE).state == "1.0"
+
+        # Within the interval, the change is not written yet
+        now += 1
+        set_pressure(1.25)
+        await hass.async_block_till_done()
+        assert hass.states.get(WATER_PRESSURE).state == "1.0"
+
+        now += STATE_WRITE_INTERVAL
+        async_fire_time_changed(
+            hass, dt_util.utcnow() + timedelta(seconds=STATE_WRITE_INTERVAL)
+        )
+        await hass.async_block_till_done()
+        assert hass.states.get(WATER_PRESSURE).state == "1.25"
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
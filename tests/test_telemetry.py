@@ -0,0 +1,160 @@
+"""Tests for the hourly statistics of the boiler values."""
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from custom_components.thermosmart.telemetry import (
+    HOUR,
+    PENDING_HOURS,
+    BoilerStatistics,
+    HourlyChannel,
+    HourStatistics,
+)
+
+# Start of an hour
+START = 1700002800.0
+
+
+@pytest.mark.parametrize(
+    ("samples", "until", "expected"),
+    [
+        # Each value is weighted by how long it held
+        (
+            [(0, 10.0), (900, 20.0)],
+            HOUR,
+            [HourStatistics(START, 17.5, 10.0, 20.0)],
+        ),
+        # A first sample within the hour only covers the rest of it
+        (
+            [(1800, 10.0), (2700, 30.0)],
+            HOUR,
+            [HourStatistics(START, 20.0, 10.0, 30.0)],
+        ),
+        # Unavailable periods do not count
+        (
+            [(0, 10.0), (1200, None), (2400, 40.0)],
+            HOUR,
+            [HourStatistics(START, 25.0, 10.0, 40.0)],
+        ),
+        # A value holds over the following hours
+        (
+            [(0, 10.0), (1800, 20.0)],
+            3 * HOUR,
+            [
+                HourStatistics(START, 15.0, 10.0, 20.0),
+                HourStatistics(START + HOUR, 20.0, 20.0, 20.0),
+                HourStatistics(START + 2 * HOUR, 20.0, 20.0, 20.0),
+            ],
+        ),
+        # Hours without a value are skipped
+        (
+            [(0, 10.0), (1800, None), (2 * HOUR + 1800, 30.0)],
+            3 * HOUR,
+            [
+                HourStatistics(START, 10.0, 10.0, 10.0),
+                HourStatistics(START + 2 * HOUR, 30.0, 30.0, 30.0),
+            ],
+        ),
+        # The current hour is not completed
+        ([(0, 10.0), (900, 20.0)], HOUR - 1, []),
+    ],
+)
+def test_hourly_channel(
+    samples: list[tuple[float, float | None]],
+    until: float,
+    expected: list[HourStatistics],
+) -> None:
+    """Test the hourly statistics of the samples of a value."""
+    channel = HourlyChannel()
+    for offset, value in samples:
+        channel.add(START + offset, value)
+    channel.advance(START + until)
+
+    assert list(channel.completed) == expected
+
+
+def test_hourly_channel_advance() -> None:
+    """Test advancing twice, or before the last sample, changes nothing."""
+    channel = HourlyChannel()
+    channel.advance(START)
+    assert not channel.completed
+
+    channel.add(START, 10.0)
+    channel.add(START + 1800, 20.0)
+    channel.advance(START + 900)
+    channel.advance(START + HOUR)
+    channel.advance(START + HOUR)
+    assert list(channel.completed) == [HourStatistics(START, 15.0, 10.0, 20.0)]
+
+
+def test_hourly_channel_pending_hours() -> None:
+    """Test only the last hours are kept until they are imported."""
+    channel = HourlyChannel()
+    channel.add(START, 10.0)
+    channel.advance(START + (PENDING_HOURS + 2) * HOUR)
+
+    assert len(channel.completed) == PENDING_HOURS
+    assert channel.completed[0].start == START + 2 * HOUR
+
+
+async def test_boiler_statistics_import(hass) -> None:
+    """Test completed hours are imported once, the current hour is kept."""
+    values = {"Water pressure": 1.5, "Modulation level": "unknown"}
+    coordinator = MagicMock(
+        last_update_success=True,
+        snapshots={
+            "abc": SimpleNamespace(ot_value=values.get),
+            "other": SimpleNamespace(ot_value=values.get),
+        },
+    )
+    statistics = BoilerStatistics(
+        hass,
+        coordinator,
+        {"abc": "Living room"},
+        {"Water pressure": "bar", "Modulation level": "%"},
+    )
+
+    with patch(
+        "custom_components.thermosmart.telemetry.time", return_value=START + 600
+    ):
+        statistics._async_sample()
+    values["Water pressure"] = 2.0
+    with patch(
+        "custom_components.thermosmart.telemetry.time", return_value=START + 1800
+    ):
+        statistics._async_sample()
+
+    with patch(
+        "custom_components.thermosmart.telemetry.time",
+        return_value=START + HOUR + 30,
+    ), patch(
+        "homeassistant.components.recorder.statistics.async_add_external_statistics"
+    ) as add_statistics:
+        statistics._async_import()
+        statistics._async_import()
+
+    # Only the numeric value of the named thermostat
+    add_statistics.assert_called_once()
+    _, metadata, hours = add_statistics.call_args[0]
+    assert metadata["statistic_id"] == "thermosmart:abc_water_pressure"
+    assert metadata["name"] == "Living room Water pressure"
+    assert metadata["unit_of_measurement"] == "bar"
+    assert len(hours) == 1
+    assert hours[0]["start"].timestamp() == START
+    assert hours[0]["mean"] == pytest.approx((1.5 * 1200 + 2.0 * 1800) / 3000)
+    assert (hours[0]["min"], hours[0]["max"]) == (1.5, 2.0)
+
+    # The next hour continues the last value
+    with patch(
+        "custom_components.thermosmart.telemetry.time",
+        return_value=START + 2 * HOUR + 30,
+    ), patch(
+        "homeassistant.components.recorder.statistics.async_add_external_statistics"
+    ) as add_statistics:
+        statistics._async_import()
+
+    _, _, hours = add_statistics.call_args[0]
+    assert [(hour["start"].timestamp(), hour["mean"]) for hour in hours] == [
+        (START + HOUR, 2.0)
+    ]
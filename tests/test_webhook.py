@@ -0,0 +1,127 @@
+"""Tests for the Thermosmart webhook messages."""
+import pytest
+
+from custom_components.thermosmart.const import DOMAIN
+from custom_components.thermosmart.webhook import WebhookFilter
+
+from .conftest import API_URL, THERMOSTAT_ID, thermostat_data
+
+
+@pytest.mark.parametrize(
+    ("messages", "accepted"),
+    [
+        # Duplicates without a sequence number
+        (
+            [{"room_temperature": 20}, {"room_temperature": 20}],
+            [True, False],
+        ),
+        # Changes back to an earlier value are new
+        (
+            [
+                {"room_temperature": 20},
+                {"room_temperature": 21},
+                {"room_temperature": 20},
+            ],
+            [True, True, True],
+        ),
+        # Out of order and repeated sequence numbers
+        (
+            [
+                {"seq": 2, "room_temperature": 20},
+                {"seq": 1, "room_temperature": 19},
+                {"seq": 2, "room_temperature": 21},
+                {"seq": 3, "room_temperature": 21},
+            ],
+            [True, False, False, True],
+        ),
+        # Timestamps are sequence numbers too
+        (
+            [
+                {"timestamp": 1700000060, "source": "manual"},
+                {"timestamp": 1700000000, "source": "schedule"},
+            ],
+            [True, False],
+        ),
+        # Messages without a sequence number keep the last one
+        (
+            [
+                {"seq": 5, "room_temperature": 20},
+                {"room_temperature": 21},
+                {"seq": 4, "room_temperature": 22},
+            ],
+            [True, True, False],
+        ),
+    ],
+)
+def test_webhook_filter(messages: list[dict], accepted: list[bool]) -> None:
+    """Test duplicate and out-of-order messages are dropped."""
+    webhook_filter = WebhookFilter()
+    assert [
+        webhook_filter.accept({"thermostat": THERMOSTAT_ID, **message})
+        for message in messages
+    ] == accepted
+
+
+def test_webhook_filter_per_thermostat() -> None:
+    """Test messages of different thermostats are filtered separately."""
+    webhook_filter = WebhookFilter()
+    assert webhook_filter.accept({"thermostat": "a", "seq": 2})
+    assert webhook_filter.accept({"thermostat": "b", "seq": 1})
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        ["not", "a", "message"],
+        {"room_temperature": 19},
+        {"thermostat": THERMOSTAT_ID, "room_temperature": "warm"},
+        {"thermostat": THERMOSTAT_ID, "ot": {"raw": {"ot18": "0xzz"}}},
+        {"thermostat": "unknown", "room_temperature": 19},
+    ],
+)
+async def test_malformed_message_ignored(
+    hass, config_entry, oauth_implementation, aioclient_mock, message
+) -> None:
+    """Test invalid messages and messages of unknown thermostats are ignored."""
+    aioclient_mock.get(f"{API_URL}/thermostat", json=thermostat_data())
+    aioclient_mock.get(f"{API_URL}/thermostat/{THERMOSTAT_ID}", json=thermostat_data())
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    coordinator = hass.data[DOMAIN].entries[config_entry.entry_id]
+
+    assert not coordinator.async_process_webhook(message)
+    assert coordinator.devices[THERMOSTAT_ID].data["room_temperature"] == 20.5
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+
+
+async def test_partly_applied_message_discarded(
+    hass, config_entry, oauth_implementation, aioclient_mock
+) -> None:
+    """Test a message that fails halfway does not change the data."""
+    data = thermostat_data()
+    del data["programs"]
+    aioclient_mock.get(f"{API_URL}/thermostat", json=data)
+    aioclient_mock.get(f"{API_URL}/thermostat/{THERMOSTAT_ID}", json=data)
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    coordinator = hass.data[DOMAIN].entries[config_entry.entry_id]
+
+    # The room temperature is applied before the programs that the data does
+    # not have
+    assert not coordinator.async_process_webhook(
+        {
+            "thermostat": THERMOSTAT_ID,
+            "room_temperature": 19,
+            "programs": {"comfort": 22},
+        }
+    )
+    assert coordinator.devices[THERMOSTAT_ID].data["room_temperature"] == 20.5
+    assert coordinator.data[THERMOSTAT_ID]["room_temperature"] == 20.5
+
+    assert coordinator.async_process_webhook(
+        {"thermostat": THERMOSTAT_ID, "room_temperature": 19}
+    )
+    assert coordinator.devices[THERMOSTAT_ID].data["room_temperature"] == 19
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)